@@ -19,6 +19,7 @@ from pydantic import BaseModel, Field
 import uvicorn
 
 from .router import claude_code_router_mcp
+from .rate_limiter import RateLimitExceeded
 from .models import RouterRequest, RouterResponse, SupportedModel
 from .config import RouterConfig
 from .utils import RouterUtils
@@ -141,6 +142,7 @@ async def health_check():
 @app.post("/v1/chat/completions")
 async def chat_completions(
     request: ChatCompletionRequest,
+    http_request: Request,
     auth_token: str = Depends(verify_token),
     background_tasks: BackgroundTasks = BackgroundTasks()
 ):
@@ -176,11 +178,13 @@ async def chat_completions(
         # 如果是流式請求
         if request.stream:
             return StreamingResponse(
-                _stream_response(router_request),
+                _stream_response(router_request, http_request),
                 media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
-                    "Connection": "keep-alive"
+                    "Connection": "keep-alive",
+                    "X-Accel-Buffering": "no",
+                    "X-Request-ID": router_request.request_id
                 }
             )
         
@@ -191,7 +195,10 @@ async def chat_completions(
         background_tasks.add_task(_update_usage_stats, router_request, response)
         
         return JSONResponse(
-            content=response.__dict__,
+            content={
+                **response.__dict__,
+                "provider": response.provider.value if response.provider else None
+            },
             headers={
                 "X-Request-ID": router_request.request_id,
                 "X-Model-Used": response.model,
@@ -202,40 +209,44 @@ async def chat_completions(
             }
         )
         
+    except HTTPException:
+        raise
+    except RateLimitExceeded as e:
+        logger.warning(f"⏳ {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e), headers=e.get_headers())
     except Exception as e:
         logger.error(f"❌ 聊天完成失敗: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def _stream_response(router_request: RouterRequest):
-    """流式響應生成器"""
+async def _stream_response(router_request: RouterRequest, http_request: Request):
+    """流式響應生成器
+
+    直接轉發上游提供商的增量塊；客戶端斷開時關閉上游流。
+    """
+    stream = claude_code_router_mcp.route_stream_request(router_request)
     try:
-        # 這裡需要實現流式響應邏輯
-        # 暫時返回非流式響應
-        response = await claude_code_router_mcp.route_request(router_request)
-        
-        # 模擬流式輸出
-        content = response.choices[0]["message"]["content"]
-        words = content.split()
-        
-        for i, word in enumerate(words):
-            chunk = {
-                "id": response.id,
-                "object": "chat.completion.chunk",
-                "created": response.created,
-                "model": response.model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {"content": word + " " if i < len(words) - 1 else word},
-                    "finish_reason": None if i < len(words) - 1 else "stop"
-                }]
-            }
+        async for chunk in stream:
+            if await http_request.is_disconnected():
+                logger.info(f"🔌 客戶端已斷開，取消流式請求: {router_request.request_id}")
+                break
             
-            yield f"data: {json.dumps(chunk)}\n\n"
-            await asyncio.sleep(0.05)  # 模擬延遲
-        
-        # 結束標記
-        yield "data: [DONE]\n\n"
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        else:
+            # 結束標記
+            yield "data: [DONE]\n\n"
         
+    except asyncio.CancelledError:
+        logger.info(f"🔌 流式請求已取消: {router_request.request_id}")
+        raise
+    except RateLimitExceeded as e:
+        error_chunk = {
+            "error": {
+                "message": str(e),
+                "type": "rate_limit_error",
+                "retry_after": e.retry_after
+            }
+        }
+        yield f"data: {json.dumps(error_chunk, ensure_ascii=False)}\n\n"
     except Exception as e:
         error_chunk = {
             "error": {
@@ -244,6 +255,8 @@ async def _stream_response(router_request: RouterRequest):
             }
         }
         yield f"data: {json.dumps(error_chunk)}\n\n"
+    finally:
+        await stream.aclose()
 
 async def _update_usage_stats(request: RouterRequest, response: RouterResponse):
     """更新使用統計"""
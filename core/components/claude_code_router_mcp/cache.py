@@ -3,16 +3,19 @@ Claude Code Router MCP - 緩存系統
 高效的請求響應緩存實現
 """
 
-import asyncio
+import heapq
 import json
 import time
-from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 from dataclasses import dataclass
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_NAMESPACE = "default"
+
 
 @dataclass
 class CacheEntry:
@@ -21,6 +24,8 @@ class CacheEntry:
     value: Any
     created_at: float
     ttl: int
+    namespace: str = DEFAULT_NAMESPACE
+    size: int = 0
     access_count: int = 0
     last_access: float = 0
     
@@ -28,9 +33,14 @@ class CacheEntry:
         if self.last_access == 0:
             self.last_access = self.created_at
     
-    def is_expired(self) -> bool:
+    @property
+    def expires_at(self) -> float:
+        """過期時間戳"""
+        return self.created_at + self.ttl
+    
+    def is_expired(self, now: Optional[float] = None) -> bool:
         """檢查是否過期"""
-        return time.time() - self.created_at > self.ttl
+        return (now or time.time()) > self.expires_at
     
     def update_access(self):
         """更新訪問統計"""
@@ -39,115 +49,176 @@ class CacheEntry:
 
 
 class RouterCache:
-    """路由器緩存系統"""
+    """路由器緩存系統
+
+    OrderedDict 維護 LRU 順序，所有操作 O(1)；過期條目在訪問時惰性刪除，
+    並通過按過期時間排序的小頂堆攤還清理。容量同時受條目數和字節預算限制。
+    """
     
-    def __init__(self, ttl: int = 3600, max_size: int = 1000):
+    def __init__(self, ttl: int = 3600, max_size: int = 1000, max_bytes: int = 0):
         self.ttl = ttl
         self.max_size = max_size
-        self.cache: Dict[str, CacheEntry] = {}
-        self.stats = {
+        self.max_bytes = max_bytes  # 0 表示不限制字節數
+        self.cache: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self.current_bytes = 0
+        self.namespace_counts: Dict[str, int] = {}
+        self._expiry_heap: List[Tuple[float, str, str]] = []
+        self.stats = self._empty_stats()
+        
+        logger.info(f"📦 RouterCache 初始化完成 (TTL: {ttl}s, Max Size: {max_size}, Max Bytes: {max_bytes or 'unlimited'})")
+    
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {
             "hits": 0,
             "misses": 0,
             "evictions": 0,
+            "expirations": 0,
             "total_requests": 0
         }
-        
-        logger.info(f"📦 RouterCache 初始化完成 (TTL: {ttl}s, Max Size: {max_size})")
     
-    async def get(self, key: str) -> Optional[Any]:
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        """估算緩存值佔用的字節數"""
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if isinstance(value, str):
+            return len(value.encode("utf-8"))
+        try:
+            return len(json.dumps(value, default=str, ensure_ascii=False).encode("utf-8"))
+        except (TypeError, ValueError):
+            return len(repr(value))
+    
+    async def get(self, key: str, namespace: str = DEFAULT_NAMESPACE) -> Optional[Any]:
         """獲取緩存值"""
         self.stats["total_requests"] += 1
+        cache_key = (namespace, key)
         
-        if key not in self.cache:
+        entry = self.cache.get(cache_key)
+        if entry is None:
             self.stats["misses"] += 1
             return None
         
-        entry = self.cache[key]
-        
-        # 檢查過期
+        # 惰性過期檢查
         if entry.is_expired():
-            del self.cache[key]
+            self._remove(cache_key)
+            self.stats["expirations"] += 1
             self.stats["misses"] += 1
             return None
         
-        # 更新訪問統計
+        # 更新LRU順序和訪問統計
+        self.cache.move_to_end(cache_key)
         entry.update_access()
         self.stats["hits"] += 1
         
-        logger.debug(f"🎯 緩存命中: {key}")
+        logger.debug(f"🎯 緩存命中: {namespace}/{key}")
         return entry.value
     
-    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None,
+                  namespace: str = DEFAULT_NAMESPACE) -> bool:
         """設置緩存值"""
         if ttl is None:
             ttl = self.ttl
         
-        # 檢查容量
-        if len(self.cache) >= self.max_size:
-            await self._evict_entries()
+        size = self._estimate_size(value)
+        if self.max_bytes and size > self.max_bytes:
+            logger.debug(f"⚠️ 緩存值過大，跳過: {namespace}/{key} ({size} bytes)")
+            return False
+        
+        cache_key = (namespace, key)
+        if cache_key in self.cache:
+            self._remove(cache_key)
         
         # 創建緩存條目
         entry = CacheEntry(
             key=key,
             value=value,
             created_at=time.time(),
-            ttl=ttl
+            ttl=ttl,
+            namespace=namespace,
+            size=size
         )
         
-        self.cache[key] = entry
+        # 檢查容量
+        self._evict_entries(incoming_size=size)
+        
+        self.cache[cache_key] = entry
+        self.current_bytes += size
+        self.namespace_counts[namespace] = self.namespace_counts.get(namespace, 0) + 1
+        heapq.heappush(self._expiry_heap, (entry.expires_at, namespace, key))
         
-        logger.debug(f"💾 緩存設置: {key} (TTL: {ttl}s)")
+        logger.debug(f"💾 緩存設置: {namespace}/{key} (TTL: {ttl}s, {size} bytes)")
         return True
     
-    async def delete(self, key: str) -> bool:
+    async def delete(self, key: str, namespace: str = DEFAULT_NAMESPACE) -> bool:
         """刪除緩存值"""
-        if key in self.cache:
-            del self.cache[key]
-            logger.debug(f"🗑️ 緩存刪除: {key}")
+        cache_key = (namespace, key)
+        if cache_key in self.cache:
+            self._remove(cache_key)
+            logger.debug(f"🗑️ 緩存刪除: {namespace}/{key}")
             return True
         return False
     
+    async def clear_namespace(self, namespace: str) -> int:
+        """清空指定命名空間（例如某個模型）的緩存"""
+        keys = [cache_key for cache_key in self.cache if cache_key[0] == namespace]
+        for cache_key in keys:
+            self._remove(cache_key)
+        logger.info(f"🧹 命名空間緩存已清空: {namespace} ({len(keys)} 條)")
+        return len(keys)
+    
     async def clear(self):
         """清空緩存"""
         self.cache.clear()
-        self.stats = {
-            "hits": 0,
-            "misses": 0,
-            "evictions": 0,
-            "total_requests": 0
-        }
+        self.current_bytes = 0
+        self.namespace_counts.clear()
+        self._expiry_heap.clear()
+        self.stats = self._empty_stats()
         logger.info("🧹 緩存已清空")
     
-    async def _evict_entries(self):
-        """驅逐緩存條目"""
-        if not self.cache:
-            return
-        
-        # 移除過期條目
-        expired_keys = [
-            key for key, entry in self.cache.items()
-            if entry.is_expired()
-        ]
+    def _remove(self, cache_key: Tuple[str, str]):
+        """移除條目並更新計數"""
+        entry = self.cache.pop(cache_key)
+        self.current_bytes -= entry.size
+        remaining = self.namespace_counts.get(entry.namespace, 1) - 1
+        if remaining > 0:
+            self.namespace_counts[entry.namespace] = remaining
+        else:
+            self.namespace_counts.pop(entry.namespace, None)
+    
+    def _purge_expired(self):
+        """按過期時間從堆頂清理已過期條目（攤還 O(log n)）"""
+        now = time.time()
+        heap = self._expiry_heap
         
-        for key in expired_keys:
-            del self.cache[key]
-            self.stats["evictions"] += 1
+        while heap and heap[0][0] < now:
+            expires_at, namespace, key = heapq.heappop(heap)
+            entry = self.cache.get((namespace, key))
+            # 堆中可能殘留已被覆蓋或刪除的舊記錄
+            if entry is not None and entry.expires_at == expires_at:
+                self._remove((namespace, key))
+                self.stats["expirations"] += 1
         
-        # 如果還需要空間，使用LRU策略
-        if len(self.cache) >= self.max_size:
-            # 按最後訪問時間排序
-            sorted_entries = sorted(
-                self.cache.items(),
-                key=lambda x: x[1].last_access
-            )
-            
-            # 驅逐最少使用的條目
-            evict_count = max(1, len(self.cache) // 10)  # 驅逐10%
-            for key, _ in sorted_entries[:evict_count]:
-                del self.cache[key]
-                self.stats["evictions"] += 1
+        # 舊記錄過多時重建堆
+        if len(heap) > 2 * len(self.cache) + 64:
+            self._expiry_heap = [
+                (entry.expires_at, entry.namespace, entry.key)
+                for entry in self.cache.values()
+            ]
+            heapq.heapify(self._expiry_heap)
+    
+    def _evict_entries(self, incoming_size: int = 0):
+        """驅逐緩存條目，為新條目騰出空間"""
+        self._purge_expired()
         
-        logger.debug(f"🧹 緩存驅逐完成: {len(expired_keys)} 過期")
+        # 按LRU順序從最久未訪問的條目開始驅逐
+        while self.cache and (
+            len(self.cache) >= self.max_size or
+            (self.max_bytes and self.current_bytes + incoming_size > self.max_bytes)
+        ):
+            cache_key = next(iter(self.cache))
+            self._remove(cache_key)
+            self.stats["evictions"] += 1
     
     def get_stats(self) -> Dict[str, Any]:
         """獲取緩存統計"""
@@ -156,14 +227,18 @@ class RouterCache:
         return {
             "cache_size": len(self.cache),
             "max_size": self.max_size,
+            "cache_bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
             "hit_rate": f"{hit_rate:.2f}%",
             "hits": self.stats["hits"],
             "misses": self.stats["misses"],
             "evictions": self.stats["evictions"],
-            "total_requests": self.stats["total_requests"]
+            "expirations": self.stats["expirations"],
+            "total_requests": self.stats["total_requests"],
+            "namespaces": dict(self.namespace_counts)
         }
     
     async def close(self):
         """關閉緩存系統"""
         await self.clear()
-        logger.info("🔒 RouterCache 已關閉")
\ No newline at end of file
+        logger.info("🔒 RouterCache 已關閉")
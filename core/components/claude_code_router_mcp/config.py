@@ -11,6 +11,14 @@ from dataclasses import dataclass, asdict
 from .models import ModelConfig, ModelProvider, SupportedModel
 
 
+def _env_key_pool(env_name: str) -> List[Dict[str, str]]:
+    """從 <ENV_NAME>S 環境變量讀取逗號分隔的額外API Key池
+
+    例如 OPENAI_API_KEYS="sk-a,sk-b" 會為使用 OPENAI_API_KEY 的模型添加兩個端點
+    """
+    keys = os.environ.get(f"{env_name}S", "")
+    return [{"api_key": key.strip()} for key in keys.split(",") if key.strip()]
+
 @dataclass
 class RouterConfig:
     """路由器配置"""
@@ -23,7 +31,20 @@ class RouterConfig:
     # 緩存配置
     enable_cache: bool = True
     cache_ttl: int = 3600  # 1小時
-    cache_max_size: int = 1000
+    cache_max_size: int = 100000
+    cache_max_bytes: int = 256 * 1024 * 1024  # 256MB
+    
+    # 語義緩存配置（僅用於temperature=0的請求）
+    enable_semantic_cache: bool = False
+    semantic_cache_threshold: float = 0.9
+    semantic_cache_max_size: int = 10000
+    
+    # 合併相同的進行中非流式請求
+    enable_request_coalescing: bool = True
+    
+    # 指標持久化配置
+    metrics_flush_interval: int = 30  # 秒
+    metrics_flush_threshold: int = 100  # 累積多少次更新後提前寫盤
     
     # 日誌配置
     log_level: str = "INFO"
@@ -33,12 +54,19 @@ class RouterConfig:
     require_auth: bool = True
     auth_token: Optional[str] = None
     rate_limit_per_minute: int = 100
+    client_rate_limit_per_minute: int = 0  # 每個客戶端（請求的user字段），0表示不限制
+    rate_limit_max_wait: float = 5.0  # 超限時最多排隊等待的秒數，0表示直接拒絕
+    rate_limit_queue_size: int = 100  # 每個限流維度的最大等待請求數
     
     # 負載均衡配置
     load_balancing_strategy: str = "round_robin"  # round_robin, least_connections, weighted
     enable_failover: bool = True
     health_check_interval: int = 60
     
+    # 對沖請求：主端點在延遲內未返回時，向另一端點發送備份請求
+    enable_hedging: bool = False
+    hedge_delay: float = 2.0  # 秒，實際延遲取 min(hedge_delay, 2 × 端點平均響應時間)
+    
     # 成本優化配置
     cost_optimization: bool = True
     max_cost_per_request: float = 1.0
@@ -66,6 +94,7 @@ class ModelConfigManager:
             provider=ModelProvider.ANTHROPIC,
             api_base="https://api.anthropic.com",
             api_key=os.environ.get("ANTHROPIC_API_KEY", ""),
+            endpoints=_env_key_pool("ANTHROPIC_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.015,
@@ -81,6 +110,7 @@ class ModelConfigManager:
             provider=ModelProvider.ANTHROPIC,
             api_base="https://api.anthropic.com",
             api_key=os.environ.get("ANTHROPIC_API_KEY", ""),
+            endpoints=_env_key_pool("ANTHROPIC_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.003,
@@ -97,6 +127,7 @@ class ModelConfigManager:
             provider=ModelProvider.OPENAI,
             api_base="https://api.openai.com/v1",
             api_key=os.environ.get("OPENAI_API_KEY", ""),
+            endpoints=_env_key_pool("OPENAI_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.005,
@@ -112,6 +143,7 @@ class ModelConfigManager:
             provider=ModelProvider.OPENAI,
             api_base="https://api.openai.com/v1",
             api_key=os.environ.get("OPENAI_API_KEY", ""),
+            endpoints=_env_key_pool("OPENAI_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.00015,
@@ -128,6 +160,7 @@ class ModelConfigManager:
             provider=ModelProvider.GOOGLE,
             api_base="https://generativelanguage.googleapis.com/v1beta",
             api_key=os.environ.get("GOOGLE_AI_API_KEY", ""),
+            endpoints=_env_key_pool("GOOGLE_AI_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.0025,
@@ -143,6 +176,7 @@ class ModelConfigManager:
             provider=ModelProvider.GOOGLE,
             api_base="https://generativelanguage.googleapis.com/v1beta",
             api_key=os.environ.get("GOOGLE_AI_API_KEY", ""),
+            endpoints=_env_key_pool("GOOGLE_AI_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.000075,
@@ -159,6 +193,7 @@ class ModelConfigManager:
             provider=ModelProvider.MOONSHOT,
             api_base="https://api.moonshot.cn/v1",
             api_key=os.environ.get("MOONSHOT_API_KEY", ""),
+            endpoints=_env_key_pool("MOONSHOT_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.0012,
@@ -175,6 +210,7 @@ class ModelConfigManager:
             provider=ModelProvider.MOONSHOT,  # 使用相同的provider類型
             api_base="https://cloud.infini-ai.com/maas/v1",
             api_key=os.environ.get("INFINI_AI_API_KEY", "sk-kqbgz7fvqdutvns7"),
+            endpoints=_env_key_pool("INFINI_AI_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.0005,  # 💰 成本優先：比官方便宜60%
@@ -190,6 +226,7 @@ class ModelConfigManager:
             provider=ModelProvider.MOONSHOT,
             api_base="https://api.moonshot.cn/v1",
             api_key=os.environ.get("MOONSHOT_API_KEY", ""),
+            endpoints=_env_key_pool("MOONSHOT_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.0024,
@@ -205,6 +242,7 @@ class ModelConfigManager:
             provider=ModelProvider.MOONSHOT,
             api_base="https://api.moonshot.cn/v1",
             api_key=os.environ.get("MOONSHOT_API_KEY", ""),
+            endpoints=_env_key_pool("MOONSHOT_API_KEY"),
             max_tokens=4096,
             temperature=0.7,
             cost_per_1k_tokens=0.0096,
@@ -223,6 +261,9 @@ class ModelConfigManager:
                     data = json.load(f)
                 
                 for model_id, config_data in data.items():
+                    if 'provider' in config_data:
+                        config_data['provider'] = ModelProvider(config_data['provider'])
+                    
                     if model_id in self.models:
                         # 更新現有配置
                         config = self.models[model_id]
@@ -231,7 +272,6 @@ class ModelConfigManager:
                                 setattr(config, key, value)
                     else:
                         # 創建新配置
-                        config_data['provider'] = ModelProvider(config_data['provider'])
                         self.models[model_id] = ModelConfig(**config_data)
                         
             except Exception as e:
@@ -6,7 +6,7 @@ Claude Code Router MCP - 負載均衡器
 import asyncio
 import random
 import time
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
 from dataclasses import dataclass, field
 from enum import Enum
 import logging
@@ -96,18 +96,26 @@ class LoadBalancer:
             del self.endpoints[endpoint_id]
             logger.info(f"➖ 端點已移除: {endpoint_id}")
     
-    def get_endpoint(self, request_context: Optional[Dict[str, Any]] = None) -> Optional[str]:
-        """根據策略獲取端點"""
+    def get_endpoint(self, request_context: Optional[Dict[str, Any]] = None,
+                     exclude: Optional[Set[str]] = None) -> Optional[str]:
+        """根據策略獲取端點 (exclude: 本次請求已嘗試過的端點)"""
+        now = time.time()
+        candidates = {
+            ep_id: ep_info for ep_id, ep_info in self.endpoints.items()
+            if not exclude or ep_id not in exclude
+        }
+        
+        # 不健康的端點在冷卻期後允許半開試探
         healthy_endpoints = [
-            ep_id for ep_id, ep_info in self.endpoints.items()
-            if ep_info.is_healthy
+            ep_id for ep_id, ep_info in candidates.items()
+            if ep_info.is_healthy or now - ep_info.last_request_time > self.health_check_interval
         ]
         
         if not healthy_endpoints:
             # 如果沒有健康的端點，嘗試使用最近失敗較少的端點
-            if self.endpoints:
+            if candidates:
                 fallback_endpoint = min(
-                    self.endpoints.items(),
+                    candidates.items(),
                     key=lambda x: x[1].consecutive_failures
                 )
                 logger.warning(f"⚠️ 使用備用端點: {fallback_endpoint[0]}")
@@ -207,6 +215,12 @@ class LoadBalancer:
             
             logger.debug(f"📊 端點統計更新: {endpoint_id} (成功: {success}, 響應時間: {response_time:.2f}s)")
     
+    def cancel_request(self, endpoint_id: str):
+        """取消請求（例如對沖請求的落敗方），只釋放連接不計入統計"""
+        if endpoint_id in self.endpoints:
+            endpoint_info = self.endpoints[endpoint_id]
+            endpoint_info.current_connections = max(0, endpoint_info.current_connections - 1)
+    
     def mark_endpoint_unhealthy(self, endpoint_id: str):
         """標記端點為不健康"""
         if endpoint_id in self.endpoints:
@@ -0,0 +1,187 @@
+"""
+Claude Code Router MCP - 模型性能指標
+內存中的模型指標存儲，定時或累積到閾值後異步原子寫盤
+"""
+
+import asyncio
+import json
+import os
+import time
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Optional
+from dataclasses import dataclass, asdict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelMetrics:
+    """單個模型的性能指標"""
+    avg_response_time: float = 0.0
+    success_rate: float = 100.0
+    last_used: float = 0.0
+    total_requests: int = 0
+    failed_requests: int = 0
+
+
+class ModelMetricsStore:
+    """模型指標存儲
+
+    請求路徑上只更新內存中的EWMA指標；磁盤寫入在後台線程中完成，
+    由定時器或髒計數閾值觸發，並通過臨時文件 + os.replace 原子替換。
+    """
+
+    def __init__(self, metrics_path: Optional[str] = None, flush_interval: float = 30.0,
+                 flush_threshold: int = 100, alpha: float = 0.1):
+        self.metrics_path = Path(metrics_path) if metrics_path else Path.home() / ".claude_code_router" / "metrics.json"
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.alpha = alpha
+        self.metrics: Dict[str, ModelMetrics] = {}
+        self.dirty_count = 0
+        self.flush_count = 0
+
+        self._flush_task: Optional[asyncio.Task] = None
+        self._pending_flush: Optional[asyncio.Task] = None
+        # 寫盤時在運行中的事件循環內創建（Python 3.8 的鎖在創建時綁定事件循環，
+        # 而存儲由導入時的單例創建）
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._load()
+
+    def _load(self):
+        """從文件載入指標"""
+        if not self.metrics_path.exists():
+            return
+
+        try:
+            with open(self.metrics_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            for model_id, values in data.items():
+                self.metrics[model_id] = ModelMetrics(**{
+                    key: value for key, value in values.items()
+                    if key in ModelMetrics.__dataclass_fields__
+                })
+        except Exception as e:
+            logger.warning(f"載入模型指標失敗: {e}")
+
+    def get(self, model_id: str) -> Optional[ModelMetrics]:
+        """獲取模型指標"""
+        return self.metrics.get(model_id)
+
+    def record(self, model_id: str, response_time: float, success: bool) -> ModelMetrics:
+        """記錄一次請求結果 (O(1)，不觸碰磁盤)"""
+        metrics = self.metrics.get(model_id)
+        if metrics is None:
+            metrics = self.metrics[model_id] = ModelMetrics()
+
+        # 更新平均響應時間 (EWMA)
+        if metrics.avg_response_time == 0:
+            metrics.avg_response_time = response_time
+        else:
+            metrics.avg_response_time = metrics.avg_response_time * (1 - self.alpha) + response_time * self.alpha
+
+        # 更新成功率
+        if success:
+            metrics.success_rate = min(100.0, metrics.success_rate * 0.99 + 1.0)
+        else:
+            metrics.success_rate = max(0.0, metrics.success_rate * 0.99)
+            metrics.failed_requests += 1
+
+        metrics.total_requests += 1
+        metrics.last_used = time.time()
+
+        # 每累積 flush_threshold 次更新觸發一次寫盤；寫盤失敗時髒計數保留，下一個閾值時重試
+        self.dirty_count += 1
+        if self.dirty_count % self.flush_threshold == 0:
+            self._schedule_flush()
+
+        return metrics
+
+    def _schedule_flush(self):
+        """在事件循環中安排一次異步寫盤"""
+        if self._pending_flush and not self._pending_flush.done():
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._pending_flush = loop.create_task(self._flush_logged())
+
+    async def start(self):
+        """啟動定時寫盤任務"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """定時寫盤循環"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_logged()
+
+    async def _flush_logged(self):
+        """後台寫盤：失敗時記錄日誌，髒指標留待下次寫入"""
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"模型指標寫盤失敗: {e}")
+
+    async def flush(self) -> bool:
+        """將髒指標寫入磁盤"""
+        loop = asyncio.get_running_loop()
+        if self._flush_lock is None or self._flush_lock_loop is not loop:
+            self._flush_lock = asyncio.Lock()
+            self._flush_lock_loop = loop
+
+        async with self._flush_lock:
+            if self.dirty_count == 0:
+                return False
+
+            snapshot = {model_id: asdict(metrics) for model_id, metrics in self.metrics.items()}
+            flushed = self.dirty_count
+
+            await loop.run_in_executor(None, self._write_snapshot, snapshot)
+
+            # 只在替換成功後扣除已寫入的部分，寫盤期間的新更新保持為髒
+            self.dirty_count -= flushed
+            self.flush_count += 1
+
+            logger.debug(f"💾 模型指標已寫盤: {len(snapshot)} 個模型")
+            return True
+
+    def _write_snapshot(self, snapshot: Dict[str, Any]):
+        """原子寫入快照文件"""
+        self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.metrics_path.parent, prefix=".metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.metrics_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def close(self):
+        """停止定時任務並寫入剩餘指標"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+        if self._pending_flush and not self._pending_flush.done():
+            await self._pending_flush
+
+        await self.flush()
@@ -73,6 +73,22 @@ class ModelConfig:
     avg_response_time: float = 0.0
     success_rate: float = 100.0
     last_used: float = field(default_factory=time.time)
+    
+    # 額外端點池 [{"api_base": ..., "api_key": ..., "weight": 1}]，
+    # 未設置的字段沿用上面的api_base/api_key
+    endpoints: List[Dict[str, Any]] = field(default_factory=list)
+    
+    def get_endpoints(self) -> List[Dict[str, Any]]:
+        """獲取端點池（主端點 + 額外端點）"""
+        primary = {"api_base": self.api_base, "api_key": self.api_key, "weight": 1}
+        endpoints = [primary]
+        
+        for endpoint in self.endpoints:
+            merged = {**primary, **endpoint}
+            if merged not in endpoints:
+                endpoints.append(merged)
+        
+        return endpoints
 
 
 @dataclass
@@ -167,6 +183,7 @@ class RouterResponse:
     provider: ModelProvider = None
     response_time: float = 0.0
     cached: bool = False
+    coalesced: bool = False
     cost: float = 0.0
     
     @classmethod
@@ -254,6 +271,7 @@ class RouterStats:
     successful_requests: int = 0
     failed_requests: int = 0
     cached_requests: int = 0
+    coalesced_requests: int = 0
     total_cost: float = 0.0
     avg_response_time: float = 0.0
     
@@ -264,7 +282,8 @@ class RouterStats:
     provider_stats: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     
     def add_request(self, model: str, provider: ModelProvider, success: bool, 
-                   response_time: float, cost: float, cached: bool = False):
+                   response_time: float, cost: float, cached: bool = False,
+                   coalesced: bool = False):
         """添加請求統計"""
         self.total_requests += 1
         if success:
@@ -275,6 +294,9 @@ class RouterStats:
         if cached:
             self.cached_requests += 1
         
+        if coalesced:
+            self.coalesced_requests += 1
+        
         self.total_cost += cost
         self.avg_response_time = (self.avg_response_time * (self.total_requests - 1) + response_time) / self.total_requests
         
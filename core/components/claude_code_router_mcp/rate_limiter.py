@@ -0,0 +1,166 @@
+"""
+Claude Code Router MCP - 速率限制
+基於令牌桶的O(1)速率限制器，支持有界等待隊列
+"""
+
+import asyncio
+import math
+import time
+from typing import Dict, Any, Optional
+from dataclasses import dataclass, field
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """超過速率限制"""
+
+    def __init__(self, scope: str, key: str, retry_after: float):
+        self.scope = scope
+        self.key = key
+        self.retry_after = retry_after
+        super().__init__(f"速率限制: {scope}={key} (請在 {retry_after:.2f}s 後重試)")
+
+    def get_headers(self) -> Dict[str, str]:
+        """Retry-After 響應頭"""
+        return {
+            "Retry-After": str(max(1, math.ceil(self.retry_after))),
+            "X-RateLimit-Scope": self.scope
+        }
+
+
+@dataclass
+class TokenBucket:
+    """令牌桶
+
+    令牌可以透支（預約）到負數：等待者按到達順序預約未來的令牌，
+    無需輪詢即可得到精確的等待時間。
+    """
+    capacity: float
+    refill_rate: float  # 每秒補充的令牌數
+    tokens: float = field(default=-1.0)
+    updated_at: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        if self.tokens < 0:
+            self.tokens = self.capacity
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated_at = now
+
+    def reserve(self, max_wait: float, now: Optional[float] = None) -> float:
+        """預約一個令牌，返回需要等待的秒數；超過max_wait時返回負的所需等待時間"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+
+        wait = (1 - self.tokens) / self.refill_rate
+        if wait > max_wait:
+            return -wait
+
+        self.tokens -= 1
+        return wait
+
+    def release(self):
+        """歸還預約的令牌（例如等待被取消或其他維度拒絕）"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class RateLimiter:
+    """多維度令牌桶速率限制器 (按模型 / 按客戶端)"""
+
+    def __init__(self, max_wait: float = 0.0, max_queue_size: int = 100):
+        self.max_wait = max_wait
+        self.max_queue_size = max_queue_size
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.waiting: Dict[str, int] = {}
+        self.stats = {
+            "allowed": 0,
+            "queued": 0,
+            "rejected": 0,
+            "total_wait_time": 0.0
+        }
+
+    def _get_bucket(self, scope: str, key: str, limit_per_minute: int) -> TokenBucket:
+        bucket_key = f"{scope}:{key}"
+        bucket = self.buckets.get(bucket_key)
+        if bucket is None or bucket.capacity != limit_per_minute:
+            bucket = self.buckets[bucket_key] = TokenBucket(
+                capacity=limit_per_minute,
+                refill_rate=limit_per_minute / 60.0
+            )
+        return bucket
+
+    async def acquire(self, limits: Dict[str, Any]) -> float:
+        """按所有維度獲取令牌
+
+        limits: {scope: (key, limit_per_minute)}，例如
+        {"model": ("gpt-4o", 60), "client": ("user-1", 100)}
+        返回實際等待秒數；無法在max_wait內獲得時拋出RateLimitExceeded。
+        """
+        reserved = []
+        wait = 0.0
+
+        for scope, (key, limit_per_minute) in limits.items():
+            if key is None or not limit_per_minute:
+                continue
+
+            bucket_key = f"{scope}:{key}"
+            bucket = self._get_bucket(scope, key, limit_per_minute)
+            queue_full = self.waiting.get(bucket_key, 0) >= self.max_queue_size
+            bucket_wait = bucket.reserve(0.0 if queue_full else self.max_wait)
+
+            if bucket_wait < 0:
+                for reserved_bucket in reserved:
+                    reserved_bucket.release()
+                self.stats["rejected"] += 1
+                raise RateLimitExceeded(scope, key, -bucket_wait)
+
+            reserved.append(bucket)
+            wait = max(wait, bucket_wait)
+
+        if wait <= 0:
+            self.stats["allowed"] += 1
+            return 0.0
+
+        # 有界等待：平滑突發而非直接失敗
+        waiting_keys = [
+            f"{scope}:{key}" for scope, (key, limit) in limits.items()
+            if key is not None and limit
+        ]
+        for bucket_key in waiting_keys:
+            self.waiting[bucket_key] = self.waiting.get(bucket_key, 0) + 1
+
+        self.stats["queued"] += 1
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            for reserved_bucket in reserved:
+                reserved_bucket.release()
+            raise
+        finally:
+            for bucket_key in waiting_keys:
+                self.waiting[bucket_key] -= 1
+                if self.waiting[bucket_key] <= 0:
+                    del self.waiting[bucket_key]
+
+        self.stats["allowed"] += 1
+        self.stats["total_wait_time"] += wait
+        return wait
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取速率限制統計"""
+        return {
+            "buckets": len(self.buckets),
+            "waiting": sum(self.waiting.values()),
+            "max_wait": self.max_wait,
+            "max_queue_size": self.max_queue_size,
+            **self.stats
+        }
@@ -8,8 +8,8 @@ import json
 import logging
 import time
 import hashlib
-from typing import Dict, List, Optional, Any, AsyncGenerator
-from dataclasses import asdict
+from typing import Dict, List, Optional, Any, AsyncGenerator, Tuple
+from dataclasses import asdict, replace
 import httpx
 from datetime import datetime, timedelta
 import random
@@ -22,10 +22,17 @@ from .config import RouterConfig, ModelConfigManager
 from .utils import RouterUtils
 from .cache import RouterCache
 from .load_balancer import LoadBalancer
+from .metrics import ModelMetricsStore
+from .semantic_cache import SemanticCache
+from .rate_limiter import RateLimiter
+from .streaming import StreamState, iter_provider_chunks
 
 
 logger = logging.getLogger(__name__)
 
+# 可以切換到其他端點重試的HTTP狀態碼
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
 
 class ClaudeCodeRouterMCP:
     """Claude Code Router MCP - 多AI模型智能路由系統"""
@@ -33,11 +40,24 @@ class ClaudeCodeRouterMCP:
     def __init__(self, config: RouterConfig = None):
         self.config = config or RouterConfig()
         self.model_manager = ModelConfigManager()
+        self.metrics_store = ModelMetricsStore(
+            metrics_path=str(self.model_manager.config_path.parent / "metrics.json"),
+            flush_interval=self.config.metrics_flush_interval,
+            flush_threshold=self.config.metrics_flush_threshold
+        )
         self.cache = RouterCache(
             ttl=self.config.cache_ttl,
-            max_size=self.config.cache_max_size
+            max_size=self.config.cache_max_size,
+            max_bytes=self.config.cache_max_bytes
         )
-        self.load_balancer = LoadBalancer(self.config.load_balancing_strategy)
+        self.semantic_cache = SemanticCache(
+            threshold=self.config.semantic_cache_threshold,
+            max_size=self.config.semantic_cache_max_size,
+            ttl=self.config.cache_ttl
+        ) if self.config.enable_semantic_cache else None
+        # 每個模型一個負載均衡器，管理該模型的端點/API Key池
+        self.load_balancers: Dict[str, LoadBalancer] = {}
+        self.endpoint_configs: Dict[str, ModelConfig] = {}
         self.stats = RouterStats()
         self.utils = RouterUtils()
         
@@ -52,7 +72,13 @@ class ClaudeCodeRouterMCP:
         self.health_check_task: Optional[asyncio.Task] = None
         
         # 請求限制
-        self.request_counts: Dict[str, List[float]] = {}
+        self.rate_limiter = RateLimiter(
+            max_wait=self.config.rate_limit_max_wait,
+            max_queue_size=self.config.rate_limit_queue_size
+        )
+        
+        # 進行中的相同請求 (single-flight)
+        self.inflight_requests: Dict[str, asyncio.Task] = {}
         
         logger.info("🚀 Claude Code Router MCP 初始化完成")
     
@@ -65,6 +91,13 @@ class ClaudeCodeRouterMCP:
         if config_errors:
             logger.warning(f"配置警告: {config_errors}")
         
+        # 恢復持久化的模型指標並啟動異步寫盤
+        for model_config in self.model_manager.models.values():
+            metrics = self.metrics_store.get(model_config.model_id)
+            if metrics:
+                self._apply_model_metrics(model_config, metrics)
+        await self.metrics_store.start()
+        
         # 啟動健康檢查
         if self.config.enable_failover:
             self.health_check_task = asyncio.create_task(self._health_check_loop())
@@ -72,12 +105,78 @@ class ClaudeCodeRouterMCP:
         # 初始化負載均衡器
         enabled_models = self.model_manager.get_enabled_models()
         for model in enabled_models:
-            self.load_balancer.add_endpoint(model.model_id, model.priority)
+            self._get_load_balancer(model)
         
         logger.info("✅ Claude Code Router MCP 初始化完成")
     
     async def route_request(self, request: RouterRequest) -> RouterResponse:
         """路由請求到適當的AI模型"""
+        if request.stream or not self.config.enable_request_coalescing:
+            return await self._route_request(request)
+        
+        return await self._route_coalesced_request(request)
+    
+    async def _route_coalesced_request(self, request: RouterRequest) -> RouterResponse:
+        """合併相同的進行中請求：只有一個上游請求，其他調用者等待其結果"""
+        start_time = time.time()
+        key = self._generate_cache_key(request)
+        
+        task = self.inflight_requests.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._route_request(request))
+            self.inflight_requests[key] = task
+            task.add_done_callback(lambda t, key=key: self._finish_inflight_request(key, t))
+            
+            # shield: 發起者被取消時不影響其他等待者
+            return await asyncio.shield(task)
+        
+        logger.info(f"🔗 合併進行中的相同請求: {request.model}")
+        try:
+            shared_response = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats.add_request(
+                request.model,
+                ModelProvider.ANTHROPIC,  # 默認提供商
+                False,
+                time.time() - start_time,
+                0.0,
+                coalesced=True
+            )
+            raise
+        
+        # 跟隨者不產生上游成本，統計為未發送到上游的請求
+        response_time = time.time() - start_time
+        self.stats.add_request(
+            shared_response.model,
+            shared_response.provider or ModelProvider.ANTHROPIC,
+            True,
+            response_time,
+            0.0,
+            coalesced=True
+        )
+        
+        return replace(
+            shared_response,
+            choices=[dict(choice) for choice in shared_response.choices],
+            usage=dict(shared_response.usage),
+            response_time=response_time,
+            cost=0.0,
+            coalesced=True
+        )
+    
+    def _finish_inflight_request(self, key: str, task: asyncio.Task):
+        """清理完成的進行中請求"""
+        if self.inflight_requests.get(key) is task:
+            del self.inflight_requests[key]
+        
+        # 標記異常已讀取，避免所有等待者都取消時出現未處理異常警告
+        if not task.cancelled():
+            task.exception()
+    
+    async def _route_request(self, request: RouterRequest) -> RouterResponse:
+        """執行單個路由請求（緩存、模型選擇、上游調用與統計）"""
         start_time = time.time()
         
         try:
@@ -87,6 +186,14 @@ class ClaudeCodeRouterMCP:
                 if cached_response:
                     logger.info(f"🎯 緩存命中: {request.model}")
                     cached_response.cached = True
+                    self.stats.add_request(
+                        cached_response.model,
+                        cached_response.provider or ModelProvider.ANTHROPIC,
+                        True,
+                        time.time() - start_time,
+                        0.0,
+                        cached=True
+                    )
                     return cached_response
             
             # 選擇模型
@@ -95,11 +202,10 @@ class ClaudeCodeRouterMCP:
                 raise Exception(f"無法找到可用的模型: {request.model}")
             
             # 檢查速率限制
-            if not await self._check_rate_limit(model_config.model_id):
-                raise Exception(f"速率限制: {model_config.model_id}")
+            await self._check_rate_limit(model_config, request)
             
             # 發送請求
-            response = await self._send_request(request, model_config)
+            response = await self._send_with_failover(request, model_config)
             
             # 計算成本
             cost = self._calculate_cost(response, model_config)
@@ -143,6 +249,145 @@ class ClaudeCodeRouterMCP:
             
             raise e
     
+    async def route_stream_request(self, request: RouterRequest) -> AsyncGenerator[Dict[str, Any], None]:
+        """路由流式請求，按上游到達順序逐塊產出OpenAI格式增量"""
+        start_time = time.time()
+        model_config = None
+        state = None
+        success = False
+        
+        try:
+            # 選擇模型
+            model_config = await self._select_model(request)
+            if not model_config:
+                raise Exception(f"無法找到可用的模型: {request.model}")
+            
+            # 檢查速率限制
+            await self._check_rate_limit(model_config, request)
+            
+            if not model_config.supports_streaming:
+                # 不支持流式的模型退化為單塊輸出
+                response = await self._send_with_failover(request, model_config)
+                state = StreamState(id=response.id, model=model_config.model_id, provider=model_config.provider)
+                state.usage = dict(response.usage)
+                content = response.choices[0].get("message", {}).get("content", "") if response.choices else ""
+                yield state.make_chunk(content, "stop")
+            else:
+                state = StreamState(
+                    id=request.request_id or RouterUtils.generate_request_id(),
+                    model=model_config.model_id,
+                    provider=model_config.provider
+                )
+                balancer = self._get_load_balancer(model_config)
+                attempts = self._max_attempts(model_config, balancer)
+                tried = set()
+                
+                for attempt in range(attempts):
+                    endpoint_id = balancer.get_endpoint(exclude=tried)
+                    if endpoint_id is None:
+                        break
+                    tried.add(endpoint_id)
+                    endpoint_config = self.endpoint_configs[endpoint_id]
+                    url, headers, params, payload = self._build_stream_call(request, endpoint_config)
+                    
+                    balancer.start_request(endpoint_id)
+                    endpoint_start = time.time()
+                    accounted = False
+                    try:
+                        # 關閉生成器（例如客戶端斷開）時會退出上下文並關閉上游連接
+                        async with self.http_client.stream("POST", url, json=payload, headers=headers, params=params) as response:
+                            if response.status_code >= 400:
+                                await response.aread()
+                            response.raise_for_status()
+                            
+                            async for chunk in iter_provider_chunks(response, state):
+                                yield chunk
+                        
+                        balancer.end_request(endpoint_id, time.time() - endpoint_start, True)
+                        accounted = True
+                        break
+                    except Exception as e:
+                        balancer.end_request(endpoint_id, time.time() - endpoint_start, False)
+                        accounted = True
+                        # 已經向客戶端輸出內容後不能再切換端點
+                        if state.role_sent or not self._is_retryable_error(e) or attempt == attempts - 1:
+                            raise
+                        logger.warning(f"🔁 端點 {endpoint_id} 失敗，切換下一個端點: {e}")
+                    finally:
+                        if not accounted:
+                            balancer.cancel_request(endpoint_id)
+            
+            success = True
+            
+        finally:
+            response_time = time.time() - start_time
+            
+            if success:
+                cost = self._calculate_cost(state.to_response(), model_config)
+                self.stats.add_request(
+                    model_config.model_id,
+                    model_config.provider,
+                    True,
+                    response_time,
+                    cost
+                )
+                await self._update_model_metrics(model_config.model_id, response_time, True)
+                logger.info(f"✅ 流式路由完成: {request.model} -> {model_config.model_id} ({response_time:.2f}s, ${cost:.4f})")
+            else:
+                logger.warning(f"⚠️ 流式路由中止: {request.model} ({response_time:.2f}s)")
+                self.stats.add_request(
+                    model_config.model_id if model_config else request.model,
+                    model_config.provider if model_config else ModelProvider.ANTHROPIC,
+                    False,
+                    response_time,
+                    0.0
+                )
+    
+    def _build_stream_call(self, request: RouterRequest, model_config: ModelConfig):
+        """構建提供商流式請求 (url, headers, params, payload)"""
+        provider = model_config.provider
+        params = None
+        
+        if provider == ModelProvider.ANTHROPIC:
+            url = f"{model_config.api_base}/v1/messages"
+            headers = {
+                "Content-Type": "application/json",
+                "x-api-key": model_config.api_key,
+                "anthropic-version": "2023-06-01"
+            }
+            payload = request.to_anthropic_format()
+        elif provider == ModelProvider.OPENAI:
+            url = f"{model_config.api_base}/chat/completions"
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {model_config.api_key}"
+            }
+            payload = request.to_openai_format()
+            payload["stream_options"] = {"include_usage": True}
+        elif provider == ModelProvider.GOOGLE:
+            url = f"{model_config.api_base}/models/{model_config.model_id}:streamGenerateContent"
+            headers = {
+                "Content-Type": "application/json"
+            }
+            params = {"key": model_config.api_key, "alt": "sse"}
+            payload = request.to_google_format()
+        elif provider == ModelProvider.MOONSHOT:
+            url = f"{model_config.api_base}/chat/completions"
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {model_config.api_key}"
+            }
+            payload = request.to_moonshot_format()
+        else:
+            raise ValueError(f"不支持的提供商: {provider}")
+        
+        if provider != ModelProvider.GOOGLE:
+            payload["model"] = model_config.model_id
+            payload["stream"] = True
+        
+        headers["Accept"] = "text/event-stream"
+        return url, headers, params, payload
+    
     async def _select_model(self, request: RouterRequest) -> Optional[ModelConfig]:
         """選擇最佳模型"""
         # 首先檢查是否指定了具體模型
@@ -199,6 +444,115 @@ class ClaudeCodeRouterMCP:
         
         return "general"
     
+    def _get_load_balancer(self, model_config: ModelConfig) -> LoadBalancer:
+        """獲取（或創建）模型的端點負載均衡器"""
+        balancer = self.load_balancers.get(model_config.model_id)
+        if balancer is not None:
+            return balancer
+        
+        balancer = LoadBalancer(self.config.load_balancing_strategy)
+        for index, endpoint in enumerate(model_config.get_endpoints()):
+            endpoint_id = f"{model_config.model_id}#{index}"
+            balancer.add_endpoint(endpoint_id, endpoint.get("weight", 1))
+            self.endpoint_configs[endpoint_id] = replace(
+                model_config,
+                api_base=endpoint["api_base"],
+                api_key=endpoint["api_key"],
+                endpoints=[]
+            )
+        
+        self.load_balancers[model_config.model_id] = balancer
+        return balancer
+    
+    def _max_attempts(self, model_config: ModelConfig, balancer: LoadBalancer) -> int:
+        """單次請求最多嘗試的端點數"""
+        return max(1, min(len(balancer.endpoints), model_config.retry_count))
+    
+    def _is_retryable_error(self, error: Exception) -> bool:
+        """429/5xx和網絡錯誤可以切換到下一個端點重試"""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(error, httpx.TransportError)
+    
+    async def _send_with_failover(self, request: RouterRequest, model_config: ModelConfig) -> RouterResponse:
+        """通過負載均衡器發送請求，失敗時自動切換端點"""
+        balancer = self._get_load_balancer(model_config)
+        attempts = self._max_attempts(model_config, balancer)
+        tried = set()
+        last_error = None
+        
+        for attempt in range(attempts):
+            endpoint_id = balancer.get_endpoint(exclude=tried)
+            if endpoint_id is None:
+                break
+            tried.add(endpoint_id)
+            
+            try:
+                if self.config.enable_hedging and len(balancer.endpoints) > len(tried):
+                    return await self._send_hedged(request, balancer, endpoint_id, tried)
+                return await self._send_to_endpoint(request, balancer, endpoint_id)
+            except Exception as e:
+                if not self._is_retryable_error(e):
+                    raise
+                last_error = e
+                logger.warning(f"🔁 端點 {endpoint_id} 失敗 ({attempt + 1}/{attempts})，切換下一個端點: {e}")
+        
+        if last_error:
+            raise last_error
+        raise Exception(f"沒有可用的端點: {model_config.model_id}")
+    
+    async def _send_to_endpoint(self, request: RouterRequest, balancer: LoadBalancer,
+                                endpoint_id: str) -> RouterResponse:
+        """向單個端點發送請求並記錄負載均衡統計"""
+        balancer.start_request(endpoint_id)
+        start_time = time.time()
+        
+        try:
+            response = await self._send_request(request, self.endpoint_configs[endpoint_id])
+        except asyncio.CancelledError:
+            balancer.cancel_request(endpoint_id)
+            raise
+        except Exception:
+            balancer.end_request(endpoint_id, time.time() - start_time, False)
+            raise
+        
+        balancer.end_request(endpoint_id, time.time() - start_time, True)
+        return response
+    
+    async def _send_hedged(self, request: RouterRequest, balancer: LoadBalancer,
+                           primary_id: str, tried: set) -> RouterResponse:
+        """對沖請求：主端點超過延遲未返回時向另一端點發送備份請求，取先成功者"""
+        avg_response_time = balancer.endpoints[primary_id].avg_response_time
+        hedge_delay = self.config.hedge_delay
+        if avg_response_time > 0:
+            hedge_delay = min(hedge_delay, avg_response_time * 2)
+        
+        tasks = {asyncio.ensure_future(self._send_to_endpoint(request, balancer, primary_id))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return done.pop().result()
+            
+            backup_id = balancer.get_endpoint(exclude=tried)
+            if backup_id is not None:
+                tried.add(backup_id)
+                logger.info(f"🪁 對沖請求: {primary_id} 超過 {hedge_delay:.2f}s，追加 {backup_id}")
+                tasks.add(asyncio.ensure_future(self._send_to_endpoint(request, balancer, backup_id)))
+            
+            last_error = None
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
     async def _send_request(self, request: RouterRequest, model_config: ModelConfig) -> RouterResponse:
         """發送請求到指定模型"""
         provider = model_config.provider
@@ -283,19 +637,38 @@ class ClaudeCodeRouterMCP:
         return RouterResponse.from_moonshot_response(result, ModelProvider.MOONSHOT)
     
     async def _get_cached_response(self, request: RouterRequest) -> Optional[RouterResponse]:
-        """獲取緩存的響應"""
+        """獲取緩存的響應（精確匹配，其次語義近似匹配）"""
         cache_key = self._generate_cache_key(request)
-        cached_data = await self.cache.get(cache_key)
+        cached_data = await self.cache.get(cache_key, namespace=request.model)
         
         if cached_data:
             return RouterResponse(**cached_data)
         
+        if self._is_semantic_cacheable(request):
+            result = self.semantic_cache.get(self._generate_semantic_scope(request), request.messages)
+            if result:
+                cached_data, similarity = result
+                logger.info(f"🧠 語義緩存命中: {request.model} (相似度: {similarity:.3f})")
+                return RouterResponse(**cached_data)
+        
         return None
     
     async def _cache_response(self, request: RouterRequest, response: RouterResponse):
         """緩存響應"""
         cache_key = self._generate_cache_key(request)
-        await self.cache.set(cache_key, asdict(response))
+        response_data = asdict(response)
+        await self.cache.set(cache_key, response_data, namespace=request.model)
+        
+        if self._is_semantic_cacheable(request):
+            self.semantic_cache.set(self._generate_semantic_scope(request), request.messages, response_data)
+    
+    def _is_semantic_cacheable(self, request: RouterRequest) -> bool:
+        """語義緩存僅適用於確定性請求"""
+        return (
+            self.semantic_cache is not None
+            and request.temperature == 0
+            and not request.tools
+        )
     
     def _generate_cache_key(self, request: RouterRequest) -> str:
         """生成緩存鍵"""
@@ -311,6 +684,10 @@ class ClaudeCodeRouterMCP:
         request_str = json.dumps(request_data, sort_keys=True)
         return hashlib.md5(request_str.encode()).hexdigest()
     
+    def _generate_semantic_scope(self, request: RouterRequest) -> str:
+        """語義緩存作用域：除消息外的參數必須完全一致"""
+        return f"{request.model}|{request.max_tokens}|{request.top_p}"
+    
     def _calculate_cost(self, response: RouterResponse, model_config: ModelConfig) -> float:
         """計算請求成本"""
         usage = response.usage
@@ -323,53 +700,31 @@ class ClaudeCodeRouterMCP:
         
         return input_cost + output_cost
     
-    async def _check_rate_limit(self, model_id: str) -> bool:
-        """檢查速率限制"""
-        now = time.time()
-        
-        if model_id not in self.request_counts:
-            self.request_counts[model_id] = []
-        
-        # 清理舊的記錄
-        self.request_counts[model_id] = [
-            timestamp for timestamp in self.request_counts[model_id]
-            if now - timestamp < 60  # 保留最近1分鐘的記錄
-        ]
-        
-        model_config = self.model_manager.get_model_config(model_id)
-        if not model_config:
-            return False
-        
-        # 檢查是否超過限制
-        if len(self.request_counts[model_id]) >= model_config.rate_limit_per_minute:
-            return False
-        
-        # 添加當前請求
-        self.request_counts[model_id].append(now)
-        return True
+    async def _check_rate_limit(self, model_config: ModelConfig, request: RouterRequest):
+        """檢查速率限制（按模型和客戶端的令牌桶，超限時在有界隊列中等待）
+        
+        認證令牌不區分調用方，因此按客戶端限流以請求的user字段為標識；
+        未提供user或未配置 client_rate_limit_per_minute 時只按模型限流。
+        """
+        await self.rate_limiter.acquire({
+            "model": (model_config.model_id, model_config.rate_limit_per_minute),
+            "client": (request.user_id, self.config.client_rate_limit_per_minute)
+        })
     
     async def _update_model_metrics(self, model_id: str, response_time: float, success: bool):
-        """更新模型性能指標"""
+        """更新模型性能指標 (僅內存，由metrics_store異步寫盤)"""
         model_config = self.model_manager.get_model_config(model_id)
         if not model_config:
             return
         
-        # 更新平均響應時間
-        if model_config.avg_response_time == 0:
-            model_config.avg_response_time = response_time
-        else:
-            model_config.avg_response_time = (model_config.avg_response_time * 0.9 + response_time * 0.1)
-        
-        # 更新成功率
-        if success:
-            model_config.success_rate = min(100.0, model_config.success_rate * 0.99 + 1.0)
-        else:
-            model_config.success_rate = max(0.0, model_config.success_rate * 0.99)
-        
-        model_config.last_used = time.time()
-        
-        # 保存更新的配置
-        self.model_manager.save_config()
+        metrics = self.metrics_store.record(model_id, response_time, success)
+        self._apply_model_metrics(model_config, metrics)
+    
+    def _apply_model_metrics(self, model_config: ModelConfig, metrics):
+        """將指標同步到模型配置，供模型選擇使用"""
+        model_config.avg_response_time = metrics.avg_response_time
+        model_config.success_rate = metrics.success_rate
+        model_config.last_used = metrics.last_used
     
     async def _health_check_loop(self):
         """健康檢查循環"""
@@ -382,38 +737,63 @@ class ClaudeCodeRouterMCP:
                 await asyncio.sleep(30)  # 失敗時短暫等待
     
     async def _perform_health_checks(self):
-        """執行健康檢查"""
+        """執行健康檢查：逐個探測模型的端點池，只有全部端點不可用時才禁用模型"""
         enabled_models = self.model_manager.get_enabled_models()
         
         for model_config in enabled_models:
-            try:
-                # 創建簡單的健康檢查請求
-                health_request = RouterRequest(
-                    model=model_config.model_id,
-                    messages=[{"role": "user", "content": "ping"}],
-                    max_tokens=5
-                )
-                
-                start_time = time.time()
-                await self._send_request(health_request, model_config)
-                response_time = time.time() - start_time
-                
-                self.health_status[model_config.model_id] = {
-                    "status": "healthy",
-                    "response_time": response_time,
-                    "last_check": datetime.now().isoformat()
-                }
-                
-            except Exception as e:
-                self.health_status[model_config.model_id] = {
-                    "status": "unhealthy",
-                    "error": str(e),
-                    "last_check": datetime.now().isoformat()
-                }
+            balancer = self._get_load_balancer(model_config)
+            
+            # 創建簡單的健康檢查請求
+            health_request = RouterRequest(
+                model=model_config.model_id,
+                messages=[{"role": "user", "content": "ping"}],
+                max_tokens=5
+            )
+            
+            endpoint_ids = list(balancer.endpoints)
+            results = await asyncio.gather(*[
+                self._probe_endpoint(health_request, endpoint_id) for endpoint_id in endpoint_ids
+            ])
+            
+            endpoint_status = {}
+            for endpoint_id, (response_time, error) in zip(endpoint_ids, results):
+                if error is None:
+                    balancer.mark_endpoint_healthy(endpoint_id)
+                    endpoint_status[endpoint_id] = {"status": "healthy", "response_time": response_time}
+                else:
+                    balancer.mark_endpoint_unhealthy(endpoint_id)
+                    endpoint_status[endpoint_id] = {"status": "unhealthy", "error": str(error)}
+            
+            healthy = [status for status in endpoint_status.values() if status["status"] == "healthy"]
+            health = {
+                "status": "healthy" if len(healthy) == len(endpoint_status) else "degraded",
+                "healthy_endpoints": len(healthy),
+                "total_endpoints": len(endpoint_status),
+                "endpoints": endpoint_status,
+                "last_check": datetime.now().isoformat()
+            }
+            
+            if healthy:
+                health["response_time"] = min(status["response_time"] for status in healthy)
+            else:
+                health["status"] = "unhealthy"
+                health["error"] = next(iter(endpoint_status.values()), {}).get("error", "沒有可用的端點")
                 
-                # 暫時禁用不健康的模型
+                # 全部端點不可用時暫時禁用模型
                 model_config.enabled = False
-                logger.warning(f"模型 {model_config.model_id} 健康檢查失敗，已暫時禁用")
+                logger.warning(f"模型 {model_config.model_id} 所有端點健康檢查失敗，已暫時禁用")
+            
+            self.health_status[model_config.model_id] = health
+    
+    async def _probe_endpoint(self, health_request: RouterRequest,
+                              endpoint_id: str) -> Tuple[float, Optional[Exception]]:
+        """探測單個端點，返回 (響應時間, 錯誤)"""
+        start_time = time.time()
+        try:
+            await self._send_request(health_request, self.endpoint_configs[endpoint_id])
+        except Exception as e:
+            return time.time() - start_time, e
+        return time.time() - start_time, None
     
     async def get_available_models(self) -> List[Dict[str, Any]]:
         """獲取可用模型列表"""
@@ -442,12 +822,21 @@ class ClaudeCodeRouterMCP:
             "successful_requests": self.stats.successful_requests,
             "failed_requests": self.stats.failed_requests,
             "cached_requests": self.stats.cached_requests,
+            "coalesced_requests": self.stats.coalesced_requests,
+            "inflight_requests": len(self.inflight_requests),
+            "rate_limit_stats": self.rate_limiter.get_stats(),
+            "endpoint_stats": {
+                model_id: balancer.get_endpoint_stats()
+                for model_id, balancer in self.load_balancers.items()
+            },
             "success_rate": self.stats.get_success_rate(),
             "cache_hit_rate": self.stats.get_cache_hit_rate(),
             "total_cost": self.stats.total_cost,
             "avg_response_time": self.stats.avg_response_time,
             "model_stats": self.stats.model_stats,
-            "provider_stats": self.stats.provider_stats
+            "provider_stats": self.stats.provider_stats,
+            "cache_stats": self.cache.get_stats(),
+            "semantic_cache_stats": self.semantic_cache.get_stats() if self.semantic_cache else None
         }
     
     async def switch_model(self, from_model: str, to_model: str) -> bool:
@@ -492,6 +881,8 @@ class ClaudeCodeRouterMCP:
                 "multi_model_routing",
                 "intelligent_load_balancing",
                 "request_caching",
+                "request_coalescing",
+                "upstream_streaming",
                 "cost_optimization",
                 "health_monitoring",
                 "rate_limiting",
@@ -510,8 +901,11 @@ class ClaudeCodeRouterMCP:
         if self.health_check_task:
             self.health_check_task.cancel()
         
+        await self.metrics_store.close()
         await self.http_client.aclose()
         await self.cache.close()
+        if self.semantic_cache:
+            self.semantic_cache.clear()
         
         logger.info("🧹 Claude Code Router MCP 清理完成")
 
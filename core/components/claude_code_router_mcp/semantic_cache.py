@@ -0,0 +1,235 @@
+"""
+Claude Code Router MCP - 語義緩存
+基於MinHash/LSH的近似重複請求緩存（第二層緩存）
+"""
+
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Set, Tuple
+from dataclasses import dataclass, field
+import logging
+
+import numpy as np
+
+from .utils import RouterUtils
+
+logger = logging.getLogger(__name__)
+
+# Mersenne素數，用於通用哈希族 (a*x + b) mod p
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+@dataclass
+class SemanticEntry:
+    """語義緩存條目"""
+    entry_id: int
+    scope: str
+    signature: np.ndarray
+    shingles: frozenset
+    anchors: frozenset
+    value: Any
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class SemanticCache:
+    """語義緩存
+
+    將消息規範化後切分為詞級shingle，每個請求只計算一次MinHash簽名，
+    通過LSH分帶索引找出候選條目，以簽名向量化估算相似度排序，
+    再對最優的少數候選以shingle集合的精確Jaccard相似度驗證。
+    含數字的詞（數值、切片邊界、日期、時間、ID）決定答案本身，必須完全一致
+    才算命中。只用於確定性（temperature=0）請求，由調用方保證。
+    """
+
+    def __init__(self, threshold: float = 0.9, max_size: int = 10000, ttl: int = 3600,
+                 num_perm: int = 64, bands: int = 16, shingle_size: int = 3,
+                 verify_top_k: int = 3):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm必須能被bands整除")
+
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.verify_top_k = verify_top_k
+
+        rng = np.random.RandomState(42)
+        self._perm_a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._perm_b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+
+        self.entries: "OrderedDict[int, SemanticEntry]" = OrderedDict()
+        self.buckets: Dict[Tuple[str, int, bytes], Set[int]] = {}
+        self._next_id = 0
+
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "candidates_checked": 0,
+            "similarity_sum": 0.0
+        }
+
+        logger.info(f"🧠 SemanticCache 初始化完成 (閾值: {threshold}, Max Size: {max_size})")
+
+    def _shingle(self, text: str) -> frozenset:
+        """將規範化文本切分為詞級shingle並哈希"""
+        words = text.split()
+        size = self.shingle_size
+        if len(words) < size:
+            grams = [" ".join(words)] if words else []
+        else:
+            grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+        return frozenset(zlib.crc32(gram.encode("utf-8")) for gram in grams)
+
+    def _signature(self, shingles: frozenset) -> np.ndarray:
+        """計算MinHash簽名（向量化）"""
+        if not shingles:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+
+        hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        permuted = (np.outer(hashes, self._perm_a) + self._perm_b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _band_keys(self, scope: str, signature: np.ndarray) -> List[Tuple[str, int, bytes]]:
+        rows = self.rows
+        return [
+            (scope, band, signature[band * rows:(band + 1) * rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def _jaccard(a: frozenset, b: frozenset) -> float:
+        if not a and not b:
+            return 1.0
+        union = len(a | b)
+        return len(a & b) / union if union else 0.0
+
+    @staticmethod
+    def _anchors(text: str) -> frozenset:
+        """必須完全一致的詞：含數字的詞"""
+        return frozenset(word for word in text.split() if any(char.isdigit() for char in word))
+
+    def _prepare(self, messages: List[Dict[str, Any]]) -> Tuple[frozenset, frozenset, np.ndarray]:
+        text = RouterUtils.normalize_messages_text(messages)
+        shingles = self._shingle(text)
+        return shingles, self._anchors(text), self._signature(shingles)
+
+    def get(self, scope: str, messages: List[Dict[str, Any]]) -> Optional[Tuple[Any, float]]:
+        """查找相似請求的緩存響應，返回 (value, similarity)"""
+        self.stats["lookups"] += 1
+        shingles, anchors, signature = self._prepare(messages)
+        now = time.time()
+
+        candidates: Set[int] = set()
+        for band_key in self._band_keys(scope, signature):
+            bucket = self.buckets.get(band_key)
+            if bucket:
+                candidates.update(bucket)
+
+        live_entries = []
+        for entry_id in candidates:
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                continue
+            if now - entry.created_at > self.ttl:
+                self._remove(entry_id)
+                continue
+            if entry.anchors == anchors:
+                live_entries.append(entry)
+
+        best_entry = None
+        best_similarity = 0.0
+        if live_entries:
+            # 以簽名一致比例估算Jaccard（向量化），僅對最優的少數候選做精確驗證
+            signatures = np.stack([entry.signature for entry in live_entries])
+            estimates = (signatures == signature).mean(axis=1)
+            top = np.argsort(-estimates)[:self.verify_top_k]
+            self.stats["candidates_checked"] += len(live_entries)
+
+            for index in top:
+                if estimates[index] < self.threshold - 0.2:
+                    break
+                entry = live_entries[index]
+                similarity = self._jaccard(shingles, entry.shingles)
+                if similarity > best_similarity:
+                    best_entry, best_similarity = entry, similarity
+
+        if best_entry is None or best_similarity < self.threshold:
+            self.stats["misses"] += 1
+            return None
+
+        best_entry.hits += 1
+        self.entries.move_to_end(best_entry.entry_id)
+        self.stats["hits"] += 1
+        self.stats["similarity_sum"] += best_similarity
+
+        logger.debug(f"🧠 語義緩存命中: {scope} (相似度: {best_similarity:.3f})")
+        return best_entry.value, best_similarity
+
+    def set(self, scope: str, messages: List[Dict[str, Any]], value: Any):
+        """存儲請求的響應"""
+        shingles, anchors, signature = self._prepare(messages)
+
+        while len(self.entries) >= self.max_size:
+            oldest_id = next(iter(self.entries))
+            self._remove(oldest_id)
+            self.stats["evictions"] += 1
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self.entries[entry_id] = SemanticEntry(
+            entry_id=entry_id,
+            scope=scope,
+            signature=signature,
+            shingles=shingles,
+            anchors=anchors,
+            value=value
+        )
+        for band_key in self._band_keys(scope, signature):
+            self.buckets.setdefault(band_key, set()).add(entry_id)
+
+        self.stats["stores"] += 1
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+
+        for band_key in self._band_keys(entry.scope, entry.signature):
+            bucket = self.buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[band_key]
+
+    def clear(self):
+        """清空語義緩存"""
+        self.entries.clear()
+        self.buckets.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取語義緩存統計"""
+        lookups = self.stats["lookups"]
+        hits = self.stats["hits"]
+
+        return {
+            "entries": len(self.entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "lookups": lookups,
+            "hits": hits,
+            "misses": self.stats["misses"],
+            "stores": self.stats["stores"],
+            "evictions": self.stats["evictions"],
+            "hit_rate": f"{(hits / lookups * 100) if lookups else 0:.2f}%",
+            "avg_hit_similarity": round(self.stats["similarity_sum"] / hits, 4) if hits else 0.0,
+            "avg_candidates_per_lookup": round(self.stats["candidates_checked"] / lookups, 2) if lookups else 0.0
+        }
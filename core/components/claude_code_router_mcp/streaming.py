@@ -0,0 +1,213 @@
+"""
+Claude Code Router MCP - 流式響應
+將各提供商的SSE增量事件轉換為OpenAI格式的chat.completion.chunk
+"""
+
+import json
+import time
+from typing import Dict, List, Any, Optional, AsyncGenerator, Tuple
+from dataclasses import dataclass, field
+import logging
+
+from .models import ModelProvider, RouterResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamState:
+    """單次流式請求的累積狀態"""
+    id: str
+    model: str
+    provider: ModelProvider
+    created: int = field(default_factory=lambda: int(time.time()))
+    content_parts: List[str] = field(default_factory=list)
+    usage: Dict[str, Any] = field(default_factory=dict)
+    finish_reason: Optional[str] = None
+    role_sent: bool = False
+
+    def make_chunk(self, content: Optional[str] = None,
+                   finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        """生成一個OpenAI格式的增量塊"""
+        delta: Dict[str, Any] = {}
+        if not self.role_sent:
+            delta["role"] = "assistant"
+            self.role_sent = True
+        if content:
+            delta["content"] = content
+            self.content_parts.append(content)
+        if finish_reason:
+            self.finish_reason = finish_reason
+
+        return {
+            "id": self.id,
+            "object": "chat.completion.chunk",
+            "created": self.created,
+            "model": self.model,
+            "choices": [{
+                "index": 0,
+                "delta": delta,
+                "finish_reason": finish_reason
+            }]
+        }
+
+    def to_response(self) -> RouterResponse:
+        """將累積的內容轉換為RouterResponse（用於成本和統計）"""
+        prompt_tokens = self.usage.get("prompt_tokens", 0)
+        completion_tokens = self.usage.get("completion_tokens", 0)
+
+        return RouterResponse(
+            id=self.id,
+            model=self.model,
+            choices=[{
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": "".join(self.content_parts)
+                },
+                "finish_reason": self.finish_reason or "stop"
+            }],
+            usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": self.usage.get("total_tokens", prompt_tokens + completion_tokens)
+            },
+            created=self.created,
+            provider=self.provider
+        )
+
+
+async def iter_sse_events(response) -> AsyncGenerator[Tuple[Optional[str], str], None]:
+    """逐個解析SSE事件 (event, data)
+
+    按需從httpx響應讀取行，消費者不拉取時上游不會繼續讀取，天然形成背壓。
+    """
+    event_type = None
+    data_lines: List[str] = []
+
+    async for line in response.aiter_lines():
+        if line == "":
+            if data_lines:
+                yield event_type, "\n".join(data_lines)
+            event_type = None
+            data_lines = []
+            continue
+
+        if line.startswith(":"):
+            # SSE註釋/心跳
+            continue
+
+        name, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+
+        if name == "event":
+            event_type = value
+        elif name == "data":
+            data_lines.append(value)
+
+    if data_lines:
+        yield event_type, "\n".join(data_lines)
+
+
+def convert_anthropic_event(event_type: Optional[str], data: Dict[str, Any],
+                            state: StreamState) -> List[Dict[str, Any]]:
+    """轉換Anthropic Messages流事件"""
+    event_type = data.get("type", event_type)
+    chunks = []
+
+    if event_type == "message_start":
+        message = data.get("message", {})
+        state.id = message.get("id", state.id)
+        state.usage["prompt_tokens"] = message.get("usage", {}).get("input_tokens", 0)
+    elif event_type == "content_block_delta":
+        delta = data.get("delta", {})
+        if delta.get("type") == "text_delta" and delta.get("text"):
+            chunks.append(state.make_chunk(delta["text"]))
+    elif event_type == "message_delta":
+        usage = data.get("usage", {})
+        if "output_tokens" in usage:
+            state.usage["completion_tokens"] = usage["output_tokens"]
+        stop_reason = data.get("delta", {}).get("stop_reason")
+        if stop_reason:
+            finish_reason = "length" if stop_reason == "max_tokens" else "stop"
+            chunks.append(state.make_chunk(finish_reason=finish_reason))
+    elif event_type == "error":
+        raise Exception(f"Anthropic流錯誤: {data.get('error', {}).get('message', data)}")
+
+    return chunks
+
+
+def convert_openai_event(event_type: Optional[str], data: Dict[str, Any],
+                         state: StreamState) -> List[Dict[str, Any]]:
+    """轉換OpenAI兼容流事件 (OpenAI / Moonshot)"""
+    chunks = []
+    state.id = data.get("id") or state.id
+
+    choices = data.get("choices") or []
+    usage = data.get("usage")
+    if not usage and choices:
+        # Moonshot在最後一個choice中附帶usage
+        usage = choices[0].get("usage")
+    if usage:
+        state.usage.update(usage)
+
+    for choice in choices:
+        content = choice.get("delta", {}).get("content")
+        finish_reason = choice.get("finish_reason")
+        if content or finish_reason:
+            chunks.append(state.make_chunk(content, finish_reason))
+
+    return chunks
+
+
+def convert_google_event(event_type: Optional[str], data: Dict[str, Any],
+                         state: StreamState) -> List[Dict[str, Any]]:
+    """轉換Gemini streamGenerateContent事件"""
+    chunks = []
+
+    usage = data.get("usageMetadata")
+    if usage:
+        state.usage["prompt_tokens"] = usage.get("promptTokenCount", 0)
+        state.usage["completion_tokens"] = usage.get("candidatesTokenCount", 0)
+        state.usage["total_tokens"] = usage.get("totalTokenCount", 0)
+
+    for candidate in data.get("candidates", [])[:1]:
+        parts = candidate.get("content", {}).get("parts", [])
+        text = "".join(part.get("text", "") for part in parts)
+        finish_reason = candidate.get("finishReason")
+        if finish_reason:
+            finish_reason = "length" if finish_reason == "MAX_TOKENS" else "stop"
+        if text or finish_reason:
+            chunks.append(state.make_chunk(text, finish_reason))
+
+    return chunks
+
+
+STREAM_CONVERTERS = {
+    ModelProvider.ANTHROPIC: convert_anthropic_event,
+    ModelProvider.OPENAI: convert_openai_event,
+    ModelProvider.GOOGLE: convert_google_event,
+    ModelProvider.MOONSHOT: convert_openai_event,
+}
+
+
+async def iter_provider_chunks(response, state: StreamState) -> AsyncGenerator[Dict[str, Any], None]:
+    """將提供商SSE響應轉換為OpenAI格式增量塊"""
+    converter = STREAM_CONVERTERS[state.provider]
+
+    async for event_type, raw_data in iter_sse_events(response):
+        if raw_data == "[DONE]":
+            break
+
+        try:
+            data = json.loads(raw_data)
+        except json.JSONDecodeError:
+            logger.debug(f"忽略無法解析的SSE數據: {raw_data[:100]}")
+            continue
+
+        for chunk in converter(event_type, data, state):
+            yield chunk
+
+    if state.finish_reason is None:
+        yield state.make_chunk(finish_reason="stop")
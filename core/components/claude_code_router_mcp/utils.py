@@ -327,6 +327,25 @@ class RouterUtils:
         
         return intersection / union
     
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """規範化文本：小寫、合併空白"""
+        return " ".join(text.lower().split())
+    
+    @staticmethod
+    def normalize_messages_text(messages: List[Dict[str, Any]]) -> str:
+        """將消息列表規範化為單個文本，用於近似重複比較"""
+        parts = []
+        for msg in messages:
+            content = msg.get("content", "")
+            if isinstance(content, list):
+                content = " ".join(
+                    item.get("text", "") for item in content
+                    if isinstance(item, dict) and item.get("type") == "text"
+                )
+            parts.append(f"{msg.get('role', '')}: {RouterUtils.normalize_text(str(content))}")
+        return "\n".join(parts)
+    
     @staticmethod
     async def with_timeout(coro, timeout: float):
         """為協程添加超時"""
@@ -0,0 +1,370 @@
+"""
+Intelligent Error Handler MCP - 單遍AST分析
+一次遍歷收集導入、名稱引用、定義和安全模式，並進行作用域解析
+"""
+
+import ast
+import builtins
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+# 模塊級隱式名稱
+_MODULE_NAMES = frozenset(dir(builtins)) | {
+    "__file__", "__name__", "__doc__", "__package__", "__spec__",
+    "__loader__", "__path__", "__builtins__", "__annotations__", "__cached__"
+}
+
+# 硬編碼敏感信息的名稱片段
+_SECRET_NAMES = ("password", "api_key")
+
+_EVAL_CALLS = {
+    "eval": "使用eval()可能存在安全風險",
+    "exec": "使用exec()可能存在安全風險"
+}
+
+
+@dataclass
+class Scope:
+    """作用域（module / class / function / comprehension）"""
+    kind: str
+    parent: Optional["Scope"] = None
+    bindings: Set[str] = field(default_factory=set)
+    global_names: Set[str] = field(default_factory=set)
+    nonlocal_names: Set[str] = field(default_factory=set)
+    imports: Dict[str, List[Dict]] = field(default_factory=dict)
+    used: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class AnalysisResult:
+    """單個文件的分析結果"""
+    unused_imports: List[Dict] = field(default_factory=list)
+    undefined_names: List[Dict] = field(default_factory=list)
+    security_issues: List[Tuple[int, str]] = field(default_factory=list)
+
+
+class SourceAnalyzer(ast.NodeVisitor):
+    """單遍AST分析器
+
+    遍歷時按作用域記錄綁定和名稱讀取，遍歷結束後統一解析讀取（函數體可以
+    引用模塊後面才定義的名稱）。類作用域對嵌套函數不可見，global/nonlocal
+    聲明按Python規則處理；含 `from x import *` 的模塊不報告未定義名稱。
+    """
+
+    def __init__(self, check_unused_imports: bool = True):
+        self.check_unused_imports = check_unused_imports
+        self.module = Scope("module")
+        self.scope = self.module
+        self.scopes: List[Scope] = [self.module]
+        self.loads: List[Tuple[Scope, str, int, int]] = []
+        self.exported: Set[str] = set()
+        self.star_import = False
+        self.security_issues: List[Tuple[int, str]] = []
+
+    def analyze(self, tree: ast.AST) -> AnalysisResult:
+        self.visit(tree)
+        return self._resolve()
+
+    # ---- 作用域 ----
+
+    def _push(self, kind: str) -> Scope:
+        scope = Scope(kind, parent=self.scope)
+        self.scopes.append(scope)
+        self.scope = scope
+        return scope
+
+    def _pop(self):
+        self.scope = self.scope.parent
+
+    def _binding_scope(self, name: str, walrus: bool = False) -> Scope:
+        """名稱綁定所在的作用域"""
+        scope = self.scope
+        # 推導式中的海象賦值綁定到外層作用域
+        while walrus and scope.kind == "comprehension":
+            scope = scope.parent
+        if name in scope.global_names:
+            return self.module
+        return scope
+
+    def _bind(self, name: str, walrus: bool = False):
+        scope = self._binding_scope(name, walrus)
+        if name not in scope.nonlocal_names:
+            scope.bindings.add(name)
+
+    def _load(self, name: str, node: ast.AST):
+        self.loads.append((self.scope, name, node.lineno, node.col_offset))
+
+    # ---- 綁定和讀取 ----
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Load):
+            self._load(node.id, node)
+        else:
+            self._bind(node.id)
+
+    def visit_Global(self, node: ast.Global):
+        self.scope.global_names.update(node.names)
+        self.module.bindings.update(node.names)
+
+    def visit_Nonlocal(self, node: ast.Nonlocal):
+        self.scope.nonlocal_names.update(node.names)
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            # import a.b 綁定的是 a
+            bound = alias.asname or alias.name.split(".")[0]
+            self._record_import(bound, {
+                "name": alias.name,
+                "asname": alias.asname,
+                "line": node.lineno
+            })
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        for alias in node.names:
+            if alias.name == "*":
+                self.star_import = True
+                continue
+            if node.module == "__future__":
+                continue
+            self._record_import(alias.asname or alias.name, {
+                "name": alias.name,
+                "asname": alias.asname,
+                "line": node.lineno,
+                "module": node.module
+            })
+
+    def _record_import(self, bound: str, info: Dict):
+        scope = self._binding_scope(bound)
+        scope.bindings.add(bound)
+        scope.imports.setdefault(bound, []).append(info)
+
+    def visit_NamedExpr(self, node: ast.NamedExpr):
+        self.visit(node.value)
+        self._bind(node.target.id, walrus=True)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        if node.type is not None:
+            self.visit(node.type)
+        if node.name:
+            self._bind(node.name)
+        for statement in node.body:
+            self.visit(statement)
+
+    def visit_MatchAs(self, node: ast.MatchAs):
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node: ast.MatchStar):
+        if node.name:
+            self._bind(node.name)
+
+    def visit_MatchMapping(self, node: ast.MatchMapping):
+        if node.rest:
+            self._bind(node.rest)
+        self.generic_visit(node)
+
+    def visit_Assign(self, node: ast.Assign):
+        self.visit(node.value)
+        for target in node.targets:
+            self.visit(target)
+            self._check_secret(target, node.value, node.lineno)
+            # 記錄 __all__ 導出的名稱
+            if self.scope is self.module and isinstance(target, ast.Name) and target.id == "__all__":
+                self._collect_exports(node.value)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        self._visit_annotation(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+            self._check_secret(node.target, node.value, node.lineno)
+        self.visit(node.target)
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        self.visit(node.value)
+        if isinstance(node.target, ast.Name):
+            # x += 1 既讀取又綁定
+            self._load(node.target.id, node.target)
+            self._bind(node.target.id)
+        else:
+            self.visit(node.target)
+
+    def _collect_exports(self, value: ast.AST):
+        if isinstance(value, (ast.List, ast.Tuple)):
+            for element in value.elts:
+                if isinstance(element, ast.Constant) and isinstance(element.value, str):
+                    self.exported.add(element.value)
+
+    def _visit_annotation(self, annotation: Optional[ast.AST]):
+        """訪問註解；字符串形式的前向引用也按表達式解析"""
+        if annotation is None:
+            return
+        if isinstance(annotation, ast.Constant) and isinstance(annotation.value, str):
+            try:
+                expression = ast.parse(annotation.value, mode="eval")
+            except SyntaxError:
+                return
+            for node in ast.walk(expression):
+                if isinstance(node, ast.Name):
+                    self.loads.append((self.scope, node.id, annotation.lineno, annotation.col_offset))
+            return
+        self.visit(annotation)
+
+    # ---- 作用域節點 ----
+
+    def _visit_arguments(self, args: ast.arguments):
+        """默認值和註解在外層作用域求值"""
+        for default in args.defaults + [d for d in args.kw_defaults if d is not None]:
+            self.visit(default)
+        for arg in self._all_args(args):
+            self._visit_annotation(arg.annotation)
+
+    @staticmethod
+    def _all_args(args: ast.arguments) -> List[ast.arg]:
+        result = args.posonlyargs + args.args + args.kwonlyargs
+        if args.vararg:
+            result.append(args.vararg)
+        if args.kwarg:
+            result.append(args.kwarg)
+        return result
+
+    def _visit_function(self, node):
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self._visit_arguments(node.args)
+        self._visit_annotation(node.returns)
+        self._bind(node.name)
+
+        self._push("function")
+        for arg in self._all_args(node.args):
+            self.scope.bindings.add(arg.arg)
+        for statement in node.body:
+            self.visit(statement)
+        self._pop()
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_Lambda(self, node: ast.Lambda):
+        self._visit_arguments(node.args)
+        self._push("function")
+        for arg in self._all_args(node.args):
+            self.scope.bindings.add(arg.arg)
+        self.visit(node.body)
+        self._pop()
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        for base in node.bases:
+            self.visit(base)
+        for keyword in node.keywords:
+            self.visit(keyword.value)
+        self._bind(node.name)
+
+        self._push("class")
+        for statement in node.body:
+            self.visit(statement)
+        self._pop()
+
+    def _visit_comprehension(self, node):
+        # 第一個迭代器在外層作用域求值
+        self.visit(node.generators[0].iter)
+        self._push("comprehension")
+        for index, generator in enumerate(node.generators):
+            self.visit(generator.target)
+            if index > 0:
+                self.visit(generator.iter)
+            for condition in generator.ifs:
+                self.visit(condition)
+        if isinstance(node, ast.DictComp):
+            self.visit(node.key)
+            self.visit(node.value)
+        else:
+            self.visit(node.elt)
+        self._pop()
+
+    visit_ListComp = _visit_comprehension
+    visit_SetComp = _visit_comprehension
+    visit_DictComp = _visit_comprehension
+    visit_GeneratorExp = _visit_comprehension
+
+    # ---- 安全模式 ----
+
+    def visit_Call(self, node: ast.Call):
+        func = node.func
+        if isinstance(func, ast.Name) and func.id in _EVAL_CALLS:
+            self.security_issues.append((node.lineno, _EVAL_CALLS[func.id]))
+        elif (isinstance(func, ast.Attribute) and func.attr == "call"
+              and isinstance(func.value, ast.Name) and func.value.id == "subprocess"):
+            self.security_issues.append((node.lineno, "使用subprocess可能存在注入風險"))
+
+        for keyword in node.keywords:
+            if keyword.arg and self._is_secret_literal(keyword.arg, keyword.value):
+                self.security_issues.append((keyword.value.lineno, self._secret_message(keyword.arg)))
+
+        self.generic_visit(node)
+
+    def _check_secret(self, target: ast.AST, value: ast.AST, line: int):
+        if isinstance(target, ast.Name):
+            name = target.id
+        elif isinstance(target, ast.Attribute):
+            name = target.attr
+        else:
+            return
+        if self._is_secret_literal(name, value):
+            self.security_issues.append((line, self._secret_message(name)))
+
+    @staticmethod
+    def _is_secret_literal(name: str, value: ast.AST) -> bool:
+        lowered = name.lower()
+        return (
+            any(fragment in lowered for fragment in _SECRET_NAMES)
+            and isinstance(value, ast.Constant)
+            and isinstance(value.value, str)
+            and value.value != ""
+        )
+
+    @staticmethod
+    def _secret_message(name: str) -> str:
+        return "硬編碼密碼" if "password" in name.lower() else "硬編碼API密鑰"
+
+    # ---- 解析 ----
+
+    def _resolve(self) -> AnalysisResult:
+        result = AnalysisResult(security_issues=self.security_issues)
+
+        for scope, name, line, col in self.loads:
+            owner = self._lookup(scope, name)
+            if owner is not None:
+                owner.used.add(name)
+            elif not self.star_import and name not in _MODULE_NAMES:
+                result.undefined_names.append({"name": name, "line": line, "col": col})
+
+        if self.check_unused_imports:
+            self.module.used.update(self.exported)
+            for scope in self.scopes:
+                for bound, imports in scope.imports.items():
+                    if bound not in scope.used:
+                        result.unused_imports.extend(imports)
+            result.unused_imports.sort(key=lambda item: item["line"])
+
+        return result
+
+    def _lookup(self, scope: Scope, name: str) -> Optional[Scope]:
+        """按LEGB規則查找綁定名稱的作用域"""
+        if name in scope.global_names:
+            return self.module if name in self.module.bindings else None
+
+        current = scope
+        while current is not None:
+            # 類作用域只對其直接的代碼可見
+            if (current is scope or current.kind != "class") and name in current.bindings:
+                return current
+            current = current.parent
+        return None
+
+
+def analyze_tree(tree: ast.AST, check_unused_imports: bool = True) -> AnalysisResult:
+    """對已解析的AST執行單遍分析"""
+    return SourceAnalyzer(check_unused_imports).analyze(tree)
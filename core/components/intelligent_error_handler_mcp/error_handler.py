@@ -14,9 +14,12 @@ PowerAutomation v4.6.1 核心競爭優勢組件
 import asyncio
 import logging
 import ast
+import os
 import traceback
 import re
 import json
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple, Set
 from dataclasses import dataclass, asdict
@@ -25,6 +28,8 @@ from pathlib import Path
 import subprocess
 import sys
 
+from .ast_analysis import AnalysisResult, analyze_tree
+
 logger = logging.getLogger(__name__)
 
 
@@ -116,6 +121,16 @@ class ProjectHealthReport:
     recommendations: List[str]
 
 
+# 逐行安全檢查模式（僅用於存在語法錯誤的文件）
+_LINE_SECURITY_PATTERNS = [
+    (re.compile(r'eval\s*\(', re.IGNORECASE), "使用eval()可能存在安全風險"),
+    (re.compile(r'exec\s*\(', re.IGNORECASE), "使用exec()可能存在安全風險"),
+    (re.compile(r'password\s*=\s*["\'].*["\']', re.IGNORECASE), "硬編碼密碼"),
+    (re.compile(r'api_key\s*=\s*["\'].*["\']', re.IGNORECASE), "硬編碼API密鑰"),
+    (re.compile(r'subprocess\.call\s*\(', re.IGNORECASE), "使用subprocess可能存在注入風險")
+]
+
+
 class CodeAnalyzer:
     """代碼分析器"""
     
@@ -124,107 +139,94 @@ class CodeAnalyzer:
     
     async def analyze_file(self, file_path: Path) -> List[ErrorDetail]:
         """分析單個文件"""
-        errors = []
-        
         try:
             # 讀取文件內容
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # 語法分析
-            syntax_errors = await self._check_syntax_errors(file_path, content)
-            errors.extend(syntax_errors)
-            
-            # 靜態分析
-            static_errors = await self._static_analysis(file_path, content)
-            errors.extend(static_errors)
-            
-            # 代碼質量檢查
-            quality_errors = await self._code_quality_check(file_path, content)
-            errors.extend(quality_errors)
-            
-            # 安全檢查
-            security_errors = await self._security_check(file_path, content)
-            errors.extend(security_errors)
+            return self.analyze_source(file_path, content)
             
         except Exception as e:
             self.logger.error(f"文件分析失敗 {file_path}: {e}")
-            
-        return errors
+            return []
     
-    async def _check_syntax_errors(self, file_path: Path, content: str) -> List[ErrorDetail]:
-        """檢查語法錯誤"""
+    def analyze_source(self, file_path: Path, content: str) -> List[ErrorDetail]:
+        """分析源碼：解析一次AST，單遍收集靜態分析和安全問題"""
         errors = []
+        lines = content.split('\n')
         
         try:
-            # 嘗試解析AST
-            ast.parse(content)
+            tree = ast.parse(content)
         except SyntaxError as e:
-            error = ErrorDetail(
-                id=f"syntax_{file_path.stem}_{e.lineno}",
-                file_path=str(file_path),
-                line_number=e.lineno or 1,
-                column_number=e.offset or 1,
-                error_type="SyntaxError",
-                error_message=e.msg,
-                category=ErrorCategory.SYNTAX_ERROR,
-                severity=ErrorSeverity.CRITICAL,
-                context_code=self._get_context_code(content, e.lineno or 1)
-            )
-            errors.append(error)
+            # 語法錯誤：無法做AST分析，安全檢查退回逐行模式
+            errors.append(self._syntax_error(file_path, e, lines))
+            errors.extend(self._code_quality_check(file_path, lines))
+            errors.extend(self._line_security_check(file_path, lines))
+            return errors
+        
+        # __init__.py 中的導入通常是重新導出
+        result = analyze_tree(tree, check_unused_imports=file_path.name != "__init__.py")
+        
+        errors.extend(self._static_analysis(file_path, result, lines))
+        errors.extend(self._code_quality_check(file_path, lines))
+        errors.extend(self._security_check(file_path, result, lines))
         
         return errors
     
-    async def _static_analysis(self, file_path: Path, content: str) -> List[ErrorDetail]:
+    def _syntax_error(self, file_path: Path, e: SyntaxError, lines: List[str]) -> ErrorDetail:
+        """語法錯誤"""
+        return ErrorDetail(
+            id=f"syntax_{file_path.stem}_{e.lineno}",
+            file_path=str(file_path),
+            line_number=e.lineno or 1,
+            column_number=e.offset or 1,
+            error_type="SyntaxError",
+            error_message=e.msg,
+            category=ErrorCategory.SYNTAX_ERROR,
+            severity=ErrorSeverity.CRITICAL,
+            context_code=self._get_context_code(lines, e.lineno or 1)
+        )
+    
+    def _static_analysis(self, file_path: Path, result: AnalysisResult, lines: List[str]) -> List[ErrorDetail]:
         """靜態分析"""
         errors = []
         
-        try:
-            tree = ast.parse(content)
-            
-            # 檢查未使用的導入
-            unused_imports = self._find_unused_imports(tree, content)
-            for imp in unused_imports:
-                error = ErrorDetail(
-                    id=f"unused_import_{file_path.stem}_{imp['line']}",
-                    file_path=str(file_path),
-                    line_number=imp['line'],
-                    column_number=1,
-                    error_type="UnusedImport",
-                    error_message=f"未使用的導入: {imp['name']}",
-                    category=ErrorCategory.LOGIC_ERROR,
-                    severity=ErrorSeverity.LOW,
-                    context_code=self._get_context_code(content, imp['line'])
-                )
-                errors.append(error)
-            
-            # 檢查未定義變量
-            undefined_vars = self._find_undefined_variables(tree)
-            for var in undefined_vars:
-                error = ErrorDetail(
-                    id=f"undefined_var_{file_path.stem}_{var['line']}",
-                    file_path=str(file_path),
-                    line_number=var['line'],
-                    column_number=var['col'],
-                    error_type="NameError",
-                    error_message=f"未定義的變量: {var['name']}",
-                    category=ErrorCategory.RUNTIME_ERROR,
-                    severity=ErrorSeverity.HIGH,
-                    context_code=self._get_context_code(content, var['line'])
-                )
-                errors.append(error)
-                
-        except Exception as e:
-            self.logger.warning(f"靜態分析失敗 {file_path}: {e}")
+        # 未使用的導入
+        for imp in result.unused_imports:
+            error = ErrorDetail(
+                id=f"unused_import_{file_path.stem}_{imp['line']}",
+                file_path=str(file_path),
+                line_number=imp['line'],
+                column_number=1,
+                error_type="UnusedImport",
+                error_message=f"未使用的導入: {imp['name']}",
+                category=ErrorCategory.LOGIC_ERROR,
+                severity=ErrorSeverity.LOW,
+                context_code=self._get_context_code(lines, imp['line'])
+            )
+            errors.append(error)
+        
+        # 未定義變量
+        for var in result.undefined_names:
+            error = ErrorDetail(
+                id=f"undefined_var_{file_path.stem}_{var['line']}",
+                file_path=str(file_path),
+                line_number=var['line'],
+                column_number=var['col'],
+                error_type="NameError",
+                error_message=f"未定義的變量: {var['name']}",
+                category=ErrorCategory.RUNTIME_ERROR,
+                severity=ErrorSeverity.HIGH,
+                context_code=self._get_context_code(lines, var['line'])
+            )
+            errors.append(error)
         
         return errors
     
-    async def _code_quality_check(self, file_path: Path, content: str) -> List[ErrorDetail]:
+    def _code_quality_check(self, file_path: Path, lines: List[str]) -> List[ErrorDetail]:
         """代碼質量檢查"""
         errors = []
         
-        lines = content.split('\n')
-        
         for i, line in enumerate(lines, 1):
             # 檢查行長度
             if len(line) > 120:
@@ -258,41 +260,40 @@ class CodeAnalyzer:
         
         return errors
     
-    async def _security_check(self, file_path: Path, content: str) -> List[ErrorDetail]:
-        """安全檢查"""
-        errors = []
-        
-        # 檢查潛在的安全問題
-        security_patterns = [
-            (r'eval\s*\(', "使用eval()可能存在安全風險"),
-            (r'exec\s*\(', "使用exec()可能存在安全風險"),
-            (r'password\s*=\s*["\'].*["\']', "硬編碼密碼"),
-            (r'api_key\s*=\s*["\'].*["\']', "硬編碼API密鑰"),
-            (r'subprocess\.call\s*\(', "使用subprocess可能存在注入風險")
+    def _security_check(self, file_path: Path, result: AnalysisResult, lines: List[str]) -> List[ErrorDetail]:
+        """安全檢查（AST遍歷中收集的調用和賦值）"""
+        return [
+            self._security_error(file_path, line_number, message, lines)
+            for line_number, message in result.security_issues
         ]
+    
+    def _line_security_check(self, file_path: Path, lines: List[str]) -> List[ErrorDetail]:
+        """逐行正則安全檢查（無法解析AST時使用）"""
+        errors = []
         
-        lines = content.split('\n')
         for i, line in enumerate(lines, 1):
-            for pattern, message in security_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    error = ErrorDetail(
-                        id=f"security_{file_path.stem}_{i}",
-                        file_path=str(file_path),
-                        line_number=i,
-                        column_number=1,
-                        error_type="SecurityIssue",
-                        error_message=message,
-                        category=ErrorCategory.SECURITY_ERROR,
-                        severity=ErrorSeverity.HIGH,
-                        context_code=line.strip()
-                    )
-                    errors.append(error)
+            for pattern, message in _LINE_SECURITY_PATTERNS:
+                if pattern.search(line):
+                    errors.append(self._security_error(file_path, i, message, lines))
         
         return errors
     
-    def _get_context_code(self, content: str, line_number: int, context_lines: int = 3) -> str:
+    def _security_error(self, file_path: Path, line_number: int, message: str, lines: List[str]) -> ErrorDetail:
+        line = lines[line_number - 1] if 0 < line_number <= len(lines) else ""
+        return ErrorDetail(
+            id=f"security_{file_path.stem}_{line_number}",
+            file_path=str(file_path),
+            line_number=line_number,
+            column_number=1,
+            error_type="SecurityIssue",
+            error_message=message,
+            category=ErrorCategory.SECURITY_ERROR,
+            severity=ErrorSeverity.HIGH,
+            context_code=line.strip()
+        )
+    
+    def _get_context_code(self, lines: List[str], line_number: int, context_lines: int = 3) -> str:
         """獲取錯誤上下文代碼"""
-        lines = content.split('\n')
         start = max(0, line_number - context_lines - 1)
         end = min(len(lines), line_number + context_lines)
         
@@ -302,86 +303,6 @@ class CodeAnalyzer:
             context.append(f"{prefix}{i+1:4d}: {lines[i]}")
         
         return '\n'.join(context)
-    
-    def _find_unused_imports(self, tree: ast.AST, content: str) -> List[Dict[str, Any]]:
-        """查找未使用的導入"""
-        unused_imports = []
-        
-        # 收集所有導入
-        imports = []
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    imports.append({
-                        'name': alias.name,
-                        'asname': alias.asname,
-                        'line': node.lineno
-                    })
-            elif isinstance(node, ast.ImportFrom):
-                for alias in node.names:
-                    imports.append({
-                        'name': alias.name,
-                        'asname': alias.asname,
-                        'line': node.lineno,
-                        'module': node.module
-                    })
-        
-        # 檢查是否使用
-        for imp in imports:
-            name = imp.get('asname') or imp['name']
-            if name != '*' and not self._is_name_used(tree, name):
-                unused_imports.append(imp)
-        
-        return unused_imports
-    
-    def _is_name_used(self, tree: ast.AST, name: str) -> bool:
-        """檢查名稱是否被使用"""
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Name) and node.id == name:
-                return True
-            elif isinstance(node, ast.Attribute) and node.attr == name:
-                return True
-        return False
-    
-    def _find_undefined_variables(self, tree: ast.AST) -> List[Dict[str, Any]]:
-        """查找未定義的變量"""
-        undefined_vars = []
-        
-        # 簡化的實現，實際應該進行更複雜的作用域分析
-        defined_names = set()
-        
-        # 收集定義的名稱
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
-                defined_names.add(node.name)
-            elif isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name):
-                        defined_names.add(target.id)
-        
-        # 檢查使用的名稱
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
-                if node.id not in defined_names and not self._is_builtin(node.id):
-                    undefined_vars.append({
-                        'name': node.id,
-                        'line': node.lineno,
-                        'col': node.col_offset
-                    })
-        
-        return undefined_vars
-    
-    def _is_builtin(self, name: str) -> bool:
-        """檢查是否為內建函數或常見導入"""
-        builtins = {
-            'print', 'len', 'str', 'int', 'float', 'list', 'dict', 'set', 'tuple',
-            'range', 'enumerate', 'zip', 'map', 'filter', 'sum', 'max', 'min',
-            'abs', 'round', 'sorted', 'reversed', 'any', 'all', 'type', 'isinstance',
-            'hasattr', 'getattr', 'setattr', 'delattr', 'callable', 'iter', 'next',
-            'open', 'input', 'format', 'repr', 'eval', 'exec', 'compile', 'globals',
-            'locals', 'vars', 'dir', 'help', '__import__', 'reload', 'super'
-        }
-        return name in builtins
 
 
 class IntelligentErrorFixer:
@@ -547,6 +468,10 @@ class IntelligentErrorHandlerMCP:
         self.fixer = IntelligentErrorFixer()
         self.error_history = []
         self.learning_data = {}
+        
+        # 掃描並行度：文件數達到閾值時分發到進程池
+        self.max_workers = os.cpu_count() or 1
+        self.parallel_threshold = 16
     
     async def initialize(self):
         """初始化智能錯誤處理MCP"""
@@ -567,29 +492,19 @@ class IntelligentErrorHandlerMCP:
         project_path = Path(project_path)
         all_errors = []
         all_fixes = []
-        scanned_files = 0
         
-        # 遍歷所有Python文件
-        for pattern in file_patterns:
-            for file_path in project_path.glob(pattern):
-                if file_path.is_file():
-                    self.logger.debug(f"分析文件: {file_path}")
-                    
-                    # 分析文件錯誤
-                    file_errors = await self.analyzer.analyze_file(file_path)
-                    all_errors.extend(file_errors)
-                    
-                    # 生成修復方案
-                    if file_errors:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        
-                        for error in file_errors:
-                            fix = await self.fixer.generate_fix(error, content)
-                            if fix:
-                                all_fixes.append(fix)
-                    
-                    scanned_files += 1
+        # 遍歷所有Python文件（多個模式匹配到的同一文件只掃描一次）
+        files = list(dict.fromkeys(
+            file_path
+            for pattern in file_patterns
+            for file_path in project_path.glob(pattern)
+            if file_path.is_file()
+        ))
+        scanned_files = len(files)
+        
+        for file_errors, file_fixes in await self._scan_files(files):
+            all_errors.extend(file_errors)
+            all_fixes.extend(file_fixes)
         
         # 生成健康報告
         report = self._generate_health_report(project_path, all_errors, all_fixes, scanned_files)
@@ -601,6 +516,29 @@ class IntelligentErrorHandlerMCP:
         
         return report
     
+    async def _scan_files(self, files: List[Path]) -> List[Tuple[List[ErrorDetail], List[ErrorFix]]]:
+        """分析文件並生成修復方案；文件較多時按塊分發到進程池"""
+        workers = min(self.max_workers, len(files))
+        if workers > 1 and len(files) >= self.parallel_threshold:
+            chunk_size = max(1, min(32, len(files) // (workers * 4)))
+            chunks = [
+                [str(file_path) for file_path in files[i:i + chunk_size]]
+                for i in range(0, len(files), chunk_size)
+            ]
+            
+            try:
+                loop = asyncio.get_running_loop()
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    chunk_results = await asyncio.gather(*[
+                        loop.run_in_executor(executor, _scan_files_worker, chunk)
+                        for chunk in chunks
+                    ])
+                return [result for chunk_result in chunk_results for result in chunk_result]
+            except (BrokenProcessPool, OSError) as e:
+                self.logger.warning(f"進程池掃描失敗，改為串行掃描: {e}")
+        
+        return [await _scan_file(self.analyzer, self.fixer, file_path) for file_path in files]
+    
     async def auto_fix_errors(self, project_path: str, confidence_threshold: FixConfidence = FixConfidence.HIGH) -> Dict[str, Any]:
         """自動修復錯誤"""
         self.logger.info(f"🔧 開始自動修復錯誤: {project_path}")
@@ -838,6 +776,43 @@ class IntelligentErrorHandlerMCP:
         }
 
 
+async def _scan_file(analyzer: CodeAnalyzer, fixer: IntelligentErrorFixer,
+                     file_path: Path) -> Tuple[List[ErrorDetail], List[ErrorFix]]:
+    """分析單個文件並生成修復方案（文件只讀取一次）"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except Exception as e:
+        logger.error(f"文件分析失敗 {file_path}: {e}")
+        return [], []
+    
+    # 解析器在病態輸入上可能拋出 MemoryError/RecursionError，單個文件失敗不影響整個掃描
+    try:
+        errors = analyzer.analyze_source(file_path, content)
+        
+        fixes = []
+        for error in errors:
+            fix = await fixer.generate_fix(error, content)
+            if fix:
+                fixes.append(fix)
+    except Exception as e:
+        logger.error(f"文件分析失敗 {file_path}: {type(e).__name__}: {e}")
+        return [], []
+    
+    return errors, fixes
+
+
+def _scan_files_worker(paths: List[str]) -> List[Tuple[List[ErrorDetail], List[ErrorFix]]]:
+    """進程池工作函數：掃描一塊文件"""
+    analyzer = CodeAnalyzer()
+    fixer = IntelligentErrorFixer()
+    
+    async def scan():
+        return [await _scan_file(analyzer, fixer, Path(path)) for path in paths]
+    
+    return asyncio.run(scan())
+
+
 # 單例實例
 intelligent_error_handler_mcp = IntelligentErrorHandlerMCP()
 
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+MemoryOS MCP - 近重複聚類
+基於MinHash/LSH的記憶和上下文聚類，每個文本只哈希一次
+"""
+
+import zlib
+import logging
+from typing import Callable, Dict, FrozenSet, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mersenne素數，用於通用哈希族 (a*x + b) mod p
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def word_set(text: str) -> FrozenSet[int]:
+    """將文本切分為小寫詞並哈希為整數集合"""
+    return frozenset(zlib.crc32(word.encode("utf-8")) for word in text.lower().split())
+
+
+class MinHashClusterer:
+    """MinHash/LSH聚類器
+
+    每個詞集合計算一次MinHash簽名並按LSH分帶入桶；聚類時每個種子只檢查
+    與其共享桶的候選，先以簽名一致比例向量化篩選，再用精確Jaccard驗證。
+    分組語義與逐對比較一致：按輸入順序取種子，吸收所有尚未分組且
+    相似度超過閾值的候選。
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, estimate_margin: float = 0.15, seed: int = 42):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm必須能被bands整除")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.estimate_margin = estimate_margin
+
+        rng = np.random.RandomState(seed)
+        self._perm_a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._perm_b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+
+        self.stats = {
+            "items": 0,
+            "candidate_pairs": 0,
+            "verified_pairs": 0
+        }
+
+    def signatures(self, sets: Sequence[FrozenSet[int]]) -> np.ndarray:
+        """計算所有集合的MinHash簽名矩陣 (n, num_perm)"""
+        result = np.full((len(sets), self.num_perm), _MAX_HASH, dtype=np.uint64)
+        for index, hashes in enumerate(sets):
+            if not hashes:
+                continue
+            values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+            permuted = (np.outer(values, self._perm_a) + self._perm_b) % _MERSENNE_PRIME & _MAX_HASH
+            result[index] = permuted.min(axis=0)
+        return result
+
+    def cluster(self,
+                sets: Sequence[FrozenSet[int]],
+                threshold: float,
+                scopes: Optional[Sequence[Hashable]] = None,
+                weight: Optional[Callable[[int, np.ndarray], np.ndarray]] = None) -> List[List[int]]:
+        """聚類，返回索引分組（只包含兩個及以上成員的組）
+
+        scopes: 只有相同scope的項目才會被比較（例如記憶類型）
+        weight: weight(seed, candidates) 返回 [0, 1] 的相似度乘數（例如時間接近性）
+        """
+        n = len(sets)
+        self.stats["items"] += n
+        if n < 2:
+            return []
+
+        signatures = self.signatures(sets)
+        rows = self.rows
+
+        buckets: Dict[Tuple[Hashable, int, bytes], List[int]] = {}
+        band_keys: List[List[Tuple[Hashable, int, bytes]]] = []
+        for index in range(n):
+            if not sets[index]:
+                band_keys.append([])
+                continue
+            scope = scopes[index] if scopes is not None else None
+            keys = [
+                (scope, band, signatures[index, band * rows:(band + 1) * rows].tobytes())
+                for band in range(self.bands)
+            ]
+            band_keys.append(keys)
+            for key in keys:
+                buckets.setdefault(key, []).append(index)
+
+        grouped = np.zeros(n, dtype=bool)
+        groups: List[List[int]] = []
+
+        for seed in range(n):
+            if grouped[seed] or not band_keys[seed]:
+                continue
+            grouped[seed] = True
+
+            candidates = {
+                other for key in band_keys[seed] for other in buckets[key]
+                if other != seed
+            }
+            if not candidates:
+                continue
+
+            candidate_array = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            candidate_array = candidate_array[~grouped[candidate_array]]
+            if len(candidate_array) == 0:
+                continue
+            candidate_array.sort()
+            self.stats["candidate_pairs"] += len(candidate_array)
+
+            # 向量化估算Jaccard，過濾明顯不相似的候選
+            estimates = (signatures[candidate_array] == signatures[seed]).mean(axis=1)
+            factors = weight(seed, candidate_array) if weight is not None else np.ones(len(candidate_array))
+            keep = estimates * factors > threshold - self.estimate_margin
+            candidate_array = candidate_array[keep]
+            factors = factors[keep]
+
+            group = [seed]
+            seed_set = sets[seed]
+            for other, factor in zip(candidate_array.tolist(), factors.tolist()):
+                other_set = sets[other]
+                self.stats["verified_pairs"] += 1
+                intersection = len(seed_set & other_set)
+                similarity = intersection / (len(seed_set) + len(other_set) - intersection)
+                if similarity * factor > threshold:
+                    group.append(other)
+                    grouped[other] = True
+
+            if len(group) > 1:
+                groups.append(group)
+
+        return groups
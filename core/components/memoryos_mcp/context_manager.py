@@ -7,15 +7,20 @@ MemoryOS MCP - 上下文管理器
 import asyncio
 import json
 import time
+import heapq
 import logging
-from typing import Dict, List, Any, Optional, Union
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Any, Optional, Set, FrozenSet, Union
+from dataclasses import dataclass, asdict, field
 from enum import Enum
 import uuid
 from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 
+def _tokenize(text: str) -> FrozenSet[str]:
+    """將文本切分為小寫詞集合（倒排索引和相關性計算共用）"""
+    return frozenset(text.lower().split())
+
 class ContextType(Enum):
     """上下文類型"""
     SESSION = "session"           # 會話上下文
@@ -49,19 +54,29 @@ class ContextWindow:
     context_items: List[ContextItem]
     max_size: int
     current_focus: Optional[str] = None
+    item_terms: Dict[str, FrozenSet[str]] = field(default_factory=dict, repr=False)
     
-    def add_item(self, item: ContextItem):
+    def add_item(self, item: ContextItem, terms: Optional[FrozenSet[str]] = None):
         """添加上下文項目"""
         self.context_items.append(item)
+        self.item_terms[item.id] = terms if terms is not None else _tokenize(item.content)
         if len(self.context_items) > self.max_size:
             # 移除最舊的項目
-            self.context_items.pop(0)
+            removed = self.context_items.pop(0)
+            self.item_terms.pop(removed.id, None)
     
     def get_relevant_items(self, query: str, limit: int = 5) -> List[ContextItem]:
-        """獲取相關上下文項目"""
+        """獲取相關上下文項目（包含查詢中所有詞的項目）"""
+        query_terms = _tokenize(query)
+        if not query_terms:
+            return []
+        
         relevant_items = []
         for item in self.context_items:
-            if query.lower() in item.content.lower():
+            terms = self.item_terms.get(item.id)
+            if terms is None:
+                terms = self.item_terms[item.id] = _tokenize(item.content)
+            if query_terms <= terms:
                 relevant_items.append(item)
         
         # 按相關性排序
@@ -79,6 +94,10 @@ class ContextManager:
         self.context_relationships: Dict[str, List[str]] = defaultdict(list)
         self.context_transitions: Dict[str, Dict[str, int]] = defaultdict(dict)
         
+        # 倒排索引：詞 -> 上下文ID，以及每個上下文緩存的詞集合
+        self.term_index: Dict[str, Set[str]] = defaultdict(set)
+        self.context_terms: Dict[str, FrozenSet[str]] = {}
+        
     async def initialize(self):
         """初始化上下文管理器"""
         logger.info("🔄 初始化 ContextManager...")
@@ -108,6 +127,7 @@ class ContextManager:
         )
         
         self.contexts[context_id] = context_item
+        self._index_context(context_item)
         
         # 建立父子關係
         if parent_context_id and parent_context_id in self.contexts:
@@ -238,44 +258,76 @@ class ContextManager:
                                         query: str,
                                         context_type: Optional[ContextType] = None,
                                         limit: int = 5) -> List[ContextItem]:
-        """獲取上下文推薦"""
-        candidates = []
+        """獲取上下文推薦（只對與查詢共享詞的候選計分）"""
+        query_words = _tokenize(query)
+        query_lower = query.lower()
+        current_time = time.time()
         
-        for context in self.contexts.values():
+        candidate_ids: Set[str] = set()
+        for word in query_words:
+            candidate_ids.update(self.term_index.get(word, ()))
+        
+        candidates = []
+        for context_id in candidate_ids:
+            context = self.contexts[context_id]
             if context_type and context.context_type != context_type:
                 continue
             
             # 計算相關性分數
-            relevance_score = await self._calculate_context_relevance(context, query)
+            relevance_score = self._score_context(context, query_lower, query_words, current_time)
             
             if relevance_score > 0.1:  # 最低相關性閾值
                 candidates.append((context, relevance_score))
         
         # 按相關性排序
-        candidates.sort(key=lambda x: x[1], reverse=True)
+        top = heapq.nlargest(limit, candidates, key=lambda x: x[1])
         
-        return [ctx for ctx, _ in candidates[:limit]]
+        return [ctx for ctx, _ in top]
+    
+    def _index_context(self, context: ContextItem):
+        """將上下文加入倒排索引"""
+        terms = _tokenize(context.content)
+        self.context_terms[context.id] = terms
+        for term in terms:
+            self.term_index[term].add(context.id)
+    
+    def _unindex_context(self, context_id: str):
+        """從倒排索引移除上下文"""
+        for term in self.context_terms.pop(context_id, ()):
+            postings = self.term_index.get(term)
+            if postings is not None:
+                postings.discard(context_id)
+                if not postings:
+                    del self.term_index[term]
     
     async def _calculate_context_relevance(self, 
                                          context: ContextItem,
                                          query: str) -> float:
         """計算上下文相關性"""
+        return self._score_context(context, query.lower(), _tokenize(query), time.time())
+    
+    def _score_context(self,
+                       context: ContextItem,
+                       query_lower: str,
+                       query_words: FrozenSet[str],
+                       current_time: float) -> float:
+        """使用緩存的詞集合計算相關性分數"""
         base_score = 0.0
         
         # 內容相似度
-        if query.lower() in context.content.lower():
+        if query_lower in context.content.lower():
             base_score += 0.5
         
         # 標籤匹配
-        query_words = set(query.lower().split())
-        content_words = set(context.content.lower().split())
+        content_words = self.context_terms.get(context.id)
+        if content_words is None:
+            content_words = _tokenize(context.content)
         word_overlap = len(query_words & content_words)
         
         if word_overlap > 0:
             base_score += 0.3 * (word_overlap / len(query_words))
         
         # 時間因子
-        current_time = time.time()
         age = current_time - context.created_at
         time_factor = max(0.1, 1.0 / (1.0 + age / 3600))  # 按小時衰減
         
@@ -304,7 +356,9 @@ class ContextManager:
             if session_context:
                 session_id = session_context.metadata.get("session_id")
                 if session_id and session_id in self.context_windows:
-                    self.context_windows[session_id].add_item(context_item)
+                    self.context_windows[session_id].add_item(
+                        context_item, self.context_terms.get(context_item.id)
+                    )
     
     async def _update_context_relevance(self, context_id: str):
         """更新上下文相關性"""
@@ -438,6 +492,7 @@ class ContextManager:
             "context_windows": window_stats,
             "current_session": self.current_session_id,
             "context_relationships": len(self.context_relationships),
+            "indexed_terms": len(self.term_index),
             "context_transitions": len(self.context_transitions)
         }
     
@@ -454,6 +509,7 @@ class ContextManager:
         
         for context_id in to_remove:
             del self.contexts[context_id]
+            self._unindex_context(context_id)
             
             # 清理關係
             if context_id in self.context_relationships:
@@ -312,7 +312,8 @@ class LearningAdapter:
             tags=["learning", learning_data.learning_type.value, learning_data.source]
         )
         
-        await self.memory_engine.store_memory(memory)
+        # 學習數據量大，入隊即返回，由寫線程批量提交
+        await self.memory_engine.store_memory(memory, wait=False)
     
     def _calculate_learning_importance(self, learning_data: LearningData) -> float:
         """計算學習重要性"""
@@ -9,14 +9,21 @@ import json
 import time
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 from dataclasses import dataclass, asdict
 from enum import Enum
 import numpy as np
 from pathlib import Path
 
+from .vector_index import HashingEmbedder, MemoryVectorIndex
+from .storage import SQLiteStore, open_store
+
 logger = logging.getLogger(__name__)
 
+# 數據庫結構版本（PRAGMA user_version）
+# 1: 初始結構  2: FTS5全文索引 + memory_tags標籤表  3: 按內容重新生成float32哈希嵌入
+SCHEMA_VERSION = 3
+
 class MemoryType(Enum):
     """記憶類型"""
     EPISODIC = "episodic"        # 特定事件記憶
@@ -59,20 +66,43 @@ class MemoryEngine:
 class MemoryOSEngine(MemoryEngine):
     """記憶引擎核心類"""
     
-    def __init__(self, db_path: str = "memoryos.db", max_memories: int = 10000):
+    def __init__(self, db_path: str = "memoryos.db", max_memories: int = 10000,
+                 embedding_dim: int = 256):
         self.db_path = Path(db_path)
         self.max_memories = max_memories
         self.working_memory: Dict[str, Memory] = {}
         self.max_working_memory = 100
-        self.connection = None
+        self.store: Optional[SQLiteStore] = None
         self.is_initialized = False
+        self.fts_trigram = False
+        self.fts_importance_weight = 1.0  # 全文搜索排序中重要性分數的權重
+        
+        # 訪問統計緩衝：memory_id -> [訪問次數增量, 最後訪問時間]
+        self.pending_access: Dict[str, List[float]] = {}
+        self.access_flush_interval = 5.0
+        self.access_flush_threshold = 200
+        self._access_flush_task: Optional[asyncio.Task] = None
+        
+        # 寫後緩衝管道：所有寫入經共享存儲的寫線程按批提交
+        self.write_batch_size = 256
+        self.eviction_slack = 100  # 超出容量時額外淘汰的數量，攤銷淘汰成本
+        self.memory_count = 0
+        self.write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        
+        # 向量索引（與數據庫同目錄的 .vectors.f32 / .vectors.log）
+        self.embedder = HashingEmbedder(embedding_dim)
+        self.embeddings_migrated = False  # 遷移重寫了嵌入，需要重建向量索引
+        self.vector_index = MemoryVectorIndex(
+            self.db_path.with_name(self.db_path.stem + ".vectors"),
+            dim=embedding_dim
+        )
         
     async def initialize(self):
         """初始化記憶引擎"""
         try:
-            self.connection = sqlite3.connect(str(self.db_path))
-            self.connection.execute('PRAGMA journal_mode=WAL')
-            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.store = await open_store(str(self.db_path))
+            self.store.create_function("memory_importance", 3, self._importance_score)
             
             # 創建表結構
             await self._create_tables()
@@ -80,6 +110,15 @@ class MemoryOSEngine(MemoryEngine):
             # 載入工作記憶
             await self._load_working_memory()
             
+            # 載入向量索引
+            await self._load_vector_index()
+            
+            # 啟動寫線程
+            await self._start_writer()
+            
+            # 啟動訪問統計定時寫入
+            self._access_flush_task = asyncio.create_task(self._access_flush_loop())
+            
             self.is_initialized = True
             logger.info(f"✅ MemoryEngine 初始化完成 (DB: {self.db_path})")
             
@@ -89,6 +128,10 @@ class MemoryOSEngine(MemoryEngine):
     
     async def _create_tables(self):
         """創建數據庫表"""
+        await self.store.write(self._create_schema)
+    
+    def _create_schema(self, connection: sqlite3.Connection):
+        """創建表結構並按需遷移（在寫線程中執行）"""
         create_sql = """
         CREATE TABLE IF NOT EXISTS memories (
             id TEXT PRIMARY KEY,
@@ -106,27 +149,142 @@ class MemoryOSEngine(MemoryEngine):
         CREATE INDEX IF NOT EXISTS idx_memory_type ON memories(memory_type);
         CREATE INDEX IF NOT EXISTS idx_created_at ON memories(created_at);
         CREATE INDEX IF NOT EXISTS idx_importance ON memories(importance_score);
-        CREATE INDEX IF NOT EXISTS idx_tags ON memories(tags);
+        
+        CREATE TABLE IF NOT EXISTS memory_tags (
+            tag TEXT NOT NULL,
+            memory_id TEXT NOT NULL,
+            PRIMARY KEY (tag, memory_id)
+        ) WITHOUT ROWID;
+        
+        CREATE INDEX IF NOT EXISTS idx_memory_tags_memory ON memory_tags(memory_id);
+        
+        CREATE TRIGGER IF NOT EXISTS memories_tags_ai AFTER INSERT ON memories BEGIN
+            INSERT OR IGNORE INTO memory_tags(tag, memory_id)
+            SELECT value, NEW.id FROM json_each(CASE WHEN json_valid(NEW.tags) THEN NEW.tags ELSE '[]' END);
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS memories_tags_ad AFTER DELETE ON memories BEGIN
+            DELETE FROM memory_tags WHERE memory_id = OLD.id;
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS memories_tags_au AFTER UPDATE OF tags ON memories BEGIN
+            DELETE FROM memory_tags WHERE memory_id = OLD.id;
+            INSERT OR IGNORE INTO memory_tags(tag, memory_id)
+            SELECT value, NEW.id FROM json_each(CASE WHEN json_valid(NEW.tags) THEN NEW.tags ELSE '[]' END);
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS memories_fts_ai AFTER INSERT ON memories BEGIN
+            INSERT INTO memories_fts(rowid, content) VALUES (NEW.rowid, NEW.content);
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS memories_fts_ad AFTER DELETE ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, content) VALUES ('delete', OLD.rowid, OLD.content);
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS memories_fts_au AFTER UPDATE OF content ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, content) VALUES ('delete', OLD.rowid, OLD.content);
+            INSERT INTO memories_fts(rowid, content) VALUES (NEW.rowid, NEW.content);
+        END;
         """
         
-        self.connection.executescript(create_sql)
-        self.connection.commit()
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        
+        self._create_fts_table(connection)
+        connection.executescript(create_sql)
+        
+        if version < SCHEMA_VERSION:
+            self._migrate_schema(connection, version)
+    
+    def _create_fts_table(self, connection: sqlite3.Connection):
+        """創建FTS5全文索引（外部內容表，內容存放在memories中）"""
+        # trigram分詞支持中文和子串匹配，舊版SQLite退回unicode61
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                connection.execute(f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+                        content, content='memories', content_rowid='rowid', tokenize='{tokenizer}'
+                    )
+                """)
+                break
+            except sqlite3.OperationalError as e:
+                logger.warning(f"FTS5分詞器 {tokenizer} 不可用: {e}")
+        
+        row = connection.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'memories_fts'"
+        ).fetchone()
+        self.fts_trigram = bool(row and "trigram" in row[0])
+    
+    def _migrate_schema(self, connection: sqlite3.Connection, from_version: int):
+        """遷移已有的memoryos.db"""
+        logger.info(f"🔄 遷移記憶數據庫結構: v{from_version} -> v{SCHEMA_VERSION}")
+        
+        if from_version < 2:
+            # 前導通配符LIKE無法使用該索引
+            connection.execute("DROP INDEX IF EXISTS idx_tags")
+            
+            # 為已有記憶建立全文索引和標籤表
+            connection.execute("INSERT INTO memories_fts(memories_fts) VALUES ('rebuild')")
+            connection.execute("""
+                INSERT OR IGNORE INTO memory_tags(tag, memory_id)
+                SELECT json_each.value, memories.id
+                FROM memories, json_each(CASE WHEN json_valid(memories.tags) THEN memories.tags ELSE '[]' END)
+            """)
+        
+        if from_version < 3:
+            # 舊版嵌入是float64隨機向量（v2遷移後重新存儲的記憶還可能被誤解碼），
+            # 全部按內容重新生成為當前的float32哈希嵌入
+            self._reembed_memories(connection)
+        
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    
+    def _reembed_memories(self, connection: sqlite3.Connection, chunk_size: int = 1000):
+        """按內容重寫全部記憶的嵌入向量"""
+        last_rowid = 0
+        while True:
+            rows = connection.execute(
+                "SELECT rowid, content FROM memories WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, chunk_size)
+            ).fetchall()
+            if not rows:
+                break
+            
+            connection.executemany(
+                "UPDATE memories SET embedding = ? WHERE rowid = ?",
+                [(self._generate_embedding(content).tobytes(), rowid) for rowid, content in rows]
+            )
+            last_rowid = rows[-1][0]
+        
+        self.embeddings_migrated = True
     
     async def _load_working_memory(self):
         """載入工作記憶"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
+        rows = await self.store.fetchall("""
             SELECT * FROM memories 
             WHERE memory_type = ? 
             ORDER BY accessed_at DESC 
             LIMIT ?
         """, (MemoryType.WORKING.value, self.max_working_memory))
         
-        rows = cursor.fetchall()
         for row in rows:
             memory = self._row_to_memory(row)
             self.working_memory[memory.id] = memory
     
+    async def _load_vector_index(self):
+        """載入向量索引，與數據庫不一致時從記憶內容重建"""
+        loaded = self.vector_index.load()
+        
+        count = (await self.store.fetchone("SELECT COUNT(*) FROM memories"))[0]
+        
+        if loaded and len(self.vector_index) == count and not self.embeddings_migrated:
+            return
+        
+        logger.info(f"📐 重建向量索引: {count} 個記憶")
+        rows = await self.store.fetchall("SELECT id, memory_type, content FROM memories")
+        self.vector_index.rebuild(
+            (memory_id, memory_type, self._generate_embedding(content))
+            for memory_id, memory_type, content in rows
+        )
+    
     def _row_to_memory(self, row) -> Memory:
         """將數據庫行轉換為記憶對象"""
         return Memory(
@@ -139,45 +297,60 @@ class MemoryOSEngine(MemoryEngine):
             access_count=row[6],
             importance_score=row[7],
             tags=json.loads(row[8]) if row[8] else [],
-            embedding=np.frombuffer(row[9]) if row[9] else None
+            embedding=self._decode_embedding(row[9])
         )
     
-    async def store_memory(self, memory: Memory) -> bool:
-        """存儲記憶"""
+    def _decode_embedding(self, blob: Optional[bytes]) -> Optional[np.ndarray]:
+        """解碼嵌入向量（遷移後只存在當前的float32格式）
+        
+        維度不符的向量視為無效並返回None，重新存儲時按內容生成。
+        """
+        if not blob:
+            return None
+        embedding = np.frombuffer(blob, dtype=np.float32)
+        if embedding.shape != (self.embedder.dim,):
+            return None
+        return embedding
+    
+    def _normalize_embedding(self, memory: Memory) -> np.ndarray:
+        """返回當前格式（float32，embedder維度）的嵌入，不符合時按內容重新生成"""
+        embedding = memory.embedding
+        if embedding is not None:
+            embedding = np.asarray(embedding)
+            if embedding.shape == (self.embedder.dim,) and np.all(np.isfinite(embedding)):
+                return embedding.astype(np.float32, copy=False)
+        return self._generate_embedding(memory.content)
+    
+    async def _start_writer(self):
+        """啟動批量寫入任務"""
+        self.memory_count = (await self.store.fetchone("SELECT COUNT(*) FROM memories"))[0]
+        
+        self.write_queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+    
+    async def store_memory(self, memory: Memory, wait: bool = True) -> bool:
+        """存儲記憶
+        
+        寫入進入批量隊列；wait=True 時等待所在批次提交後返回，
+        wait=False 時入隊即返回（由寫線程異步提交）。
+        """
         try:
-            # 生成嵌入向量
-            if memory.embedding is None:
-                memory.embedding = self._generate_embedding(memory.content)
-            
-            # 插入到數據庫
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO memories 
-                (id, memory_type, content, metadata, created_at, accessed_at, 
-                 access_count, importance_score, tags, embedding)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                memory.id,
-                memory.memory_type.value,
-                memory.content,
-                json.dumps(memory.metadata),
-                memory.created_at,
-                memory.accessed_at,
-                memory.access_count,
-                memory.importance_score,
-                json.dumps(memory.tags),
-                memory.embedding.tobytes() if memory.embedding is not None else None
-            ))
-            
-            self.connection.commit()
+            # 生成嵌入向量（統一為當前格式）
+            memory.embedding = self._normalize_embedding(memory)
+            
+            future = asyncio.get_running_loop().create_future()
+            self.write_queue.put_nowait((memory, future))
             
             # 更新工作記憶
             if memory.memory_type == MemoryType.WORKING:
                 await self._update_working_memory(memory)
             
-            # 檢查記憶容量
-            await self._manage_memory_capacity()
+            if not wait:
+                # 沒有等待者時也取走異常，錯誤已由寫入任務記錄
+                future.add_done_callback(lambda done: done.cancelled() or done.exception())
+                return True
             
+            await future
             logger.debug(f"✅ 存儲記憶: {memory.id} ({memory.memory_type.value})")
             return True
             
@@ -185,6 +358,118 @@ class MemoryOSEngine(MemoryEngine):
             logger.error(f"❌ 存儲記憶失敗: {e}")
             return False
     
+    async def _writer_loop(self):
+        """從隊列收集寫入，按批交給寫線程提交"""
+        while True:
+            batch = [await self.write_queue.get()]
+            while len(batch) < self.write_batch_size and not self.write_queue.empty():
+                batch.append(self.write_queue.get_nowait())
+            
+            try:
+                await self._commit_batch(batch)
+            except Exception as e:
+                # 單個批次失敗（例如提交後更新向量索引出錯）不能終止寫入任務，
+                # 否則之後所有等待提交的 store_memory 都會永久掛起
+                logger.error(f"❌ 批量寫入記憶失敗: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self.write_queue.task_done()
+    
+    async def _commit_batch(self, batch):
+        """提交一批寫入並同步內存狀態"""
+        # 同一批次內重複的id只保留最後一次寫入
+        memories = {memory.id: memory for memory, _ in batch}
+        
+        # 行數據和待寫入的訪問統計在同一時刻取快照。讀取時訪問次數已經累加到
+        # Memory對象上，被重新存儲的記憶由UPSERT寫入該計數，不再重複累加
+        rows = [self._memory_row(memory) for memory in memories.values()]
+        all_pending = self.pending_access
+        pending_access = {
+            memory_id: pending for memory_id, pending in all_pending.items()
+            if memory_id not in memories
+        }
+        self.pending_access = {}
+        
+        try:
+            inserted, deleted_ids = await self.store.write(self._write_batch, rows, pending_access)
+        except Exception as e:
+            logger.error(f"❌ 批量寫入記憶失敗: {e}")
+            # 事務已回滾，被重新存儲的記憶的計數也沒有寫入，全部放回緩衝
+            self._requeue_access(all_pending)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.memory_count += inserted - len(deleted_ids)
+        
+        # 向量索引和工作記憶只在事件循環線程中修改
+        for memory in memories.values():
+            self.vector_index.add(memory.id, memory.memory_type.value, np.asarray(memory.embedding, dtype=np.float32))
+        
+        self._apply_evictions(deleted_ids)
+        
+        for _, future in batch:
+            if not future.done():
+                future.set_result(True)
+    
+    def _memory_row(self, memory: Memory) -> Tuple:
+        """記憶對應的 memories 表行"""
+        return (
+            memory.id,
+            memory.memory_type.value,
+            memory.content,
+            json.dumps(memory.metadata),
+            memory.created_at,
+            memory.accessed_at,
+            memory.access_count,
+            memory.importance_score,
+            json.dumps(memory.tags),
+            memory.embedding.tobytes() if memory.embedding is not None else None
+        )
+    
+    def _write_batch(self, connection: sqlite3.Connection, rows: List[Tuple],
+                     pending_access: Dict[str, List[float]]):
+        """在寫線程中以單個事務寫入一批記憶（含訪問統計和容量淘汰）"""
+        cursor = connection.cursor()
+        ids = [row[0] for row in rows]
+        
+        existing = 0
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cursor.execute(
+                f"SELECT COUNT(*) FROM memories WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            existing += cursor.fetchone()[0]
+        
+        # 使用UPSERT而非REPLACE，保持rowid穩定並觸發FTS/標籤同步
+        cursor.executemany("""
+            INSERT INTO memories 
+            (id, memory_type, content, metadata, created_at, accessed_at, 
+             access_count, importance_score, tags, embedding)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                memory_type = excluded.memory_type,
+                content = excluded.content,
+                metadata = excluded.metadata,
+                created_at = excluded.created_at,
+                accessed_at = excluded.accessed_at,
+                access_count = excluded.access_count,
+                importance_score = excluded.importance_score,
+                tags = excluded.tags,
+                embedding = excluded.embedding
+        """, rows)
+        
+        self._write_access_updates(cursor, pending_access)
+        
+        inserted = len(ids) - existing
+        deleted_ids = self._evict_memories(cursor, self.memory_count + inserted)
+        
+        return inserted, deleted_ids
+    
     async def _update_working_memory(self, memory: Memory):
         """更新工作記憶"""
         self.working_memory[memory.id] = memory
@@ -206,12 +491,10 @@ class MemoryOSEngine(MemoryEngine):
                 return memory
             
             # 從數據庫檢索
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT * FROM memories WHERE id = ?", (memory_id,))
-            row = cursor.fetchone()
+            row = await self.store.fetchone("SELECT * FROM memories WHERE id = ?", (memory_id,))
             
             if row:
-                memory = self._row_to_memory(row)
+                memory = self._merge_pending_access(self._row_to_memory(row))
                 await self._update_memory_access(memory)
                 return memory
                 
@@ -226,45 +509,58 @@ class MemoryOSEngine(MemoryEngine):
                             memory_type: Optional[MemoryType] = None,
                             tags: Optional[List[str]] = None,
                             limit: int = 10,
-                            min_importance: float = 0.0) -> List[Memory]:
-        """搜索記憶"""
+                            min_importance: float = 0.0,
+                            record_access: bool = True) -> List[Memory]:
+        """搜索記憶（FTS5 BM25排序，結合重要性分數）
+        
+        record_access=False 用於維護任務的批量讀取，不計入訪問統計。
+        """
         try:
             conditions = []
             params = []
             
             if memory_type:
-                conditions.append("memory_type = ?")
+                conditions.append("m.memory_type = ?")
                 params.append(memory_type.value)
             
             if tags:
                 for tag in tags:
-                    conditions.append("tags LIKE ?")
-                    params.append(f"%{tag}%")
+                    conditions.append("m.id IN (SELECT memory_id FROM memory_tags WHERE tag = ?)")
+                    params.append(tag)
             
             if min_importance > 0:
-                conditions.append("importance_score >= ?")
+                conditions.append("m.importance_score >= ?")
                 params.append(min_importance)
             
-            if query:
-                conditions.append("content LIKE ?")
-                params.append(f"%{query}%")
-            
-            where_clause = " AND ".join(conditions) if conditions else "1=1"
-            
-            cursor = self.connection.cursor()
-            cursor.execute(f"""
-                SELECT * FROM memories 
-                WHERE {where_clause}
-                ORDER BY importance_score DESC, accessed_at DESC
-                LIMIT ?
-            """, params + [limit])
+            match_query, like_terms = self._build_fts_query(query)
+            for term in like_terms:
+                conditions.append("m.content LIKE ?")
+                params.append(f"%{term}%")
+            
+            if match_query:
+                where_clause = " AND ".join(["memories_fts MATCH ?"] + conditions)
+                rows = await self.store.fetchall(f"""
+                    SELECT m.* FROM memories_fts
+                    JOIN memories m ON m.rowid = memories_fts.rowid
+                    WHERE {where_clause}
+                    ORDER BY bm25(memories_fts) - ? * m.importance_score
+                    LIMIT ?
+                """, [match_query] + params + [self.fts_importance_weight, limit])
+            else:
+                where_clause = " AND ".join(conditions) if conditions else "1=1"
+                rows = await self.store.fetchall(f"""
+                    SELECT m.* FROM memories m
+                    WHERE {where_clause}
+                    ORDER BY m.importance_score DESC, m.accessed_at DESC
+                    LIMIT ?
+                """, params + [limit])
             
-            rows = cursor.fetchall()
-            memories = [self._row_to_memory(row) for row in rows]
+            memories = [self._merge_pending_access(self._row_to_memory(row)) for row in rows]
             
             # 更新訪問統計
-            for memory in memories:
-                await self._update_memory_access(memory)
+            if record_access:
+                for memory in memories:
+                    await self._update_memory_access(memory)
             
             return memories
             
@@ -272,157 +568,232 @@ class MemoryOSEngine(MemoryEngine):
             logger.error(f"❌ 搜索記憶失敗: {e}")
             return []
     
+    def _build_fts_query(self, query: str):
+        """將搜索字符串轉換為FTS5查詢，返回 (match_query, 需要LIKE過濾的短詞)"""
+        terms = query.split()
+        if not terms:
+            return None, []
+        
+        # trigram分詞無法索引少於3個字符的詞，這些詞退回LIKE過濾
+        min_length = 3 if self.fts_trigram else 1
+        fts_terms = [term for term in terms if len(term) >= min_length]
+        like_terms = [term for term in terms if len(term) < min_length]
+        
+        if not fts_terms:
+            return None, like_terms
+        
+        match_query = " AND ".join('"' + term.replace('"', '""') + '"' for term in fts_terms)
+        return match_query, like_terms
+    
     async def get_similar_memories(self, 
                                  content: str, 
                                  memory_type: Optional[MemoryType] = None,
                                  limit: int = 5) -> List[Memory]:
-        """獲取相似記憶"""
+        """獲取相似記憶（在全部記憶上做向量化top-k檢索）"""
         try:
             query_embedding = self._generate_embedding(content)
             
-            # 簡化的相似度計算（在實際實現中應該使用向量數據庫）
-            cursor = self.connection.cursor()
-            conditions = []
-            params = []
-            
-            if memory_type:
-                conditions.append("memory_type = ?")
-                params.append(memory_type.value)
-            
-            where_clause = " AND ".join(conditions) if conditions else "1=1"
-            
-            cursor.execute(f"""
-                SELECT * FROM memories 
-                WHERE {where_clause} AND embedding IS NOT NULL
-                ORDER BY importance_score DESC
-                LIMIT ?
-            """, params + [limit * 2])  # 獲取更多候選
-            
-            rows = cursor.fetchall()
-            memories = [self._row_to_memory(row) for row in rows]
+            hits = self.vector_index.search(
+                query_embedding,
+                limit,
+                memory_type.value if memory_type else None
+            )
+            if not hits:
+                return []
             
-            # 計算相似度並排序
-            similarities = []
-            for memory in memories:
-                if memory.embedding is not None:
-                    similarity = self._cosine_similarity(query_embedding, memory.embedding)
-                    similarities.append((memory, similarity))
+            memory_ids = [memory_id for memory_id, _ in hits]
+            placeholders = ",".join("?" * len(memory_ids))
             
-            # 按相似度排序
-            similarities.sort(key=lambda x: x[1], reverse=True)
+            rows = await self.store.fetchall(f"SELECT * FROM memories WHERE id IN ({placeholders})", memory_ids)
+            memories = {row[0]: self._merge_pending_access(self._row_to_memory(row)) for row in rows}
             
-            return [mem for mem, _ in similarities[:limit]]
+            # 保持相似度順序
+            return [memories[memory_id] for memory_id in memory_ids if memory_id in memories]
             
         except Exception as e:
             logger.error(f"❌ 獲取相似記憶失敗: {e}")
             return []
     
     def _generate_embedding(self, text: str) -> np.ndarray:
-        """生成嵌入向量（簡化版）"""
-        # 這裡使用簡化的嵌入生成，實際應該使用專業的嵌入模型
-        words = text.lower().split()
-        embedding = np.random.random(128)  # 128維向量
-        
-        # 簡單的詞頻統計影響
-        word_counts = {}
-        for word in words:
-            word_counts[word] = word_counts.get(word, 0) + 1
-        
-        # 根據詞頻調整嵌入
-        for i, word in enumerate(words[:128]):
-            if i < len(embedding):
-                embedding[i] *= word_counts.get(word, 1)
-        
-        return embedding / np.linalg.norm(embedding)
+        """生成嵌入向量（確定性哈希n-gram投影）"""
+        return self.embedder.embed(text)
     
     def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """計算餘弦相似度"""
         return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
     
+    def _merge_pending_access(self, memory: Memory) -> Memory:
+        """把尚未寫入數據庫的訪問統計合併到讀出的記憶上
+        
+        重新存儲記憶時以Memory對象上的計數為準並丟棄緩衝的訪問統計，因此讀出的
+        對象必須已包含這些訪問。
+        """
+        pending = self.pending_access.get(memory.id)
+        if pending is not None:
+            memory.access_count += pending[0]
+            memory.accessed_at = max(memory.accessed_at, pending[1])
+        return memory
+    
     async def _update_memory_access(self, memory: Memory):
-        """更新記憶訪問統計"""
+        """更新記憶訪問統計（緩衝在內存中，批量寫入數據庫）"""
         memory.accessed_at = time.time()
         memory.access_count += 1
         memory.importance_score = self._calculate_importance(memory)
         
-        # 更新數據庫
-        cursor = self.connection.cursor()
-        cursor.execute("""
+        pending = self.pending_access.get(memory.id)
+        if pending is None:
+            self.pending_access[memory.id] = [1, memory.accessed_at]
+        else:
+            pending[0] += 1
+            pending[1] = memory.accessed_at
+        
+        if len(self.pending_access) >= self.access_flush_threshold:
+            await self.flush_access_updates()
+    
+    async def flush_access_updates(self) -> int:
+        """將緩衝的訪問統計交給寫線程，以單個事務寫入"""
+        if not self.pending_access or self.store is None:
+            return 0
+        
+        pending = self.pending_access
+        self.pending_access = {}
+        
+        try:
+            await self.store.write(lambda connection: self._write_access_updates(connection.cursor(), pending))
+        except Exception:
+            self._requeue_access(pending)
+            raise
+        
+        logger.debug(f"💾 寫入訪問統計: {len(pending)} 個記憶")
+        return len(pending)
+    
+    def _requeue_access(self, pending: Dict[str, List[float]]):
+        """寫入失敗時把取出的訪問統計合併回緩衝（期間可能已有新的訪問）"""
+        for memory_id, (count, accessed_at) in pending.items():
+            current = self.pending_access.get(memory_id)
+            if current is None:
+                self.pending_access[memory_id] = [count, accessed_at]
+            else:
+                current[0] += count
+                current[1] = max(current[1], accessed_at)
+    
+    @staticmethod
+    def _write_access_updates(cursor, pending: Dict[str, List[float]]):
+        """寫入訪問統計，並在同一語句中重算重要性分數"""
+        if not pending:
+            return
+        
+        # 以數據庫中的累計值為基準，避免多個Memory副本互相覆蓋計數
+        cursor.executemany("""
             UPDATE memories 
-            SET accessed_at = ?, access_count = ?, importance_score = ?
+            SET access_count = access_count + ?,
+                accessed_at = MAX(accessed_at, ?),
+                importance_score = memory_importance(access_count + ?, created_at, memory_type)
             WHERE id = ?
-        """, (memory.accessed_at, memory.access_count, memory.importance_score, memory.id))
-        self.connection.commit()
+        """, [(count, accessed_at, count, memory_id)
+              for memory_id, (count, accessed_at) in pending.items()])
+    
+    async def _access_flush_loop(self):
+        """定時寫入訪問統計"""
+        while True:
+            await asyncio.sleep(self.access_flush_interval)
+            try:
+                await self.flush_access_updates()
+            except Exception as e:
+                logger.error(f"❌ 寫入訪問統計失敗: {e}")
     
     def _calculate_importance(self, memory: Memory) -> float:
         """計算記憶重要性分數"""
+        return self._importance_score(memory.access_count, memory.created_at, memory.memory_type.value)
+    
+    @staticmethod
+    def _importance_score(access_count: int, created_at: float, memory_type: str) -> float:
+        """重要性分數（同時註冊為SQLite函數 memory_importance）"""
         current_time = time.time()
-        age = current_time - memory.created_at
+        age = current_time - created_at
         
         # 基礎分數
         base_score = 1.0
         
         # 訪問頻率影響
-        frequency_score = min(memory.access_count / 10.0, 2.0)
+        frequency_score = min(access_count / 10.0, 2.0)
         
         # 時間衰減影響
         time_decay = max(0.1, 1.0 / (1.0 + age / 86400))  # 按天衰減
         
         # 記憶類型權重
         type_weights = {
-            MemoryType.CLAUDE_INTERACTION: 1.5,
-            MemoryType.USER_PREFERENCE: 1.3,
-            MemoryType.PROCEDURAL: 1.2,
-            MemoryType.SEMANTIC: 1.0,
-            MemoryType.EPISODIC: 0.8,
-            MemoryType.WORKING: 0.5
+            MemoryType.CLAUDE_INTERACTION.value: 1.5,
+            MemoryType.USER_PREFERENCE.value: 1.3,
+            MemoryType.PROCEDURAL.value: 1.2,
+            MemoryType.SEMANTIC.value: 1.0,
+            MemoryType.EPISODIC.value: 0.8,
+            MemoryType.WORKING.value: 0.5
         }
         
-        type_weight = type_weights.get(memory.memory_type, 1.0)
+        type_weight = type_weights.get(memory_type, 1.0)
         
         return base_score * frequency_score * time_decay * type_weight
     
     async def _manage_memory_capacity(self):
-        """管理記憶容量"""
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT COUNT(*) FROM memories")
-        count = cursor.fetchone()[0]
-        
-        if count > self.max_memories:
-            # 刪除最不重要的記憶
-            to_delete = count - self.max_memories + 100  # 多刪除一些
-            
-            cursor.execute("""
-                DELETE FROM memories 
-                WHERE id IN (
-                    SELECT id FROM memories 
-                    ORDER BY importance_score ASC, accessed_at ASC
-                    LIMIT ?
-                )
-            """, (to_delete,))
-            
-            self.connection.commit()
-            logger.info(f"🗑️ 清理記憶: 刪除 {to_delete} 個低重要性記憶")
+        """管理記憶容量（提交隊列中的寫入後，按實際行數校正計數並淘汰）"""
+        if self.write_queue is not None:
+            await self.write_queue.join()
+        await self.flush_access_updates()
+        
+        def evict(connection: sqlite3.Connection):
+            cursor = connection.cursor()
+            count = cursor.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+            deleted_ids = self._evict_memories(cursor, count)
+            return count - len(deleted_ids), deleted_ids
+        
+        self.memory_count, deleted_ids = await self.store.write(evict)
+        self._apply_evictions(deleted_ids)
+    
+    def _apply_evictions(self, deleted_ids: List[str]):
+        """從向量索引和工作記憶中移除已淘汰的記憶"""
+        if not deleted_ids:
+            return
+        
+        self.vector_index.remove(deleted_ids)
+        for memory_id in deleted_ids:
+            self.working_memory.pop(memory_id, None)
+        logger.info(f"🗑️ 清理記憶: 刪除 {len(deleted_ids)} 個低重要性記憶")
+    
+    def _evict_memories(self, cursor, count: int) -> List[str]:
+        """超出容量時刪除最不重要的記憶（在寫事務中執行），返回被刪除的id"""
+        if count <= self.max_memories:
+            return []
+        
+        # 多刪除一些，使淘汰成本分攤到後續寫入（額外淘汰量不超過容量的10%）
+        slack = min(self.eviction_slack, max(1, self.max_memories // 10))
+        to_delete = count - self.max_memories + slack
+        
+        cursor.execute("""
+            SELECT id FROM memories 
+            ORDER BY importance_score ASC, accessed_at ASC
+            LIMIT ?
+        """, (to_delete,))
+        deleted_ids = [row[0] for row in cursor.fetchall()]
+        
+        cursor.executemany("DELETE FROM memories WHERE id = ?", [(memory_id,) for memory_id in deleted_ids])
+        return deleted_ids
     
     async def get_memory_statistics(self) -> Dict[str, Any]:
         """獲取記憶統計信息"""
-        cursor = self.connection.cursor()
-        
         # 總記憶數
-        cursor.execute("SELECT COUNT(*) FROM memories")
-        total_memories = cursor.fetchone()[0]
+        total_memories = (await self.store.fetchone("SELECT COUNT(*) FROM memories"))[0]
         
         # 按類型統計
-        cursor.execute("""
+        rows = await self.store.fetchall("""
             SELECT memory_type, COUNT(*) 
             FROM memories 
             GROUP BY memory_type
         """)
-        type_counts = {row[0]: row[1] for row in cursor.fetchall()}
+        type_counts = {row[0]: row[1] for row in rows}
         
         # 平均重要性
-        cursor.execute("SELECT AVG(importance_score) FROM memories")
-        avg_importance = cursor.fetchone()[0] or 0.0
+        avg_importance = (await self.store.fetchone("SELECT AVG(importance_score) FROM memories"))[0] or 0.0
         
         # 工作記憶統計
         working_memory_count = len(self.working_memory)
@@ -433,16 +804,39 @@ class MemoryOSEngine(MemoryEngine):
             "type_distribution": type_counts,
             "average_importance": avg_importance,
             "database_size": self.db_path.stat().st_size if self.db_path.exists() else 0,
+            "vector_index_size": len(self.vector_index),
             "max_capacity": self.max_memories,
+            "pending_writes": self.write_queue.qsize() if self.write_queue else 0,
+            "storage": self.store.get_stats(),
             "capacity_usage": (total_memories / self.max_memories) * 100
         }
     
     async def cleanup(self):
         """清理資源"""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        if self._access_flush_task:
+            self._access_flush_task.cancel()
+            try:
+                await self._access_flush_task
+            except asyncio.CancelledError:
+                pass
+            self._access_flush_task = None
+        
+        # 提交隊列中剩餘的寫入
+        if self._writer_task:
+            await self.write_queue.join()
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        
+        if self.store:
+            await self.flush_access_updates()
+            await self.store.close()
+            self.store = None
         
+        self.vector_index.close()
         self.working_memory.clear()
         logger.info("🧹 MemoryEngine 清理完成")
 
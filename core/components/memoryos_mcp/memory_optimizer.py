@@ -14,6 +14,8 @@ from enum import Enum
 import numpy as np
 from collections import defaultdict, deque
 
+from .clustering import MinHashClusterer, word_set
+
 logger = logging.getLogger(__name__)
 
 class OptimizationType(Enum):
@@ -61,6 +63,12 @@ class MemoryOptimizer:
         self.performance_metrics = defaultdict(list)
         self.optimization_schedules = {}
         self.is_initialized = False
+        
+        # 近重複聚類
+        self.clusterer = MinHashClusterer()
+        self.memory_similarity_threshold = 0.8
+        self.context_relatedness_threshold = 0.6
+        self.compression_scan_limit = getattr(memory_engine, "max_memories", 1000)
     
     async def initialize(self):
         """初始化記憶優化器"""
@@ -230,7 +238,9 @@ class MemoryOptimizer:
         """優化記憶壓縮"""
         try:
             # 找到重複或相似的記憶
-            all_memories = await self.memory_engine.search_memories(limit=1000)
+            all_memories = await self.memory_engine.search_memories(
+                limit=self.compression_scan_limit, record_access=False
+            )
             
             # 按相似度分組
             similar_groups = await self._group_similar_memories(all_memories)
@@ -248,56 +258,15 @@ class MemoryOptimizer:
             logger.error(f"❌ 記憶壓縮失敗: {e}")
     
     async def _group_similar_memories(self, memories: List) -> List[List]:
-        """分組相似記憶"""
-        groups = []
-        processed = set()
-        
-        for i, memory in enumerate(memories):
-            if memory.id in processed:
-                continue
-            
-            similar_group = [memory]
-            processed.add(memory.id)
-            
-            # 找到相似的記憶
-            for j, other_memory in enumerate(memories[i+1:], i+1):
-                if other_memory.id in processed:
-                    continue
-                
-                # 計算相似度
-                similarity = await self._calculate_memory_similarity(memory, other_memory)
-                
-                if similarity > 0.8:  # 高相似度閾值
-                    similar_group.append(other_memory)
-                    processed.add(other_memory.id)
-            
-            if len(similar_group) > 1:
-                groups.append(similar_group)
-        
-        return groups
-    
-    async def _calculate_memory_similarity(self, memory1, memory2) -> float:
-        """計算記憶相似度"""
-        # 簡化的相似度計算
-        content1 = memory1.content.lower()
-        content2 = memory2.content.lower()
-        
-        # 詞彙重疊
-        words1 = set(content1.split())
-        words2 = set(content2.split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = len(words1 & words2)
-        union = len(words1 | words2)
-        
-        jaccard_similarity = intersection / union if union > 0 else 0.0
-        
-        # 考慮記憶類型
-        type_similarity = 1.0 if memory1.memory_type == memory2.memory_type else 0.5
+        """分組相似記憶（MinHash/LSH候選 + 精確Jaccard驗證）"""
+        # 不同類型的記憶相似度減半，不可能超過閾值，因此只在同類型內比較
+        index_groups = self.clusterer.cluster(
+            [word_set(memory.content) for memory in memories],
+            threshold=self.memory_similarity_threshold,
+            scopes=[memory.memory_type for memory in memories]
+        )
         
-        return jaccard_similarity * type_similarity
+        return [[memories[index] for index in group] for group in index_groups]
     
     async def _compress_memory_group(self, memory_group: List):
         """壓縮記憶組"""
@@ -335,7 +304,7 @@ class MemoryOptimizer:
         """優化相關性評分"""
         try:
             # 重新計算所有記憶的重要性分數
-            all_memories = await self.memory_engine.search_memories(limit=1000)
+            all_memories = await self.memory_engine.search_memories(limit=1000, record_access=False)
             
             updated_count = 0
             for memory in all_memories:
@@ -458,7 +427,7 @@ class MemoryOptimizer:
         cutoff_time = current_time - (30 * 24 * 3600)  # 30天前
         
         # 查找過期記憶
-        all_memories = await self.memory_engine.search_memories(limit=1000)
+        all_memories = await self.memory_engine.search_memories(limit=1000, record_access=False)
         
         expired_count = 0
         for memory in all_memories:
@@ -499,57 +468,21 @@ class MemoryOptimizer:
             logger.error(f"❌ 上下文聚類優化失敗: {e}")
     
     async def _cluster_contexts(self, contexts: List) -> List[List]:
-        """聚類上下文"""
-        # 簡化的上下文聚類
-        clusters = []
-        processed = set()
-        
-        for context in contexts:
-            if context.id in processed:
-                continue
-            
-            cluster = [context]
-            processed.add(context.id)
-            
-            # 找到相關上下文
-            for other_context in contexts:
-                if other_context.id in processed:
-                    continue
-                
-                # 計算相關性
-                relatedness = await self._calculate_context_relatedness(context, other_context)
-                
-                if relatedness > 0.6:
-                    cluster.append(other_context)
-                    processed.add(other_context.id)
-            
-            if len(cluster) > 1:
-                clusters.append(cluster)
-        
-        return clusters
-    
-    async def _calculate_context_relatedness(self, context1, context2) -> float:
-        """計算上下文相關性"""
-        # 簡化的相關性計算
-        content1 = context1.content.lower()
-        content2 = context2.content.lower()
-        
-        words1 = set(content1.split())
-        words2 = set(content2.split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = len(words1 & words2)
-        union = len(words1 | words2)
+        """聚類上下文（MinHash/LSH候選 + 精確Jaccard驗證，按時間接近性加權）"""
+        created_at = np.array([context.created_at for context in contexts], dtype=np.float64)
         
-        similarity = intersection / union if union > 0 else 0.0
+        def time_factor(seed: int, candidates: np.ndarray) -> np.ndarray:
+            # 考慮時間接近性（按小時衰減）
+            time_diff = np.abs(created_at[candidates] - created_at[seed])
+            return np.maximum(0.1, 1.0 / (1.0 + time_diff / 3600))
         
-        # 考慮時間接近性
-        time_diff = abs(context1.created_at - context2.created_at)
-        time_factor = max(0.1, 1.0 / (1.0 + time_diff / 3600))  # 按小時衰減
+        index_groups = self.clusterer.cluster(
+            [word_set(context.content) for context in contexts],
+            threshold=self.context_relatedness_threshold,
+            weight=time_factor
+        )
         
-        return similarity * time_factor
+        return [[contexts[index] for index in group] for group in index_groups]
     
     async def _optimize_context_relationships(self, clusters: List[List]):
         """優化上下文關係"""
@@ -660,7 +593,7 @@ async def main():
                 "capacity_usage": 60.0
             }
         
-        async def search_memories(self, limit=100):
+        async def search_memories(self, limit=100, record_access=True):
             return []
         
         async def store_memory(self, memory):
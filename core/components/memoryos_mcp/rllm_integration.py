@@ -15,6 +15,8 @@ from pathlib import Path
 import sqlite3
 from datetime import datetime, timedelta
 
+from .storage import SQLiteStore, open_store
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -76,6 +78,7 @@ class RLLMIntegration:
         self.context_manager = context_manager
         self.training_data_path = Path("training_data")
         self.training_data_path.mkdir(exist_ok=True)
+        self.training_store: Optional[SQLiteStore] = None
         
         # 訓練配置
         self.min_reward_threshold = 0.5
@@ -93,7 +96,7 @@ class RLLMIntegration:
         logger.info("🚀 初始化 RLLM Integration...")
         
         # 創建訓練數據庫
-        self.training_db = sqlite3.connect(self.training_data_path / "training_data.db")
+        self.training_store = await open_store(str(self.training_data_path / "training_data.db"))
         await self._create_training_tables()
         
         logger.info("✅ RLLM Integration 初始化完成")
@@ -125,8 +128,7 @@ class RLLMIntegration:
         CREATE INDEX IF NOT EXISTS idx_used_in_training ON training_examples(used_in_training);
         """
         
-        self.training_db.executescript(create_sql)
-        self.training_db.commit()
+        await self.training_store.executescript(create_sql)
     
     async def collect_training_data(self, 
                                   days_back: int = 7,
@@ -244,7 +246,12 @@ class RLLMIntegration:
     
     async def _store_training_examples(self, examples: List[TrainingExample]) -> int:
         """存儲訓練樣例"""
-        cursor = self.training_db.cursor()
+        return await self.training_store.write(self._insert_training_examples, examples)
+    
+    def _insert_training_examples(self, connection: sqlite3.Connection,
+                                  examples: List[TrainingExample]) -> int:
+        """在寫線程中以單個事務寫入訓練樣例"""
+        cursor = connection.cursor()
         stored_count = 0
         
         for example in examples:
@@ -266,15 +273,24 @@ class RLLMIntegration:
             except Exception as e:
                 logger.error(f"❌ 存儲訓練樣例失敗: {e}")
         
-        self.training_db.commit()
         return stored_count
     
     async def create_training_batch(self, batch_size: int = 50) -> Optional[TrainingBatch]:
         """創建訓練批次"""
         logger.info(f"📦 創建訓練批次 (size: {batch_size})...")
         
+        batch = await self.training_store.write(self._create_training_batch, batch_size)
+        if batch is None:
+            logger.warning("⚠️ 訓練數據不足，無法創建批次")
+            return None
+        
+        logger.info(f"✅ 創建訓練批次: {batch.batch_id} (質量分數: {batch.quality_score:.3f})")
+        return batch
+    
+    def _create_training_batch(self, connection: sqlite3.Connection, batch_size: int) -> Optional[TrainingBatch]:
+        """選取樣例、記錄批次並標記樣例已使用（單個寫事務，避免並發重複選取）"""
         # 獲取高質量的訓練樣例
-        cursor = self.training_db.cursor()
+        cursor = connection.cursor()
         cursor.execute("""
             SELECT * FROM training_examples 
             WHERE used_in_training = 0 AND reward_score >= ?
@@ -284,7 +300,6 @@ class RLLMIntegration:
         
         rows = cursor.fetchall()
         if len(rows) < batch_size // 2:  # 至少要有一半的數據
-            logger.warning("⚠️ 訓練數據不足，無法創建批次")
             return None
         
         # 創建訓練樣例
@@ -329,9 +344,6 @@ class RLLMIntegration:
             WHERE id IN ({','.join(['?' for _ in example_ids])})
         """, example_ids)
         
-        self.training_db.commit()
-        
-        logger.info(f"✅ 創建訓練批次: {batch_id} (質量分數: {quality_score:.3f})")
         return batch
     
     async def export_for_deepseek_training(self, batch: TrainingBatch) -> str:
@@ -440,26 +452,16 @@ echo "🎉 MemoryOS MCP 增強訓練完成！"
     
     async def get_training_statistics(self) -> Dict[str, Any]:
         """獲取訓練統計信息"""
-        cursor = self.training_db.cursor()
-        
-        # 總訓練樣例
-        cursor.execute("SELECT COUNT(*) FROM training_examples")
-        total_examples = cursor.fetchone()[0]
-        
-        # 已使用的樣例
-        cursor.execute("SELECT COUNT(*) FROM training_examples WHERE used_in_training = 1")
-        used_examples = cursor.fetchone()[0]
-        
-        # 平均獎勵分數
-        cursor.execute("SELECT AVG(reward_score) FROM training_examples")
-        avg_reward = cursor.fetchone()[0] or 0.0
+        # 總訓練樣例、已使用的樣例、平均獎勵分數
+        total_examples, used_examples, avg_reward = await self.training_store.fetchone("""
+            SELECT COUNT(*), COALESCE(SUM(used_in_training = 1), 0), COALESCE(AVG(reward_score), 0.0)
+            FROM training_examples
+        """)
         
         # 訓練批次統計
-        cursor.execute("SELECT COUNT(*) FROM training_batches")
-        total_batches = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT AVG(quality_score) FROM training_batches")
-        avg_batch_quality = cursor.fetchone()[0] or 0.0
+        total_batches, avg_batch_quality = await self.training_store.fetchone("""
+            SELECT COUNT(*), COALESCE(AVG(quality_score), 0.0) FROM training_batches
+        """)
         
         return {
             "total_examples": total_examples,
@@ -474,8 +476,9 @@ echo "🎉 MemoryOS MCP 增強訓練完成！"
     
     async def cleanup(self):
         """清理資源"""
-        if hasattr(self, 'training_db'):
-            self.training_db.close()
+        if self.training_store:
+            await self.training_store.close()
+            self.training_store = None
         logger.info("🧹 RLLM Integration 清理完成")
 
 # 創建全局 RLLM 集成實例
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+MemoryOS MCP - 共享存儲層
+單寫連接 + 多個只讀WAL讀連接的SQLite連接池，查詢在線程池中執行
+"""
+
+import asyncio
+import sqlite3
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 已打開的共享存儲（按數據庫絕對路徑）
+_stores: Dict[str, "SQLiteStore"] = {}
+
+
+class SQLiteStore:
+    """SQLite連接池
+
+    所有寫入在單線程執行器中串行執行（一個寫連接），讀取由N個線程各自持有的
+    只讀連接並發執行；WAL模式下讀取不會被寫事務阻塞。連接啟用語句緩存，
+    並設置 mmap_size / cache_size / temp_store 等PRAGMA。
+    """
+
+    def __init__(self, db_path: str, readers: int = 4,
+                 mmap_size: int = 256 * 1024 * 1024,
+                 cache_size_kb: int = 16 * 1024,
+                 statement_cache_size: int = 256,
+                 busy_timeout_ms: int = 5000):
+        self.db_path = Path(db_path)
+        self.readers = readers
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.statement_cache_size = statement_cache_size
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self.writer: Optional[sqlite3.Connection] = None
+        self._writer_executor: Optional[ThreadPoolExecutor] = None
+        self._reader_executor: Optional[ThreadPoolExecutor] = None
+        self._reader_local = threading.local()
+        self._reader_connections: List[sqlite3.Connection] = []
+        self._reader_lock = threading.Lock()
+        self._functions: List[Tuple[str, int, Callable, bool]] = []
+        self._refs = 0
+
+        self.stats = {
+            "reads": 0,
+            "writes": 0
+        }
+
+    def _configure(self, connection: sqlite3.Connection):
+        """設置連接PRAGMA"""
+        connection.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        connection.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        connection.execute(f"PRAGMA cache_size=-{self.cache_size_kb}")
+        connection.execute("PRAGMA temp_store=MEMORY")
+
+        for name, num_params, func, deterministic in self._functions:
+            connection.create_function(name, num_params, func, deterministic=deterministic)
+
+    def _open_writer(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.writer = sqlite3.connect(
+            str(self.db_path),
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size
+        )
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        self.writer.execute("PRAGMA synchronous=NORMAL")
+        self._configure(self.writer)
+
+    def _reader(self) -> sqlite3.Connection:
+        """當前讀線程的只讀連接（按需打開）"""
+        connection = getattr(self._reader_local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.db_path.resolve().as_uri() + "?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size
+            )
+            self._configure(connection)
+            connection.execute("PRAGMA query_only=ON")
+            self._reader_local.connection = connection
+            with self._reader_lock:
+                self._reader_connections.append(connection)
+        return connection
+
+    async def open(self):
+        """打開連接池（寫連接在寫線程中創建）"""
+        self._refs += 1
+        if self._writer_executor is not None:
+            return
+
+        self._writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self._reader_executor = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="sqlite-reader")
+        await asyncio.get_running_loop().run_in_executor(self._writer_executor, self._open_writer)
+
+        logger.info(f"🗄️ SQLiteStore 已打開: {self.db_path} (讀連接: {self.readers})")
+
+    def create_function(self, name: str, num_params: int, func: Callable, deterministic: bool = False):
+        """註冊SQL函數（對寫連接和之後打開的讀連接生效）
+
+        只有結果僅取決於參數的函數才能設置 deterministic=True（例如依賴當前
+        時間的函數不能），否則SQLite可能複用或在索引中固化過期的結果。
+        """
+        self._functions.append((name, num_params, func, deterministic))
+        if self.writer is not None:
+            self._writer_executor.submit(
+                self.writer.create_function, name, num_params, func, deterministic=deterministic
+            ).result()
+
+    def _run_write(self, fn: Callable, args: Tuple) -> Any:
+        with self.writer:
+            return fn(self.writer, *args)
+
+    def _run_read(self, fn: Callable, args: Tuple) -> Any:
+        return fn(self._reader(), *args)
+
+    async def write(self, fn: Callable, *args) -> Any:
+        """在寫線程中以單個事務執行 fn(connection, *args)"""
+        self.stats["writes"] += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._writer_executor, self._run_write, fn, args
+        )
+
+    async def read(self, fn: Callable, *args) -> Any:
+        """在讀線程中執行 fn(connection, *args)"""
+        self.stats["reads"] += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._reader_executor, self._run_read, fn, args
+        )
+
+    async def fetchall(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        return await self.read(lambda connection: connection.execute(sql, params).fetchall())
+
+    async def fetchone(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        return await self.read(lambda connection: connection.execute(sql, params).fetchone())
+
+    async def execute(self, sql: str, params: Sequence = ()) -> int:
+        """執行寫語句，返回影響的行數"""
+        return await self.write(lambda connection: connection.execute(sql, params).rowcount)
+
+    async def executemany(self, sql: str, seq_of_params: Sequence[Sequence]) -> int:
+        return await self.write(lambda connection: connection.executemany(sql, seq_of_params).rowcount)
+
+    async def executescript(self, script: str):
+        await self.write(lambda connection: connection.executescript(script))
+
+    def _close_connections(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        with self._reader_lock:
+            for connection in self._reader_connections:
+                connection.close()
+            self._reader_connections.clear()
+        self._reader_local = threading.local()
+
+    async def close(self):
+        """釋放連接池；最後一個使用者釋放時關閉所有連接
+
+        等待執行器排空在默認線程池中進行，不阻塞事件循環。
+        """
+        self._refs -= 1
+        if self._refs > 0 or self._writer_executor is None:
+            return
+
+        # 先移出共享表，關閉期間的 open_store 會創建新的連接池
+        key = str(self.db_path.resolve())
+        if _stores.get(key) is self:
+            del _stores[key]
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._reader_executor.shutdown, True)
+        await loop.run_in_executor(self._writer_executor, self._close_connections)
+        await loop.run_in_executor(None, self._writer_executor.shutdown, True)
+        self._writer_executor = None
+        self._reader_executor = None
+
+        logger.info(f"🗄️ SQLiteStore 已關閉: {self.db_path}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "db_path": str(self.db_path),
+            "readers": self.readers,
+            "open_reader_connections": len(self._reader_connections),
+            "references": self._refs,
+            **self.stats
+        }
+
+
+async def open_store(db_path: str, **kwargs) -> SQLiteStore:
+    """打開（或共享已打開的）數據庫連接池，使用完畢後調用 close()"""
+    key = str(Path(db_path).resolve())
+    store = _stores.get(key)
+    if store is None:
+        store = _stores[key] = SQLiteStore(db_path, **kwargs)
+    await store.open()
+    return store
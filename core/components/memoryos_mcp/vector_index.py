@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+MemoryOS MCP - 向量索引
+確定性哈希嵌入和基於內存映射矩陣的相似記憶檢索
+"""
+
+import math
+import re
+import zlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """哈希n-gram嵌入
+
+    將詞、相鄰詞對和詞內字符三元組通過特徵哈希投影到固定維度，
+    使用亞線性詞頻權重和符號哈希，結果與進程、隨機種子無關。
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> Dict[str, int]:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        features: Dict[str, int] = {}
+
+        for i, token in enumerate(tokens):
+            features[f"w:{token}"] = features.get(f"w:{token}", 0) + 1
+            if i > 0:
+                bigram = f"b:{tokens[i - 1]} {token}"
+                features[bigram] = features.get(bigram, 0) + 1
+
+            # 字符三元組：處理無空格分詞的中文和拼寫變體
+            padded = f"#{token}#"
+            for j in range(len(padded) - 2):
+                trigram = f"c:{padded[j:j + 3]}"
+                features[trigram] = features.get(trigram, 0) + 1
+
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """生成L2歸一化的float32嵌入向量"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+
+        for feature, count in self._features(text).items():
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            index = hashed % self.dim
+            sign = 1.0 if (hashed >> 31) & 1 else -1.0
+            vector[index] += sign * (1.0 + math.log(count))
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class MemoryVectorIndex:
+    """記憶向量索引
+
+    所有嵌入存放在一個內存映射的float32矩陣中（<path>.f32），
+    行分配和刪除墓碑記錄在追加寫入的日誌中（<path>.log），
+    查詢是一次矩陣-向量乘法加argpartition取top-k。
+    """
+
+    def __init__(self, path: Path, dim: int = 256, initial_capacity: int = 1024):
+        self.path = Path(path)
+        self.matrix_path = self.path.with_suffix(".f32")
+        self.log_path = self.path.with_suffix(".log")
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+
+        self.matrix: Optional[np.memmap] = None
+        self.capacity = 0
+        self.size = 0  # 已分配的行數（含墓碑）
+        self.log_records = 0  # 日誌記錄數（含被更新覆蓋的記錄和墓碑）
+        self.row_ids: List[Optional[str]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.live = np.zeros(0, dtype=bool)
+        self.type_codes = np.zeros(0, dtype=np.int16)
+        self.type_map: Dict[str, int] = {}
+        self._log_file = None
+
+    def __len__(self) -> int:
+        return len(self.id_to_row)
+
+    def _open_matrix(self, capacity: int):
+        """打開（必要時擴展）內存映射矩陣"""
+        if self.matrix is not None:
+            self.matrix.flush()
+            del self.matrix
+
+        required = capacity * self.dim * 4
+        self.matrix_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.matrix_path, "ab") as f:
+            if f.tell() < required:
+                f.truncate(required)
+
+        self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+        if len(self.live) < capacity:
+            self.live = np.concatenate([self.live, np.zeros(capacity - len(self.live), dtype=bool)])
+            self.type_codes = np.concatenate([
+                self.type_codes, np.zeros(capacity - len(self.type_codes), dtype=np.int16)
+            ])
+
+    def _type_code(self, memory_type: str) -> int:
+        code = self.type_map.get(memory_type)
+        if code is None:
+            code = self.type_map[memory_type] = len(self.type_map) + 1
+        return code
+
+    def _append_log(self, line: str):
+        if self._log_file is None:
+            self._log_file = open(self.log_path, "a", encoding="utf-8")
+        self._log_file.write(line + "\n")
+        self.log_records += 1
+
+    def load(self) -> bool:
+        """從磁盤恢復索引，返回是否存在可用的持久化數據"""
+        self.row_ids = []
+        self.id_to_row = {}
+        self.live = np.zeros(0, dtype=bool)
+        self.type_codes = np.zeros(0, dtype=np.int16)
+        self.type_map = {}
+        self.size = 0
+        self.log_records = 0
+
+        if not self.log_path.exists() or not self.matrix_path.exists():
+            self._open_matrix(self.initial_capacity)
+            return False
+
+        rows: List[Tuple[int, str, str]] = []
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if parts[0] == "+" and len(parts) == 4:
+                    rows.append((int(parts[1]), parts[2], parts[3]))
+                elif parts[0] == "-" and len(parts) == 2:
+                    rows.append((-1, "", parts[1]))
+        self.log_records = len(rows)
+
+        max_row = max((row for row, _, _ in rows), default=-1)
+        capacity = max(self.initial_capacity, _matrix_rows(self.matrix_path, self.dim), max_row + 1)
+        self._open_matrix(capacity)
+
+        for row, memory_type, memory_id in rows:
+            if row < 0:
+                old_row = self.id_to_row.pop(memory_id, None)
+                if old_row is not None:
+                    self.live[old_row] = False
+                continue
+
+            old_row = self.id_to_row.get(memory_id)
+            if old_row is not None and old_row != row:
+                self.live[old_row] = False
+
+            while len(self.row_ids) <= row:
+                self.row_ids.append(None)
+            self.row_ids[row] = memory_id
+            self.id_to_row[memory_id] = row
+            self.live[row] = True
+            self.type_codes[row] = self._type_code(memory_type)
+            self.size = max(self.size, row + 1)
+
+        logger.info(f"📐 向量索引已載入: {len(self)} 條 ({self.size} 行)")
+        return True
+
+    def add(self, memory_id: str, memory_type: str, vector: np.ndarray):
+        """添加或更新記憶向量"""
+        row = self.id_to_row.get(memory_id)
+        if row is None:
+            if self.size >= self.capacity:
+                self._open_matrix(max(self.initial_capacity, self.capacity * 2))
+            row = self.size
+            self.size += 1
+            self.row_ids.append(memory_id)
+            self.id_to_row[memory_id] = row
+
+        self.matrix[row] = vector
+        self.live[row] = True
+        self.type_codes[row] = self._type_code(memory_type)
+        self._append_log(f"+\t{row}\t{memory_type}\t{memory_id}")
+        self._maybe_compact()
+
+    def remove(self, memory_ids: Iterable[str]):
+        """刪除記憶向量（寫入墓碑）"""
+        for memory_id in memory_ids:
+            row = self.id_to_row.pop(memory_id, None)
+            if row is None:
+                continue
+            self.live[row] = False
+            self.row_ids[row] = None
+            self._append_log(f"-\t{memory_id}")
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        """墓碑行或失效日誌記錄（刪除和被更新覆蓋的記錄）過多時壓縮"""
+        total = max(self.size, self.log_records)
+        if total > 1024 and len(self) < total // 2:
+            self.compact()
+
+    def search(self, query: np.ndarray, k: int,
+               memory_type: Optional[str] = None) -> List[Tuple[str, float]]:
+        """返回與查詢向量最相似的 (memory_id, score) 列表"""
+        if self.size == 0 or k <= 0:
+            return []
+
+        mask = self.live[:self.size]
+        if memory_type is not None:
+            code = self.type_map.get(memory_type)
+            if code is None:
+                return []
+            mask = mask & (self.type_codes[:self.size] == code)
+
+        candidate_count = int(mask.sum())
+        if candidate_count == 0:
+            return []
+
+        scores = self.matrix[:self.size] @ query.astype(np.float32)
+        scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, candidate_count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [(self.row_ids[row], float(scores[row])) for row in top]
+
+    def rebuild(self, items: Iterable[Tuple[str, str, np.ndarray]]):
+        """從頭重建索引"""
+        self.close()
+        for file_path in (self.matrix_path, self.log_path):
+            if file_path.exists():
+                file_path.unlink()
+
+        self.load()
+        for memory_id, memory_type, vector in items:
+            self.add(memory_id, memory_type, vector)
+        self.flush()
+
+        logger.info(f"📐 向量索引已重建: {len(self)} 條")
+
+    def compact(self):
+        """移除墓碑行並重寫日誌"""
+        type_names = {code: name for name, code in self.type_map.items()}
+        live_rows = [
+            (self.row_ids[row], type_names.get(int(self.type_codes[row]), ""), np.array(self.matrix[row]))
+            for row in range(self.size) if self.live[row]
+        ]
+        self.rebuild(live_rows)
+
+    def flush(self):
+        """將矩陣和日誌刷寫到磁盤"""
+        if self.matrix is not None:
+            self.matrix.flush()
+        if self._log_file is not None:
+            self._log_file.flush()
+
+    def close(self):
+        """關閉索引文件"""
+        self.flush()
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+        if self.matrix is not None:
+            del self.matrix
+            self.matrix = None
+        self.capacity = 0
+
+
+def _matrix_rows(matrix_path: Path, dim: int) -> int:
+    """根據矩陣文件大小計算可容納的行數"""
+    try:
+        return matrix_path.stat().st_size // (dim * 4)
+    except OSError:
+        return 0
@@ -5,9 +5,12 @@ Mirror Code 使用追踪器
 """
 
 import json
+import os
 import time
 import asyncio
+from collections import deque
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, asdict
 from enum import Enum
@@ -49,13 +52,50 @@ class ModelUsageRecord:
             'model_provider': self.model_provider.value,
             'token_usage': asdict(self.token_usage)
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ModelUsageRecord':
+        return cls(**{
+            **data,
+            'model_provider': ModelProvider(data['model_provider']),
+            'token_usage': TokenUsage(**data['token_usage'])
+        })
+
+SNAPSHOT_VERSION = 2
+
+def _empty_rollup() -> Dict[str, Any]:
+    return {
+        "count": 0,
+        "success_count": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "cost_usd": 0.0,
+        "response_time_ms": 0
+    }
 
 class MirrorCodeUsageTracker:
-    """Mirror Code 使用追踪器"""
+    """Mirror Code 使用追踪器
+    
+    每条记录追加写入JSONL账本（<config_path>.jsonl），统计信息增量维护；
+    每隔 snapshot_interval 条记录把汇总写成快照（config_path），启动时载入快照
+    并只重放快照之后的账本尾部。按提供方/按小时的汇总和模型切换统计跨会话
+    累计，session_stats 只统计本次会话。
+    """
     
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None,
+                 snapshot_interval: int = 500,
+                 max_ledger_bytes: int = 16 * 1024 * 1024,
+                 recent_limit: int = 100,
+                 resume: bool = True):
         self.config_path = config_path or "/tmp/mirror_code_usage.json"
-        self.session_records: List[ModelUsageRecord] = []
+        self.ledger_path = Path(self.config_path).with_suffix(".jsonl")
+        self.snapshot_interval = snapshot_interval
+        self.max_ledger_bytes = max_ledger_bytes
+        self.recent_limit = recent_limit
+        
+        # 只在内存中保留最近的记录，完整历史在账本中
+        self.session_records = deque(maxlen=recent_limit)
         self.session_stats = {
             "session_start": datetime.now().isoformat(),
             "total_commands": 0,
@@ -64,9 +104,27 @@ class MirrorCodeUsageTracker:
             "claude_direct_count": 0,
             "total_cost_usd": 0.0,
             "total_tokens": TokenUsage(),
+            "total_response_time_ms": 0,
             "average_response_time": 0.0
         }
         
+        # 预聚合：按模型提供方和按小时
+        self.provider_rollups: Dict[str, Dict[str, Any]] = {
+            provider.value: _empty_rollup() for provider in ModelProvider
+        }
+        self.hourly_rollups: Dict[str, Dict[str, Any]] = {}
+        
+        # 增量维护的模型切换统计
+        self.switch_stats = {
+            "last_provider": None,
+            "total_switches": 0,
+            "switch_patterns": {},
+            "recent_switches": deque(maxlen=5)
+        }
+        
+        self._ledger_file = None
+        self._records_since_snapshot = 0
+        
         # 模型定价配置 (每1K tokens的价格，USD)
         self.pricing = {
             ModelProvider.K2_LOCAL: {
@@ -85,6 +143,9 @@ class MirrorCodeUsageTracker:
                 "model_name": "Claude-3-Sonnet"
             }
         }
+        
+        if resume:
+            self._load_usage_data()
     
     def calculate_cost(self, provider: ModelProvider, token_usage: TokenUsage) -> float:
         """计算Token使用成本"""
@@ -117,17 +178,21 @@ class MirrorCodeUsageTracker:
             error_message=error_message
         )
         
-        # 添加到会话记录
-        self.session_records.append(record)
-        
-        # 更新会话统计
+        # 应用到内存统计
+        self._apply_record(record)
         self._update_session_stats(record)
         
-        # 保存到文件
-        self._save_usage_data()
+        # 追加到账本，定期写快照
+        self._append_to_ledger(record)
         
         return record
     
+    def _apply_record(self, record: ModelUsageRecord):
+        """把一条记录应用到最近记录和跨会话的聚合（O(1)）"""
+        self.session_records.append(record)
+        self._update_rollups(record)
+        self._update_switch_stats(record)
+    
     def _update_session_stats(self, record: ModelUsageRecord):
         """更新会话统计信息"""
         self.session_stats["total_commands"] += 1
@@ -142,28 +207,157 @@ class MirrorCodeUsageTracker:
         elif record.model_provider == ModelProvider.CLAUDE_DIRECT:
             self.session_stats["claude_direct_count"] += 1
         
-        # 更新平均响应时间
-        total_time = sum(r.response_time_ms for r in self.session_records)
-        self.session_stats["average_response_time"] = total_time / len(self.session_records)
+        # 更新平均响应时间（累计总时长）
+        self.session_stats["total_response_time_ms"] += record.response_time_ms
+        self.session_stats["average_response_time"] = (
+            self.session_stats["total_response_time_ms"] / self.session_stats["total_commands"]
+        )
+    
+    def _update_rollups(self, record: ModelUsageRecord):
+        """更新按提供方和按小时的预聚合"""
+        hour = record.timestamp[:13]  # YYYY-MM-DDTHH
+        if hour not in self.hourly_rollups:
+            self.hourly_rollups[hour] = _empty_rollup()
+        
+        for rollup in (self.provider_rollups[record.model_provider.value], self.hourly_rollups[hour]):
+            rollup["count"] += 1
+            rollup["success_count"] += 1 if record.success else 0
+            rollup["input_tokens"] += record.token_usage.input_tokens
+            rollup["output_tokens"] += record.token_usage.output_tokens
+            rollup["total_tokens"] += record.token_usage.total_tokens
+            rollup["cost_usd"] += record.cost_usd
+            rollup["response_time_ms"] += record.response_time_ms
+    
+    def _update_switch_stats(self, record: ModelUsageRecord):
+        """更新模型切换统计"""
+        previous = self.switch_stats["last_provider"]
+        current = record.model_provider.value
+        self.switch_stats["last_provider"] = current
+        
+        if previous is None or previous == current:
+            return
+        
+        pattern = f"{previous} → {current}"
+        patterns = self.switch_stats["switch_patterns"]
+        patterns[pattern] = patterns.get(pattern, 0) + 1
+        self.switch_stats["total_switches"] += 1
+        self.switch_stats["recent_switches"].append({
+            "from": previous,
+            "to": current,
+            "timestamp": record.timestamp,
+            "command": record.command
+        })
     
-    def _save_usage_data(self):
-        """保存使用数据到文件"""
+    def _append_to_ledger(self, record: ModelUsageRecord):
+        """追加一条记录到JSONL账本"""
         try:
-            # 修复TokenUsage序列化问题
-            session_stats_serializable = {
-                **self.session_stats,
-                "total_tokens": asdict(self.session_stats["total_tokens"])
-            }
+            if self._ledger_file is None:
+                self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+                self._ledger_file = open(self.ledger_path, 'a', encoding='utf-8')
             
-            data = {
-                "session_stats": session_stats_serializable,
-                "records": [record.to_dict() for record in self.session_records[-100:]]  # 只保存最近100条
-            }
+            self._ledger_file.write(json.dumps(record.to_dict(), ensure_ascii=False, separators=(',', ':')) + "\n")
+            self._ledger_file.flush()
+            
+            self._records_since_snapshot += 1
+            if self._records_since_snapshot >= self.snapshot_interval:
+                self.save_snapshot()
+        except Exception as e:
+            logger.error(f"写入使用账本失败: {e}")
+    
+    def save_snapshot(self):
+        """把聚合写成快照；账本超过上限时压缩（清空已纳入快照的部分）
+        
+        压缩时先写入指向账本末尾的快照，再清空账本，最后写入偏移为0的快照：
+        任何一步中断，快照和账本都保持一致（偏移超过账本大小时从头重放）。
+        """
+        try:
+            ledger_offset = 0
+            if self._ledger_file is not None:
+                self._ledger_file.flush()
+                ledger_offset = self._ledger_file.tell()
             
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self._write_snapshot(ledger_offset)
+            
+            if ledger_offset > self.max_ledger_bytes:
+                self._ledger_file.truncate(0)
+                self._ledger_file.seek(0)
+                self._write_snapshot(0)
+            
+            self._records_since_snapshot = 0
         except Exception as e:
-            logger.error(f"保存使用数据失败: {e}")
+            logger.error(f"保存使用快照失败: {e}")
+    
+    def _write_snapshot(self, ledger_offset: int):
+        """写入快照：先写临时文件再原子替换，避免快照损坏"""
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "provider_rollups": self.provider_rollups,
+            "hourly_rollups": self.hourly_rollups,
+            "switch_stats": {
+                **self.switch_stats,
+                "recent_switches": list(self.switch_stats["recent_switches"])
+            },
+            "records": [record.to_dict() for record in self.session_records],
+            "ledger_offset": ledger_offset
+        }
+        
+        temp_path = f"{self.config_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, self.config_path)
+    
+    def _load_usage_data(self):
+        """载入快照并重放其后的账本记录（只恢复跨会话聚合，本次会话从零开始）"""
+        ledger_offset = 0
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            
+            if data.get("version") == SNAPSHOT_VERSION:
+                self.provider_rollups.update(data["provider_rollups"])
+                self.hourly_rollups = data["hourly_rollups"]
+                self.switch_stats.update({
+                    **data["switch_stats"],
+                    "recent_switches": deque(data["switch_stats"]["recent_switches"], maxlen=5)
+                })
+                self.session_records.extend(ModelUsageRecord.from_dict(r) for r in data["records"])
+                ledger_offset = data["ledger_offset"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"载入使用快照失败，从账本重建: {e}")
+        
+        if not self.ledger_path.exists():
+            return
+        
+        replayed = 0
+        try:
+            with open(self.ledger_path, 'r', encoding='utf-8') as f:
+                if ledger_offset <= os.path.getsize(self.ledger_path):
+                    f.seek(ledger_offset)
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        self._apply_record(ModelUsageRecord.from_dict(json.loads(line)))
+                        replayed += 1
+                    except (ValueError, KeyError, TypeError):
+                        # 进程中断时可能留下不完整的最后一行
+                        logger.warning("跳过无法解析的使用账本记录")
+        except Exception as e:
+            logger.error(f"重放使用账本失败: {e}")
+        
+        self._records_since_snapshot = replayed
+        if replayed:
+            logger.info(f"已从使用账本恢复 {replayed} 条记录")
+    
+    def close(self):
+        """写入最终快照并关闭账本"""
+        if self._records_since_snapshot:
+            self.save_snapshot()
+        if self._ledger_file is not None:
+            self._ledger_file.close()
+            self._ledger_file = None
     
     def get_current_session_summary(self) -> Dict[str, Any]:
         """获取当前会话摘要"""
@@ -234,7 +428,7 @@ class MirrorCodeUsageTracker:
     
     def get_recent_activity(self, limit: int = 10) -> List[Dict[str, Any]]:
         """获取最近的活动记录"""
-        recent_records = self.session_records[-limit:] if self.session_records else []
+        recent_records = list(self.session_records)[-limit:] if self.session_records else []
         
         return [{
             "timestamp": record.timestamp,
@@ -249,34 +443,31 @@ class MirrorCodeUsageTracker:
     
     def get_model_switch_analysis(self) -> Dict[str, Any]:
         """分析模型切换模式"""
-        if not self.session_records:
+        # 切换统计跨会话累计，切换率按累计指令数计算
+        total_commands = sum(rollup["count"] for rollup in self.provider_rollups.values())
+        if total_commands == 0:
             return {"message": "暂无数据"}
         
-        # 分析切换模式
-        switches = []
-        for i in range(1, len(self.session_records)):
-            prev_provider = self.session_records[i-1].model_provider
-            curr_provider = self.session_records[i].model_provider
-            
-            if prev_provider != curr_provider:
-                switches.append({
-                    "from": prev_provider.value,
-                    "to": curr_provider.value,
-                    "timestamp": self.session_records[i].timestamp,
-                    "command": self.session_records[i].command
-                })
-        
-        # 统计切换频率
-        switch_patterns = {}
-        for switch in switches:
-            pattern = f"{switch['from']} → {switch['to']}"
-            switch_patterns[pattern] = switch_patterns.get(pattern, 0) + 1
-        
+        total_switches = self.switch_stats["total_switches"]
         return {
-            "total_switches": len(switches),
-            "switch_patterns": switch_patterns,
-            "recent_switches": switches[-5:] if switches else [],
-            "switch_rate": round(len(switches) / len(self.session_records) * 100, 1) if self.session_records else 0
+            "total_switches": total_switches,
+            "switch_patterns": dict(self.switch_stats["switch_patterns"]),
+            "recent_switches": list(self.switch_stats["recent_switches"]),
+            "switch_rate": round(total_switches / total_commands * 100, 1)
+        }
+    
+    def get_cost_rollups(self) -> Dict[str, Any]:
+        """获取按提供方和按小时的预聚合成本/用量"""
+        return {
+            "by_provider": {
+                provider: {**rollup, "cost_usd": round(rollup["cost_usd"], 4)}
+                for provider, rollup in self.provider_rollups.items()
+                if rollup["count"]
+            },
+            "by_hour": {
+                hour: {**rollup, "cost_usd": round(rollup["cost_usd"], 4)}
+                for hour, rollup in sorted(self.hourly_rollups.items())
+            }
         }
     
     def generate_usage_report(self) -> str:
@@ -284,6 +475,10 @@ class MirrorCodeUsageTracker:
         summary = self.get_current_session_summary()
         recent_activity = self.get_recent_activity(5)
         switch_analysis = self.get_model_switch_analysis()
+        provider_costs = "".join(
+            f"• {provider}: ${rollup['cost_usd']} / {rollup['total_tokens']} tokens\n"
+            for provider, rollup in self.get_cost_rollups()["by_provider"].items()
+        )
         
         report = f"""
 🔄 **Mirror Code 使用报告**
@@ -302,7 +497,7 @@ class MirrorCodeUsageTracker:
 • 实际成本: ${summary.get('cost_analysis', {}).get('actual_cost_usd', 0)}
 • 如全用Claude: ${summary.get('cost_analysis', {}).get('if_all_claude_cost_usd', 0)}
 • 节省成本: ${summary.get('cost_analysis', {}).get('cost_savings_usd', 0)} ({summary.get('cost_analysis', {}).get('savings_percentage', 0)}%)
-
+{provider_costs}
 🔢 **Token 使用**
 • 总Token: {summary.get('token_usage', {}).get('total_tokens', 0)}
 • 输入Token: {summary.get('token_usage', {}).get('input_tokens', 0)}
@@ -17,17 +17,24 @@ import ast
 import json
 import re
 import os
+import hashlib
+import sqlite3
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Set, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
 from enum import Enum
 from pathlib import Path
 import subprocess
 import networkx as nx
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 logger = logging.getLogger(__name__)
 
+# Django路由 path('...') 模式
+_DJANGO_PATH_PATTERN = re.compile(r"path\s*\(\s*['\"]([^'\"]+)['\"]")
+
 
 class ProjectAnalyzerMCP:
     """項目分析器MCP"""
@@ -180,90 +187,132 @@ class ProjectArchitecture:
 
 
 class CodeParsingEngine:
-    """代碼解析引擎"""
+    """代碼解析引擎
+    
+    每個文件只解析一次：AST完整遍歷一次並按類別分組節點（保持 ast.walk
+    的順序），各提取器只讀取需要的分組。生成的文件摘要只含基本類型，
+    可以在進程間傳遞，組件、API端點、依賴關係和指標都從摘要派生。
+    """
+    
+    # 節點類別（提取器按類別讀取節點）
+    NODE_GROUPS = {
+        ast.ClassDef: "classes",
+        ast.FunctionDef: "functions",
+        ast.AsyncFunctionDef: "async_functions",
+        ast.Import: "imports",
+        ast.ImportFrom: "imports",
+        ast.Assign: "assignments",
+        ast.If: "branches",
+        ast.While: "branches",
+        ast.For: "branches",
+        ast.AsyncFor: "branches",
+        ast.ExceptHandler: "branches",
+        ast.comprehension: "branches"
+    }
     
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
     
     async def parse_python_file(self, file_path: Path) -> Dict[str, Any]:
         """解析Python文件"""
+        return self.summarize_file(file_path)
+    
+    def summarize_file(self, file_path: Path) -> Dict[str, Any]:
+        """讀取並解析文件，返回文件摘要；失敗時返回空字典"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            tree = ast.parse(content)
-            
-            return {
-                "classes": self._extract_classes(tree),
-                "functions": self._extract_functions(tree),
-                "imports": self._extract_imports(tree),
-                "constants": self._extract_constants(tree),
-                "decorators": self._extract_decorators(tree),
-                "api_endpoints": self._extract_api_endpoints(tree, content),
-                "complexity": self._calculate_complexity(tree),
-                "lines_of_code": len(content.split('\n'))
-            }
+            return self.summarize_source(content)
             
         except Exception as e:
             self.logger.error(f"解析文件失敗 {file_path}: {e}")
             return {}
     
-    def _extract_classes(self, tree: ast.AST) -> List[Dict[str, Any]]:
+    def summarize_source(self, content: str) -> Dict[str, Any]:
+        """解析源碼並生成文件摘要"""
+        tree = ast.parse(content)
+        nodes = self._group_nodes(tree)
+        
+        return {
+            "classes": self._extract_classes(nodes),
+            "functions": self._extract_functions(nodes),
+            "imports": self._extract_imports(nodes),
+            "constants": self._extract_constants(nodes),
+            "decorators": self._extract_decorators(nodes),
+            "api_endpoints": self._extract_api_endpoints(nodes, content),
+            "complexity": self._calculate_complexity(nodes),
+            "lines_of_code": len(content.split('\n'))
+        }
+    
+    def _group_nodes(self, tree: ast.AST) -> Dict[str, List[ast.AST]]:
+        """遍歷一次AST，按類別分組節點"""
+        groups = defaultdict(list)
+        for node in ast.walk(tree):
+            group = self.NODE_GROUPS.get(type(node))
+            if group is not None:
+                groups[group].append(node)
+        return groups
+    
+    def _extract_classes(self, nodes: Dict[str, List[ast.AST]]) -> List[Dict[str, Any]]:
         """提取類定義"""
         classes = []
         
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                class_info = {
-                    "name": node.name,
-                    "line_number": node.lineno,
-                    "bases": [self._get_name(base) for base in node.bases],
-                    "methods": [],
-                    "decorators": [self._get_name(dec) for dec in node.decorator_list]
-                }
-                
-                # 提取方法
-                for item in node.body:
-                    if isinstance(item, ast.FunctionDef):
-                        method_info = {
-                            "name": item.name,
-                            "line_number": item.lineno,
-                            "args": [arg.arg for arg in item.args.args],
-                            "decorators": [self._get_name(dec) for dec in item.decorator_list],
-                            "is_private": item.name.startswith('_'),
-                            "is_static": any(self._get_name(dec) == "staticmethod" for dec in item.decorator_list),
-                            "is_class_method": any(self._get_name(dec) == "classmethod" for dec in item.decorator_list)
-                        }
-                        class_info["methods"].append(method_info)
-                
-                classes.append(class_info)
+        for node in nodes["classes"]:
+            class_info = {
+                "name": node.name,
+                "line_number": node.lineno,
+                "bases": [self._get_name(base) for base in node.bases],
+                "methods": [],
+                "decorators": [self._get_name(dec) for dec in node.decorator_list]
+            }
+            
+            # 提取方法
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef):
+                    method_info = {
+                        "name": item.name,
+                        "line_number": item.lineno,
+                        "args": [arg.arg for arg in item.args.args],
+                        "decorators": [self._get_name(dec) for dec in item.decorator_list],
+                        "is_private": item.name.startswith('_'),
+                        "is_static": any(self._get_name(dec) == "staticmethod" for dec in item.decorator_list),
+                        "is_class_method": any(self._get_name(dec) == "classmethod" for dec in item.decorator_list)
+                    }
+                    class_info["methods"].append(method_info)
+            
+            classes.append(class_info)
         
         return classes
     
-    def _extract_functions(self, tree: ast.AST) -> List[Dict[str, Any]]:
-        """提取函數定義"""
+    def _extract_functions(self, nodes: Dict[str, List[ast.AST]]) -> List[Dict[str, Any]]:
+        """提取函數定義（不含類方法）"""
         functions = []
         
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef) and not self._is_method(node, tree):
-                function_info = {
-                    "name": node.name,
-                    "line_number": node.lineno,
-                    "args": [arg.arg for arg in node.args.args],
-                    "decorators": [self._get_name(dec) for dec in node.decorator_list],
-                    "is_async": isinstance(node, ast.AsyncFunctionDef),
-                    "return_annotation": self._get_name(node.returns) if node.returns else None,
-                    "complexity": self._calculate_function_complexity(node)
-                }
-                functions.append(function_info)
+        # 類體中直接定義的函數即方法
+        methods = {id(item) for cls in nodes["classes"] for item in cls.body}
+        
+        for node in nodes["functions"]:
+            if id(node) in methods:
+                continue
+            function_info = {
+                "name": node.name,
+                "line_number": node.lineno,
+                "args": [arg.arg for arg in node.args.args],
+                "decorators": [self._get_name(dec) for dec in node.decorator_list],
+                "is_async": isinstance(node, ast.AsyncFunctionDef),
+                "return_annotation": self._get_name(node.returns) if node.returns else None,
+                "complexity": self._calculate_function_complexity(node)
+            }
+            functions.append(function_info)
         
         return functions
     
-    def _extract_imports(self, tree: ast.AST) -> List[Dict[str, Any]]:
+    def _extract_imports(self, nodes: Dict[str, List[ast.AST]]) -> List[Dict[str, Any]]:
         """提取導入語句"""
         imports = []
         
-        for node in ast.walk(tree):
+        for node in nodes["imports"]:
             if isinstance(node, ast.Import):
                 for alias in node.names:
                     imports.append({
@@ -272,11 +321,12 @@ class CodeParsingEngine:
                         "alias": alias.asname,
                         "line_number": node.lineno
                     })
-            elif isinstance(node, ast.ImportFrom):
+            else:
                 for alias in node.names:
                     imports.append({
                         "type": "from_import",
                         "module": node.module,
+                        "level": node.level,
                         "name": alias.name,
                         "alias": alias.asname,
                         "line_number": node.lineno
@@ -284,43 +334,42 @@ class CodeParsingEngine:
         
         return imports
     
-    def _extract_constants(self, tree: ast.AST) -> List[Dict[str, Any]]:
+    def _extract_constants(self, nodes: Dict[str, List[ast.AST]]) -> List[Dict[str, Any]]:
         """提取常量定義"""
         constants = []
         
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name) and target.id.isupper():
-                        constants.append({
-                            "name": target.id,
-                            "line_number": node.lineno,
-                            "value": self._get_literal_value(node.value)
-                        })
+        for node in nodes["assignments"]:
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id.isupper():
+                    constants.append({
+                        "name": target.id,
+                        "line_number": node.lineno,
+                        "value": self._get_literal_value(node.value)
+                    })
         
         return constants
     
-    def _extract_decorators(self, tree: ast.AST) -> Set[str]:
+    def _extract_decorators(self, nodes: Dict[str, List[ast.AST]]) -> List[str]:
         """提取裝飾器"""
         decorators = set()
         
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
+        for group in ("classes", "functions", "async_functions"):
+            for node in nodes[group]:
                 for dec in node.decorator_list:
                     decorators.add(self._get_name(dec))
         
         return list(decorators)
     
-    def _extract_api_endpoints(self, tree: ast.AST, content: str) -> List[Dict[str, Any]]:
+    def _extract_api_endpoints(self, nodes: Dict[str, List[ast.AST]], content: str) -> List[Dict[str, Any]]:
         """提取API端點"""
         endpoints = []
         
         # 檢查Flask路由
-        flask_routes = self._extract_flask_routes(tree)
+        flask_routes = self._extract_flask_routes(nodes)
         endpoints.extend(flask_routes)
         
         # 檢查FastAPI路由
-        fastapi_routes = self._extract_fastapi_routes(tree)
+        fastapi_routes = self._extract_fastapi_routes(nodes)
         endpoints.extend(fastapi_routes)
         
         # 檢查Django URL模式
@@ -329,53 +378,51 @@ class CodeParsingEngine:
         
         return endpoints
     
-    def _extract_flask_routes(self, tree: ast.AST) -> List[Dict[str, Any]]:
+    def _extract_flask_routes(self, nodes: Dict[str, List[ast.AST]]) -> List[Dict[str, Any]]:
         """提取Flask路由"""
         routes = []
         
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                for dec in node.decorator_list:
-                    if isinstance(dec, ast.Call) and self._get_name(dec.func) in ["route", "app.route"]:
-                        route_info = {
-                            "framework": "flask",
-                            "function": node.name,
-                            "line_number": node.lineno,
-                            "path": self._get_literal_value(dec.args[0]) if dec.args else "",
-                            "methods": []
-                        }
-                        
-                        # 提取HTTP方法
-                        for keyword in dec.keywords:
-                            if keyword.arg == "methods":
-                                if isinstance(keyword.value, ast.List):
-                                    route_info["methods"] = [
-                                        self._get_literal_value(elt) for elt in keyword.value.elts
-                                    ]
-                        
-                        routes.append(route_info)
+        for node in nodes["functions"]:
+            for dec in node.decorator_list:
+                if isinstance(dec, ast.Call) and self._get_name(dec.func) in ["route", "app.route"]:
+                    route_info = {
+                        "framework": "flask",
+                        "function": node.name,
+                        "line_number": node.lineno,
+                        "path": self._get_literal_value(dec.args[0]) if dec.args else "",
+                        "methods": []
+                    }
+                    
+                    # 提取HTTP方法
+                    for keyword in dec.keywords:
+                        if keyword.arg == "methods":
+                            if isinstance(keyword.value, ast.List):
+                                route_info["methods"] = [
+                                    self._get_literal_value(elt) for elt in keyword.value.elts
+                                ]
+                    
+                    routes.append(route_info)
         
         return routes
     
-    def _extract_fastapi_routes(self, tree: ast.AST) -> List[Dict[str, Any]]:
+    def _extract_fastapi_routes(self, nodes: Dict[str, List[ast.AST]]) -> List[Dict[str, Any]]:
         """提取FastAPI路由"""
         routes = []
         
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                for dec in node.decorator_list:
-                    if isinstance(dec, ast.Call):
-                        func_name = self._get_name(dec.func)
-                        if func_name in ["app.get", "app.post", "app.put", "app.delete", "app.patch"]:
-                            method = func_name.split(".")[-1].upper()
-                            route_info = {
-                                "framework": "fastapi",
-                                "function": node.name,
-                                "line_number": node.lineno,
-                                "path": self._get_literal_value(dec.args[0]) if dec.args else "",
-                                "methods": [method]
-                            }
-                            routes.append(route_info)
+        for node in nodes["functions"]:
+            for dec in node.decorator_list:
+                if isinstance(dec, ast.Call):
+                    func_name = self._get_name(dec.func)
+                    if func_name in ["app.get", "app.post", "app.put", "app.delete", "app.patch"]:
+                        method = func_name.split(".")[-1].upper()
+                        route_info = {
+                            "framework": "fastapi",
+                            "function": node.name,
+                            "line_number": node.lineno,
+                            "path": self._get_literal_value(dec.args[0]) if dec.args else "",
+                            "methods": [method]
+                        }
+                        routes.append(route_info)
         
         return routes
     
@@ -383,8 +430,10 @@ class CodeParsingEngine:
         """提取Django URL模式"""
         routes = []
         
-        # 簡化的Django URL提取
-        url_patterns = re.findall(r"path\s*\(\s*['\"]([^'\"]+)['\"]", content)
+        # 簡化的Django URL提取（不含path()調用的文件跳過正則掃描）
+        if "path" not in content:
+            return routes
+        url_patterns = _DJANGO_PATH_PATTERN.findall(content)
         
         for i, pattern in enumerate(url_patterns):
             routes.append({
@@ -396,19 +445,10 @@ class CodeParsingEngine:
         
         return routes
     
-    def _calculate_complexity(self, tree: ast.AST) -> int:
+    def _calculate_complexity(self, nodes: Dict[str, List[ast.AST]]) -> int:
         """計算循環複雜度"""
-        complexity = 1  # 基礎複雜度
-        
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.If, ast.While, ast.For, ast.AsyncFor)):
-                complexity += 1
-            elif isinstance(node, ast.ExceptHandler):
-                complexity += 1
-            elif isinstance(node, ast.comprehension):
-                complexity += 1
-        
-        return complexity
+        # 基礎複雜度 + 分支、循環、異常處理和推導式
+        return 1 + len(nodes["branches"])
     
     def _calculate_function_complexity(self, func_node: ast.FunctionDef) -> int:
         """計算函數複雜度"""
@@ -435,82 +475,369 @@ class CodeParsingEngine:
     
     def _get_literal_value(self, node: ast.AST) -> Any:
         """獲取字面值"""
-        if isinstance(node, ast.Str):
-            return node.s
-        elif isinstance(node, ast.Num):
-            return node.n
-        elif isinstance(node, ast.Constant):
+        if isinstance(node, ast.Constant):
             return node.value
         elif isinstance(node, ast.List):
             return [self._get_literal_value(elt) for elt in node.elts]
         else:
             return None
+
+
+class FileSummaryCache:
+    """持久化的文件摘要緩存（SQLite）
     
-    def _is_method(self, func_node: ast.FunctionDef, tree: ast.AST) -> bool:
-        """檢查是否為類方法"""
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                if func_node in node.body:
-                    return True
-        return False
+    以 項目 + 相對路徑 為鍵保存文件大小、mtime、內容哈希和摘要。大小和
+    mtime都未變時直接使用緩存；任一變化時比較內容哈希，只有內容真正變化
+    的文件才需要重新解析。每個項目的條目首次使用時載入內存，之後只寫入
+    變化的行。
+    """
+    
+    VERSION = 2  # 摘要格式版本，變化時清空緩存
+    
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.connection: Optional[sqlite3.Connection] = None
+        self.projects: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(str(self.db_path))
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS file_summaries (
+                    project TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    PRIMARY KEY (project, path)
+                );
+            """)
+            
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != str(self.VERSION):
+                with self.connection:
+                    self.connection.execute("DELETE FROM file_summaries")
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(self.VERSION),)
+                    )
+        return self.connection
+    
+    def entries(self, project: str) -> Dict[str, Dict[str, Any]]:
+        """項目的緩存條目：相對路徑 -> {size, mtime_ns, content_hash, summary}"""
+        entries = self.projects.get(project)
+        if entries is None:
+            entries = {}
+            try:
+                rows = self._connect().execute(
+                    "SELECT path, size, mtime_ns, content_hash, summary FROM file_summaries WHERE project = ?",
+                    (project,)
+                ).fetchall()
+                for path, size, mtime_ns, content_hash, summary in rows:
+                    entries[path] = {
+                        "size": size,
+                        "mtime_ns": mtime_ns,
+                        "content_hash": content_hash,
+                        "summary": json.loads(summary)
+                    }
+            except (sqlite3.Error, ValueError) as e:
+                self.logger.warning(f"載入文件摘要緩存失敗: {e}")
+            self.projects[project] = entries
+        return entries
+    
+    def update(self, project: str, updated: Dict[str, Dict[str, Any]], removed: List[str]):
+        """寫入變化的條目並刪除已不存在的文件"""
+        entries = self.entries(project)
+        entries.update(updated)
+        for path in removed:
+            entries.pop(path, None)
+        
+        if not updated and not removed:
+            return
+        
+        try:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO file_summaries "
+                    "(project, path, size, mtime_ns, content_hash, summary) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (project, path, entry["size"], entry["mtime_ns"], entry["content_hash"],
+                         json.dumps(entry["summary"], ensure_ascii=False, default=str))
+                        for path, entry in updated.items()
+                    ]
+                )
+                connection.executemany(
+                    "DELETE FROM file_summaries WHERE project = ? AND path = ?",
+                    [(project, path) for path in removed]
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"寫入文件摘要緩存失敗: {e}")
+    
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
 
 
 class DependencyAnalyzer:
-    """依賴關係分析器"""
+    """依賴關係分析器
+    
+    依賴圖的節點是項目文件：導入的模塊解析為定義它的文件，邊為 導入方 ->
+    被導入文件。循環依賴基於強連通分量（Tarjan）檢測，邊在循環上當且僅當
+    兩端屬於同一個分量；每個分量只提取有限個代表性循環用於報告。
+    """
     
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.dependency_graph = nx.DiGraph()
+        self.max_cycles_per_component = 5  # 每個循環依賴組報告的代表性循環數
+        self.cycles: List[List[str]] = []
+        
+        # 上一次分析的狀態，用於增量更新依賴邊
+        self.project_path: Optional[str] = None
+        self.module_index: Dict[str, str] = {}
+        # 文件 -> [(依賴關係, 被導入的項目文件)]
+        self.file_dependencies: Dict[str, List[Tuple[DependencyRelation, Optional[str]]]] = {}
     
-    async def analyze_dependencies(self, project_path: Path) -> List[DependencyRelation]:
-        """分析項目依賴關係"""
-        dependencies = []
+    async def analyze_dependencies(self, project_path: Path,
+                                   file_summaries: Optional[Dict[str, Dict[str, Any]]] = None,
+                                   changed_files: Optional[Set[str]] = None) -> List[DependencyRelation]:
+        """分析項目依賴關係
+        
+        file_summaries: 相對路徑 -> 文件摘要（由共享解析階段提供）；
+        未提供時自行解析項目中的Python文件。
+        changed_files: 自上次分析同一項目以來新增、修改或刪除的文件；提供時
+        只重新計算這些文件的依賴邊，以及導入了新增/刪除模塊的文件的依賴邊。
+        """
+        if file_summaries is None:
+            parser = CodeParsingEngine()
+            file_summaries = {
+                str(file_path.relative_to(project_path)): parser.summarize_file(file_path)
+                for file_path in find_python_files(project_path)
+            }
         
-        # 收集所有Python文件
-        python_files = list(project_path.glob("**/*.py"))
+        # 項目內模塊索引，代替逐個導入檢查文件系統
+        module_index = self._build_module_index(file_summaries)
+        internal_modules = {}
+        resolved_modules = {}
         
-        # 解析每個文件的導入關係
-        parser = CodeParsingEngine()
-        file_imports = {}
+        if changed_files is not None and self.project_path == str(project_path):
+            stale = set(changed_files) | (set(self.file_dependencies) - set(file_summaries))
+            
+            # 新增、刪除或改變了文件的模塊會影響其他文件導入的解析
+            affected_modules = {
+                module for module, _ in module_index.items() ^ self.module_index.items()
+            }
+            if affected_modules:
+                stale.update(
+                    file_path for file_path, summary in file_summaries.items()
+                    if self._imports_any(file_path, summary, affected_modules)
+                )
+            
+            for file_path in stale:
+                self.file_dependencies.pop(file_path, None)
+                if self.dependency_graph.has_node(file_path):
+                    self.dependency_graph.remove_edges_from(list(self.dependency_graph.out_edges(file_path)))
+        else:
+            stale = set(file_summaries)
+            self.file_dependencies = {}
+            self.dependency_graph = nx.DiGraph()
         
-        for file_path in python_files:
-            relative_path = file_path.relative_to(project_path)
-            parsed_data = await parser.parse_python_file(file_path)
-            file_imports[str(relative_path)] = parsed_data.get("imports", [])
+        self.project_path = str(project_path)
+        self.module_index = module_index
         
         # 構建依賴關係
-        for file_path, imports in file_imports.items():
-            for import_info in imports:
-                target_module = import_info.get("module", "")
+        for file_path, summary in file_summaries.items():
+            if file_path not in stale:
+                continue
+            
+            file_dependencies = self.file_dependencies[file_path] = []
+            for import_info in summary.get("imports", []):
+                target_module = self._absolute_module(file_path, import_info)
+                if target_module is None:
+                    continue
                 
-                # 檢查是否為內部模塊
-                if self._is_internal_module(target_module, project_path):
+                # 檢查是否為內部模塊（相對導入一定是項目內部的）
+                if import_info.get("level"):
+                    is_internal = True
+                else:
+                    is_internal = internal_modules.get(target_module)
+                    if is_internal is None:
+                        is_internal = internal_modules[target_module] = self._is_internal_module(
+                            target_module, project_path, module_index
+                        )
+                
+                if is_internal:
                     dependency = DependencyRelation(
                         source=file_path,
                         target=target_module,
                         type="import",
                         strength=self._calculate_dependency_strength(import_info)
                     )
-                    dependencies.append(dependency)
                     
-                    # 添加到圖中
-                    self.dependency_graph.add_edge(file_path, target_module)
+                    # 解析被導入的項目文件（from a import b 優先解析為子模塊 a.b）
+                    candidates = [target_module] if target_module else []
+                    if import_info.get("type") == "from_import" and import_info.get("name") != "*":
+                        candidates.insert(0, ".".join(filter(None, [target_module, import_info.get("name")])))
+                    target_file = None
+                    for candidate in candidates:
+                        if candidate not in resolved_modules:
+                            resolved_modules[candidate] = self._resolve_module(candidate, module_index)
+                        target_file = resolved_modules[candidate]
+                        if target_file is not None:
+                            break
+                    
+                    file_dependencies.append((dependency, target_file))
+                    
+                    # 添加到圖中（忽略導入自身）
+                    if target_file is not None and target_file != file_path:
+                        self.dependency_graph.add_edge(file_path, target_file)
+        
+        # 移除已沒有依賴邊的節點
+        self.dependency_graph.remove_nodes_from([
+            node for node, degree in self.dependency_graph.degree() if degree == 0
+        ])
+        
+        # 返回副本，循環標記只作用於本次結果；邊 -> 依賴關係索引用於標記
+        dependencies = []
+        edge_index: Dict[Tuple[str, str], List[DependencyRelation]] = defaultdict(list)
+        for file_path in file_summaries:
+            for dependency, target_file in self.file_dependencies.get(file_path, []):
+                dependency = replace(dependency)
+                dependencies.append(dependency)
+                if target_file is not None and target_file != file_path:
+                    edge_index[(file_path, target_file)].append(dependency)
         
         # 檢查循環依賴
-        cycles = list(nx.simple_cycles(self.dependency_graph))
-        for cycle in cycles:
-            for i in range(len(cycle)):
-                source = cycle[i]
-                target = cycle[(i + 1) % len(cycle)]
-                
-                # 標記循環依賴
-                for dep in dependencies:
-                    if dep.source == source and dep.target == target:
-                        dep.is_circular = True
+        components = self.find_circular_components()
+        component_of = {node: index for index, component in enumerate(components) for node in component}
+        for (source, target), relations in edge_index.items():
+            index = component_of.get(source)
+            if index is not None and component_of.get(target) == index:
+                for dependency in relations:
+                    dependency.is_circular = True
+        
+        self.cycles = [
+            cycle
+            for component in components
+            for cycle in self._representative_cycles(component, self.max_cycles_per_component)
+        ]
+        if components:
+            self.logger.warning(f"發現 {len(components)} 組循環依賴，涉及 {len(component_of)} 個文件")
         
         return dependencies
     
-    def _is_internal_module(self, module_name: str, project_path: Path) -> bool:
+    def find_circular_components(self) -> List[Set[str]]:
+        """循環依賴組：包含兩個及以上文件的強連通分量（按大小降序）"""
+        components = [
+            component for component in nx.strongly_connected_components(self.dependency_graph)
+            if len(component) > 1
+        ]
+        components.sort(key=lambda component: (-len(component), min(component)))
+        return components
+    
+    def _representative_cycles(self, component: Set[str], limit: int) -> List[List[str]]:
+        """從強連通分量中提取至多 limit 個代表性循環
+        
+        依次以尚未被已有循環覆蓋的文件為起點，在分量內BFS找出經過它的最短
+        循環，每個循環的代價為 O(V + E)。
+        """
+        cycles = []
+        covered = set()
+        
+        for start in sorted(component):
+            if len(cycles) >= limit:
+                break
+            if start in covered:
+                continue
+            
+            cycle = self._shortest_cycle(start, component)
+            if cycle:
+                cycles.append(cycle)
+                covered.update(cycle)
+        
+        return cycles
+    
+    def _shortest_cycle(self, start: str, component: Set[str]) -> Optional[List[str]]:
+        """分量內經過 start 的最短循環"""
+        parents = {start: None}
+        queue = deque([start])
+        
+        while queue:
+            node = queue.popleft()
+            for successor in self.dependency_graph.successors(node):
+                if successor == start:
+                    cycle = [node]
+                    while parents[cycle[-1]] is not None:
+                        cycle.append(parents[cycle[-1]])
+                    cycle.reverse()
+                    return cycle
+                if successor in component and successor not in parents:
+                    parents[successor] = node
+                    queue.append(successor)
+        
+        return None
+    
+    def _absolute_module(self, file_path: str, import_info: Dict[str, Any]) -> Optional[str]:
+        """導入的絕對模塊名；相對導入（from .b import f）按導入文件所在的包解析，
+        超出項目頂層時返回None"""
+        module_name = import_info.get("module") or ""
+        level = import_info.get("level") or 0
+        if not level:
+            return module_name
+        
+        # a/b.py 和 a/__init__.py 所在的包都是 a；每多一個點向上一層
+        package = list(Path(file_path).with_suffix("").parts[:-1])
+        if level - 1 > len(package):
+            return None
+        package = package[:len(package) - (level - 1)]
+        return ".".join(package + ([module_name] if module_name else []))
+    
+    def _imports_any(self, file_path: str, summary: Dict[str, Any], modules: Set[str]) -> bool:
+        """文件是否導入了 modules 中的模塊（或其子模塊）"""
+        for import_info in summary.get("imports", []):
+            module_name = self._absolute_module(file_path, import_info)
+            if module_name is None:
+                continue
+            if import_info.get("type") == "from_import":
+                module_name = ".".join(filter(None, [module_name, import_info.get("name")]))
+            module_parts = module_name.split('.')
+            if any(".".join(module_parts[:i]) in modules for i in range(1, len(module_parts) + 1)):
+                return True
+        return False
+    
+    def _build_module_index(self, file_summaries: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """由項目文件的相對路徑構建 模塊名 -> 文件 索引（a/b.py -> a.b，a/__init__.py -> a）"""
+        modules = {}
+        for relative_path in file_summaries:
+            parts = list(Path(relative_path).with_suffix("").parts)
+            is_package = bool(parts) and parts[-1] == "__init__"
+            if is_package:
+                parts.pop()
+            if parts:
+                # 包和同名模塊並存時，與Python一樣優先使用包
+                if is_package:
+                    modules[".".join(parts)] = relative_path
+                else:
+                    modules.setdefault(".".join(parts), relative_path)
+        return modules
+    
+    def _resolve_module(self, module_name: str, module_index: Dict[str, str]) -> Optional[str]:
+        """將模塊名解析為定義它的項目文件（最長匹配前綴，a.b.Class -> a/b.py）"""
+        module_parts = module_name.split('.')
+        for i in range(len(module_parts), 0, -1):
+            target_file = module_index.get(".".join(module_parts[:i]))
+            if target_file is not None:
+                return target_file
+        return None
+    
+    def _is_internal_module(self, module_name: str, project_path: Path,
+                            module_index: Optional[Dict[str, str]] = None) -> bool:
         """檢查是否為內部模塊"""
         if not module_name:
             return False
@@ -521,6 +848,13 @@ class DependencyAnalyzer:
         
         # 檢查模塊文件是否存在於項目中
         module_parts = module_name.split('.')
+        
+        if module_index is not None:
+            return any(
+                ".".join(module_parts[:i]) in module_index
+                for i in range(1, len(module_parts) + 1)
+            )
+        
         potential_path = project_path
         
         for part in module_parts:
@@ -543,12 +877,15 @@ class DependencyAnalyzer:
         if not self.dependency_graph.nodes():
             return {}
         
+        components = list(nx.strongly_connected_components(self.dependency_graph))
+        
         return {
             "total_nodes": self.dependency_graph.number_of_nodes(),
             "total_edges": self.dependency_graph.number_of_edges(),
             "density": nx.density(self.dependency_graph),
-            "cycles": len(list(nx.simple_cycles(self.dependency_graph))),
-            "strongly_connected_components": len(list(nx.strongly_connected_components(self.dependency_graph))),
+            "cycles": len(self.cycles),  # 代表性循環數（每組至多 max_cycles_per_component 個）
+            "circular_components": sum(1 for component in components if len(component) > 1),
+            "strongly_connected_components": len(components),
             "average_degree": sum(dict(self.dependency_graph.degree()).values()) / self.dependency_graph.number_of_nodes()
         }
 
@@ -658,12 +995,24 @@ class ArchitectureDetector:
 class ProjectAnalyzerMCP:
     """項目分析器MCP主管理器"""
     
-    def __init__(self):
+    def __init__(self, cache_path: str = None):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.code_parser = CodeParsingEngine()
         self.dependency_analyzer = DependencyAnalyzer()
         self.architecture_detector = ArchitectureDetector()
-        self.analysis_cache = {}
+        
+        # 解析後的項目路徑 -> (指紋, 分析結果)；文件和項目配置都未變化時直接返回
+        self.analysis_cache: Dict[str, Tuple[Any, ProjectArchitecture]] = {}
+        
+        # 持久化的文件摘要緩存，只重新解析內容變化的文件
+        self.summary_cache = FileSummaryCache(
+            Path(cache_path) if cache_path else
+            Path.home() / ".powerautomation" / "project_analysis_cache.db"
+        )
+        
+        # 解析並行度：文件數達到閾值時分發到進程池
+        self.max_workers = os.cpu_count() or 1
+        self.parallel_threshold = 32
     
     async def initialize(self):
         """初始化項目分析器MCP"""
@@ -678,41 +1027,64 @@ class ProjectAnalyzerMCP:
         """完整項目分析"""
         self.logger.info(f"🔍 開始分析項目: {project_path}")
         
-        project_path = Path(project_path)
+        # 同一項目的不同路徑寫法共用緩存和增量依賴狀態
+        project_path = Path(project_path).resolve()
+        
+        # 解析內容變化的Python文件（進程池中運行時，同時完成項目類型檢測、
+        # 入口點、配置文件、數據庫模式和外部服務的文件系統掃描）
+        (
+            (file_summaries, file_states),
+            project_type,
+            entry_points,
+            config_files,
+            db_schemas,
+            external_services
+        ) = await asyncio.gather(
+            self._parse_project(project_path),
+            self._detect_project_type(project_path),
+            self._find_entry_points(project_path),
+            self._find_configuration_files(project_path),
+            self._analyze_database_schemas(project_path),
+            self._identify_external_services(project_path)
+        )
         
-        # 檢查緩存
-        cache_key = f"{project_path}_{os.path.getmtime(project_path)}"
-        if cache_key in self.analysis_cache:
+        # 檢查緩存：每個文件的 (大小, mtime_ns, 內容哈希) 和項目配置都與上次
+        # 成功分析時相同才直接返回上次的結果
+        cache_key = str(project_path)
+        fingerprint = (
+            file_states, project_type,
+            tuple(entry_points), tuple(config_files), tuple(db_schemas), tuple(sorted(external_services))
+        )
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None and cached[0] == fingerprint:
             self.logger.info("使用緩存的分析結果")
-            return self.analysis_cache[cache_key]
-        
-        # 檢測項目類型
-        project_type = await self._detect_project_type(project_path)
+            return cached[1]
+        
+        # 變化的文件相對於上次成功分析計算，中途失敗的分析不會丟失變化
+        if cached is not None:
+            previous_states = cached[0][0]
+            changed_files = {
+                relative_path for relative_path in file_states.keys() | previous_states.keys()
+                if file_states.get(relative_path) != previous_states.get(relative_path)
+            }
+            self.logger.info(f"重新分析 {len(changed_files)} 個變化的文件（共 {len(file_summaries)} 個）")
+        else:
+            changed_files = None
         
         # 分析組件
-        components = await self._analyze_components(project_path)
+        components = await self._analyze_components(project_path, file_summaries)
         
         # 分析API端點
-        api_endpoints = await self._analyze_api_endpoints(project_path)
+        api_endpoints = await self._analyze_api_endpoints(project_path, file_summaries)
         
         # 分析依賴關係
-        dependencies = await self.dependency_analyzer.analyze_dependencies(project_path)
+        dependencies = await self.dependency_analyzer.analyze_dependencies(
+            project_path, file_summaries, changed_files
+        )
         
         # 檢測架構模式
         architecture_pattern = await self.architecture_detector.detect_architecture_pattern(project_path, components)
         
-        # 找出入口點
-        entry_points = await self._find_entry_points(project_path)
-        
-        # 找出配置文件
-        config_files = await self._find_configuration_files(project_path)
-        
-        # 分析數據庫模式
-        db_schemas = await self._analyze_database_schemas(project_path)
-        
-        # 識別外部服務
-        external_services = await self._identify_external_services(project_path)
-        
         # 計算項目指標
         project_metrics = await self._calculate_project_metrics(project_path, components)
         
@@ -735,7 +1107,7 @@ class ProjectAnalyzerMCP:
         )
         
         # 緩存結果
-        self.analysis_cache[cache_key] = architecture
+        self.analysis_cache[cache_key] = (fingerprint, architecture)
         
         # 保存分析報告
         await self._save_analysis_report(architecture, project_path)
@@ -774,20 +1146,97 @@ class ProjectAnalyzerMCP:
         
         return ProjectType.UNKNOWN
     
-    async def _analyze_components(self, project_path: Path) -> List[ProjectComponent]:
-        """分析項目組件"""
-        components = []
-        
-        # 遍歷所有Python文件
-        for py_file in project_path.glob("**/*.py"):
-            if py_file.name.startswith('.') or '__pycache__' in str(py_file):
+    async def _parse_project(self, project_path: Path) -> Tuple[Dict[str, Dict[str, Any]],
+                                                                Dict[str, Tuple[int, int, str]]]:
+        """共享解析階段
+        
+        返回 (相對路徑 -> 文件摘要, 相對路徑 -> (大小, mtime_ns, 內容哈希))。大小和mtime與緩存一致的文件
+        直接使用緩存的摘要；不一致時比較內容哈希，只有內容變化的文件才重新
+        讀取並解析（每個文件一次）。
+        """
+        project_key = str(project_path.resolve())
+        cached = self.summary_cache.entries(project_key)
+        
+        summaries: Dict[str, Dict[str, Any]] = {}
+        file_states: Dict[str, Tuple[int, int, str]] = {}
+        updated: Dict[str, Dict[str, Any]] = {}
+        to_parse = []
+        
+        for file_path in find_python_files(project_path):
+            relative_path = str(file_path.relative_to(project_path))
+            try:
+                stat = file_path.stat()
+                entry = cached.get(relative_path)
+                if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                    summaries[relative_path] = entry["summary"]
+                    file_states[relative_path] = (entry["size"], entry["mtime_ns"], entry["content_hash"])
+                    continue
+                
+                content_hash = _hash_file(file_path)
+            except OSError as e:
+                self.logger.warning(f"讀取文件失敗 {file_path}: {e}")
+                continue
+            
+            file_states[relative_path] = (stat.st_size, stat.st_mtime_ns, content_hash)
+            if entry is not None and entry["content_hash"] == content_hash:
+                # 只是mtime變化（例如 touch 或切換分支後內容相同）
+                summaries[relative_path] = entry["summary"]
+                updated[relative_path] = {**entry, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
                 continue
             
-            parsed_data = await self.code_parser.parse_python_file(py_file)
+            summaries[relative_path] = {}  # 佔位，保持文件順序
+            to_parse.append((relative_path, file_path, stat, content_hash))
+        
+        parsed = await self._summarize_files([file_path for _, file_path, _, _ in to_parse])
+        for (relative_path, _, stat, content_hash), summary in zip(to_parse, parsed):
+            summaries[relative_path] = summary
+            updated[relative_path] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "content_hash": content_hash,
+                "summary": summary
+            }
+        
+        removed = [path for path in cached if path not in summaries]
+        self.summary_cache.update(project_key, updated, removed)
+        
+        return summaries, file_states
+    
+    async def _summarize_files(self, files: List[Path]) -> List[Dict[str, Any]]:
+        """生成文件摘要；文件較多時按塊分發到進程池"""
+        workers = min(self.max_workers, len(files))
+        if workers > 1 and len(files) >= self.parallel_threshold:
+            chunk_size = max(1, min(64, len(files) // (workers * 4)))
+            chunks = [
+                [str(file_path) for file_path in files[i:i + chunk_size]]
+                for i in range(0, len(files), chunk_size)
+            ]
             
+            try:
+                loop = asyncio.get_running_loop()
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    chunk_results = await asyncio.gather(*[
+                        loop.run_in_executor(executor, _summarize_files_worker, chunk)
+                        for chunk in chunks
+                    ])
+                return [summary for chunk_result in chunk_results for summary in chunk_result]
+            except (BrokenProcessPool, OSError) as e:
+                self.logger.warning(f"進程池解析失敗，改為串行解析: {e}")
+        
+        return [self.code_parser.summarize_file(file_path) for file_path in files]
+    
+    async def _analyze_components(self, project_path: Path,
+                                  file_summaries: Dict[str, Dict[str, Any]]) -> List[ProjectComponent]:
+        """分析項目組件"""
+        components = []
+        
+        # 遍歷所有Python文件的摘要
+        for relative_path, parsed_data in file_summaries.items():
             if not parsed_data:
                 continue
             
+            py_file = project_path / relative_path
+            
             # 確定組件類型
             component_type = self._determine_component_type(py_file, parsed_data)
             
@@ -966,13 +1415,13 @@ class ProjectAnalyzerMCP:
         for component in components:
             component.dependents = dependency_map.get(component.id, [])
     
-    async def _analyze_api_endpoints(self, project_path: Path) -> List[APIEndpoint]:
+    async def _analyze_api_endpoints(self, project_path: Path,
+                                     file_summaries: Dict[str, Dict[str, Any]]) -> List[APIEndpoint]:
         """分析API端點"""
         endpoints = []
         
-        for py_file in project_path.glob("**/*.py"):
-            parsed_data = await self.code_parser.parse_python_file(py_file)
-            
+        for relative_path, parsed_data in file_summaries.items():
+            py_file = project_path / relative_path
             file_endpoints = parsed_data.get("api_endpoints", [])
             
             for endpoint_data in file_endpoints:
@@ -1139,6 +1588,7 @@ class ProjectAnalyzerMCP:
             "version": "4.6.1", 
             "status": "running",
             "cached_analyses": len(self.analysis_cache),
+            "summary_cache": str(self.summary_cache.db_path),
             "capabilities": [
                 "project_type_detection",
                 "architecture_pattern_recognition",
@@ -1158,5 +1608,32 @@ class ProjectAnalyzerMCP:
         }
 
 
+def find_python_files(project_path: Path) -> List[Path]:
+    """按路徑排序列出項目中的Python文件（跳過隱藏文件和 __pycache__）"""
+    files = []
+    for root, dirs, names in os.walk(project_path):
+        dirs[:] = [name for name in dirs if name != "__pycache__"]
+        for name in names:
+            if name.endswith(".py") and not name.startswith("."):
+                files.append(Path(root) / name)
+    files.sort()
+    return files
+
+
+def _hash_file(file_path: Path) -> str:
+    """文件內容的SHA-1哈希"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _summarize_files_worker(paths: List[str]) -> List[Dict[str, Any]]:
+    """進程池工作函數：解析一塊文件並返回摘要"""
+    parser = CodeParsingEngine()
+    return [parser.summarize_file(Path(path)) for path in paths]
+
+
 # 單例實例
-project_analyzer_mcp = ProjectAnalyzerMCP()
\ No newline at end of file
+project_analyzer_mcp = ProjectAnalyzerMCP()
@@ -9,16 +9,17 @@ import json
 import logging
 import time
 import uuid
-from typing import Dict, List, Any, Optional, Callable
+import zlib
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 from pathlib import Path
-import sqlite3
 from datetime import datetime, timedelta
 import numpy as np
 from collections import defaultdict, deque
-import threading
-import queue
+
+from .components.memoryos_mcp.storage import SQLiteStore, open_store
+from .monitoring.timeseries import TimeSeriesStore
 
 logger = logging.getLogger(__name__)
 
@@ -82,16 +83,67 @@ class CollectionRule:
     enabled: bool = True
     created_at: float = 0.0
 
+# 規則條件: 條件名 -> (數據字段, 缺省值, 比較方式)
+# "min": 值低於閾值時不收集  "max": 值高於閾值時不收集  "in": 值不在列表中時不收集
+_RULE_CONDITIONS = {
+    "min_response_time": ("response_time", 0, "min"),
+    "max_response_time": ("response_time", float('inf'), "max"),
+    "min_satisfaction": ("user_satisfaction", 0, "min"),
+    "severity": ("severity", "", "in"),
+    "cpu_threshold": ("cpu_usage", 0, "min"),
+    "memory_threshold": ("memory_usage", 0, "min"),
+    "success_rate_threshold": ("success_rate", 0, "min")
+}
+
+_HASH_RANGE = 1 << 32
+
+def compile_rule_conditions(conditions: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+    """將規則條件編譯為謂詞閉包（未知條件忽略，評估出錯時默認收集）"""
+    checks = []
+    for name, threshold in conditions.items():
+        spec = _RULE_CONDITIONS.get(name)
+        if spec is None:
+            continue
+        field_name, default, mode = spec
+        
+        if mode == "min":
+            checks.append(lambda data, f=field_name, d=default, t=threshold: data.get(f, d) >= t)
+        elif mode == "max":
+            checks.append(lambda data, f=field_name, d=default, t=threshold: data.get(f, d) <= t)
+        else:
+            checks.append(lambda data, f=field_name, d=default, t=threshold: data.get(f, d) in t)
+    
+    def predicate(data: Dict[str, Any]) -> bool:
+        try:
+            for check in checks:
+                if not check(data):
+                    return False
+            return True
+        except Exception as e:
+            logger.warning(f"檢查規則條件失敗: {e}")
+            return True  # 默認收集
+    
+    return predicate
+
 class DataCollectionSystem:
     """數據收集系統"""
     
     def __init__(self, db_path: str = "data_collection.db"):
         self.db_path = Path(db_path)
-        self.connection = None
+        self.store: Optional[SQLiteStore] = None
         
-        # 數據收集
-        self.data_queue = queue.Queue(maxsize=10000)
+        # 數據收集：每個優先級一條有界asyncio隊列，處理時按優先級順序取出
+        self.max_queue_size = 10000
+        self.batch_size = 200
+        self.flush_interval = 1.0
+        self.enqueue_timeout = 0.5  # CRITICAL/HIGH 隊列滿時的最長背壓等待
+        self.data_lanes: Dict[DataPriority, asyncio.Queue] = {
+            priority: asyncio.Queue(maxsize=self.max_queue_size) for priority in DataPriority
+        }
+        self._data_available = asyncio.Event()
         self.collection_rules: Dict[str, CollectionRule] = {}
+        # 按數據類型索引的已編譯規則: (規則, 採樣閾值, 哈希鹽, 條件謂詞)
+        self.compiled_rules: Dict[DataType, List[Tuple[CollectionRule, int, int, Callable]]] = {}
         self.data_processors: Dict[DataType, List[Callable]] = defaultdict(list)
         
         # 反饋循環
@@ -99,7 +151,11 @@ class DataCollectionSystem:
         self.feedback_results = deque(maxlen=1000)
         
         # 實時監控
-        self.real_time_metrics = defaultdict(deque)
+        # 實時指標：每個指標一個環形緩衝區，事件型指標（data_rate/error_rate）按時間戳計數
+        self.real_time_metrics = TimeSeriesStore(
+            capacity=100,
+            capacities={"data_rate": 10000, "error_rate": 10000}
+        )
         self.metric_thresholds = {}
         self.alert_callbacks = []
         
@@ -110,7 +166,11 @@ class DataCollectionSystem:
             "data_by_priority": defaultdict(int),
             "processing_errors": 0,
             "feedback_executions": 0,
-            "alerts_triggered": 0
+            "alerts_triggered": 0,
+            "dropped_data_points": 0,
+            "dropped_by_priority": defaultdict(int),
+            "backpressure_waits": 0,
+            "batches_flushed": 0
         }
         
         # 任務管理
@@ -145,7 +205,7 @@ class DataCollectionSystem:
     
     async def _create_database(self):
         """創建數據庫"""
-        self.connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.store = await open_store(str(self.db_path))
         
         create_sql = """
         CREATE TABLE IF NOT EXISTS data_points (
@@ -187,16 +247,14 @@ class DataCollectionSystem:
         CREATE INDEX IF NOT EXISTS idx_processed ON data_points(processed);
         """
         
-        self.connection.executescript(create_sql)
-        self.connection.commit()
+        await self.store.executescript(create_sql)
     
     async def _load_collection_rules(self):
         """載入收集規則"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT * FROM collection_rules WHERE enabled = 1")
+            rows = await self.store.fetchall("SELECT * FROM collection_rules WHERE enabled = 1")
             
-            for row in cursor.fetchall():
+            for row in rows:
                 rule = CollectionRule(
                     id=row[0],
                     name=row[1],
@@ -212,6 +270,8 @@ class DataCollectionSystem:
             if not self.collection_rules:
                 await self._create_default_rules()
             
+            self._rebuild_rule_index()
+            
             logger.info(f"📋 載入 {len(self.collection_rules)} 個收集規則")
             
         except Exception as e:
@@ -268,26 +328,24 @@ class DataCollectionSystem:
             )
         ]
         
-        cursor = self.connection.cursor()
+        await self.store.executemany("""
+            INSERT OR REPLACE INTO collection_rules
+            (id, name, data_type, conditions, sampling_rate, enabled, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(
+            rule.id,
+            rule.name,
+            rule.data_type.value,
+            json.dumps(rule.conditions),
+            rule.sampling_rate,
+            rule.enabled,
+            rule.created_at
+        ) for rule in default_rules])
         
         for rule in default_rules:
-            cursor.execute("""
-                INSERT OR REPLACE INTO collection_rules
-                (id, name, data_type, conditions, sampling_rate, enabled, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                rule.id,
-                rule.name,
-                rule.data_type.value,
-                json.dumps(rule.conditions),
-                rule.sampling_rate,
-                rule.enabled,
-                rule.created_at
-            ))
-            
             self.collection_rules[rule.id] = rule
         
-        self.connection.commit()
+        self._rebuild_rule_index()
         logger.info(f"✅ 創建 {len(default_rules)} 個默認收集規則")
     
     async def _setup_default_feedback_loops(self):
@@ -362,13 +420,15 @@ class DataCollectionSystem:
                          metadata: Dict[str, Any] = None):
         """收集數據"""
         try:
+            data_id = str(uuid.uuid4())
+            
             # 檢查收集規則
-            if not self._should_collect_data(data_type, data):
+            if not self._should_collect_data(data_type, data, data_id):
                 return
             
             # 創建數據點
             data_point = DataPoint(
-                id=str(uuid.uuid4()),
+                id=data_id,
                 data_type=data_type,
                 priority=priority,
                 timestamp=time.time(),
@@ -379,146 +439,166 @@ class DataCollectionSystem:
             )
             
             # 添加到隊列
-            if not self.data_queue.full():
-                self.data_queue.put(data_point)
-                
-                # 更新統計
-                self.collection_stats["total_data_points"] += 1
-                self.collection_stats["data_by_type"][data_type.value] += 1
-                self.collection_stats["data_by_priority"][priority.value] += 1
-                
-                # 更新實時指標
-                self._update_real_time_metrics(data_type, data)
-                
-                logger.debug(f"📊 收集數據: {data_type.value} from {source}")
-            else:
-                logger.warning("⚠️ 數據隊列已滿，丟棄數據點")
+            if not await self._enqueue_data_point(data_point):
+                self.collection_stats["dropped_data_points"] += 1
+                self.collection_stats["dropped_by_priority"][priority.value] += 1
+                logger.warning(f"⚠️ 數據隊列已滿，丟棄數據點 ({priority.value})")
+                return
+            
+            # 更新統計
+            self.collection_stats["total_data_points"] += 1
+            self.collection_stats["data_by_type"][data_type.value] += 1
+            self.collection_stats["data_by_priority"][priority.value] += 1
+            
+            # 更新實時指標
+            self._update_real_time_metrics(data_type, data)
+            
+            logger.debug(f"📊 收集數據: {data_type.value} from {source}")
                 
         except Exception as e:
             logger.error(f"❌ 收集數據失敗: {e}")
     
-    def _should_collect_data(self, data_type: DataType, data: Dict[str, Any]) -> bool:
-        """檢查是否應該收集數據"""
+    async def _enqueue_data_point(self, data_point: DataPoint) -> bool:
+        """放入對應優先級的隊列；CRITICAL/HIGH 在隊列滿時短暫等待（背壓），其餘直接丟棄"""
+        lane = self.data_lanes[data_point.priority]
+        
+        try:
+            lane.put_nowait(data_point)
+        except asyncio.QueueFull:
+            if data_point.priority not in (DataPriority.CRITICAL, DataPriority.HIGH):
+                return False
+            
+            self.collection_stats["backpressure_waits"] += 1
+            self._data_available.set()
+            try:
+                await asyncio.wait_for(lane.put(data_point), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                return False
+        
+        if self._queued_count() >= self.batch_size:
+            self._data_available.set()
+        return True
+    
+    def _queued_count(self) -> int:
+        return sum(lane.qsize() for lane in self.data_lanes.values())
+    
+    def _drain_lanes(self, limit: int) -> List[DataPoint]:
+        """按優先級順序從隊列中取出最多limit個數據點"""
+        batch = []
+        for priority in DataPriority:
+            lane = self.data_lanes[priority]
+            while len(batch) < limit and not lane.empty():
+                batch.append(lane.get_nowait())
+        return batch
+    
+    def _rebuild_rule_index(self):
+        """按數據類型索引並編譯啟用的收集規則（規則載入或變更時調用）"""
+        compiled: Dict[DataType, List[Tuple[CollectionRule, int, int, Callable]]] = defaultdict(list)
         for rule in self.collection_rules.values():
-            if rule.data_type == data_type and rule.enabled:
-                # 檢查採樣率
-                if np.random.random() > rule.sampling_rate:
-                    return False
-                
-                # 檢查條件
-                if self._check_rule_conditions(rule, data):
-                    return True
+            if not rule.enabled:
+                continue
+            compiled[rule.data_type].append((
+                rule,
+                int(min(1.0, max(0.0, rule.sampling_rate)) * _HASH_RANGE),
+                zlib.crc32(rule.id.encode("utf-8")),
+                compile_rule_conditions(rule.conditions)
+            ))
+        self.compiled_rules = dict(compiled)
+    
+    async def update_collection_rule(self, rule: CollectionRule):
+        """新增或更新收集規則並重新編譯"""
+        await self.store.execute("""
+            INSERT OR REPLACE INTO collection_rules
+            (id, name, data_type, conditions, sampling_rate, enabled, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            rule.id,
+            rule.name,
+            rule.data_type.value,
+            json.dumps(rule.conditions),
+            rule.sampling_rate,
+            rule.enabled,
+            rule.created_at
+        ))
+        
+        self.collection_rules[rule.id] = rule
+        self._rebuild_rule_index()
+    
+    def _should_collect_data(self, data_type: DataType, data: Dict[str, Any], data_id: str = "") -> bool:
+        """檢查是否應該收集數據
+        
+        採樣基於數據點ID的哈希（按規則加鹽），同一數據點的決定可重現。
+        """
+        rules = self.compiled_rules.get(data_type)
+        if not rules:
+            return False
+        
+        id_hash = zlib.crc32(data_id.encode("utf-8"))
+        for rule, sample_threshold, salt, predicate in rules:
+            # 檢查採樣率
+            if (id_hash ^ salt) >= sample_threshold:
+                return False
+            
+            # 檢查條件
+            if predicate(data):
+                return True
         
         return False
     
     def _check_rule_conditions(self, rule: CollectionRule, data: Dict[str, Any]) -> bool:
         """檢查規則條件"""
-        try:
-            conditions = rule.conditions
-            
-            # 檢查響應時間條件
-            if "min_response_time" in conditions:
-                response_time = data.get("response_time", 0)
-                if response_time < conditions["min_response_time"]:
-                    return False
-            
-            if "max_response_time" in conditions:
-                response_time = data.get("response_time", float('inf'))
-                if response_time > conditions["max_response_time"]:
-                    return False
-            
-            # 檢查滿意度條件
-            if "min_satisfaction" in conditions:
-                satisfaction = data.get("user_satisfaction", 0)
-                if satisfaction < conditions["min_satisfaction"]:
-                    return False
-            
-            # 檢查嚴重程度條件
-            if "severity" in conditions:
-                severity = data.get("severity", "")
-                if severity not in conditions["severity"]:
-                    return False
-            
-            # 檢查閾值條件
-            if "cpu_threshold" in conditions:
-                cpu_usage = data.get("cpu_usage", 0)
-                if cpu_usage < conditions["cpu_threshold"]:
-                    return False
-            
-            if "memory_threshold" in conditions:
-                memory_usage = data.get("memory_usage", 0)
-                if memory_usage < conditions["memory_threshold"]:
-                    return False
-            
-            # 檢查成功率條件
-            if "success_rate_threshold" in conditions:
-                success_rate = data.get("success_rate", 0)
-                if success_rate < conditions["success_rate_threshold"]:
-                    return False
-            
-            return True
-            
-        except Exception as e:
-            logger.warning(f"檢查規則條件失敗: {e}")
-            return True  # 默認收集
+        return compile_rule_conditions(rule.conditions)(data)
     
     def _update_real_time_metrics(self, data_type: DataType, data: Dict[str, Any]):
         """更新實時指標"""
         try:
             # 更新通用指標
-            self.real_time_metrics["data_rate"].append(time.time())
+            self.real_time_metrics.record("data_rate", 1.0)
             
             # 更新特定類型指標
             if data_type == DataType.SYSTEM_PERFORMANCE:
                 if "cpu_usage" in data:
-                    self.real_time_metrics["cpu_usage"].append(data["cpu_usage"])
+                    self.real_time_metrics.record("cpu_usage", data["cpu_usage"])
                 if "memory_usage" in data:
-                    self.real_time_metrics["memory_usage"].append(data["memory_usage"])
+                    self.real_time_metrics.record("memory_usage", data["memory_usage"])
             
             elif data_type == DataType.CLAUDE_INTERACTION:
                 if "response_time" in data:
-                    self.real_time_metrics["response_time"].append(data["response_time"])
+                    self.real_time_metrics.record("response_time", data["response_time"])
                 if "user_satisfaction" in data:
-                    self.real_time_metrics["user_satisfaction"].append(data["user_satisfaction"])
+                    self.real_time_metrics.record("user_satisfaction", data["user_satisfaction"])
             
             elif data_type == DataType.ERROR_EVENT:
-                self.real_time_metrics["error_rate"].append(time.time())
+                self.real_time_metrics.record("error_rate", 1.0)
             
             elif data_type == DataType.LEARNING_PROGRESS:
                 if "success_rate" in data:
-                    self.real_time_metrics["learning_success_rate"].append(data["success_rate"])
-            
-            # 保持指標隊列大小
-            for metric_name, metric_queue in self.real_time_metrics.items():
-                if len(metric_queue) > 100:
-                    # 移除最舊的數據
-                    for _ in range(len(metric_queue) - 100):
-                        metric_queue.popleft()
+                    self.real_time_metrics.record("learning_success_rate", data["success_rate"])
             
         except Exception as e:
             logger.error(f"❌ 更新實時指標失敗: {e}")
     
     async def _process_data_queue(self):
-        """處理數據隊列"""
+        """處理數據隊列（累積到batch_size或每隔flush_interval批量寫入）"""
         while self.is_running:
             try:
-                # 批量處理數據
-                batch = []
-                batch_size = 50
+                try:
+                    await asyncio.wait_for(self._data_available.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._data_available.clear()
                 
-                for _ in range(batch_size):
-                    try:
-                        data_point = self.data_queue.get(timeout=1.0)
-                        batch.append(data_point)
-                    except queue.Empty:
+                # 批量處理數據
+                while True:
+                    batch = self._drain_lanes(self.batch_size)
+                    if not batch:
                         break
-                
-                if batch:
                     await self._process_data_batch(batch)
+                    if len(batch) < self.batch_size:
+                        break
                 
-                # 短暫休息
-                await asyncio.sleep(0.1)
-                
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"❌ 處理數據隊列失敗: {e}")
                 await asyncio.sleep(1)
@@ -527,25 +607,22 @@ class DataCollectionSystem:
         """處理數據批次"""
         try:
             # 保存到數據庫
-            cursor = self.connection.cursor()
-            
-            for data_point in batch:
-                cursor.execute("""
-                    INSERT INTO data_points
-                    (id, data_type, priority, timestamp, source, data, metadata, processed)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    data_point.id,
-                    data_point.data_type.value,
-                    data_point.priority.value,
-                    data_point.timestamp,
-                    data_point.source,
-                    json.dumps(data_point.data),
-                    json.dumps(data_point.metadata),
-                    data_point.processed
-                ))
-            
-            self.connection.commit()
+            await self.store.executemany("""
+                INSERT INTO data_points
+                (id, data_type, priority, timestamp, source, data, metadata, processed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(
+                data_point.id,
+                data_point.data_type.value,
+                data_point.priority.value,
+                data_point.timestamp,
+                data_point.source,
+                json.dumps(data_point.data),
+                json.dumps(data_point.metadata),
+                data_point.processed
+            ) for data_point in batch])
+            
+            self.collection_stats["batches_flushed"] += 1
             
             # 調用數據處理器
             await self._call_data_processors(batch)
@@ -658,17 +735,14 @@ class DataCollectionSystem:
             input_data = {}
             
             # 從數據庫查詢相關數據
-            cursor = self.connection.cursor()
-            
             for data_type in feedback_loop.input_data_types:
-                cursor.execute("""
+                rows = await self.store.fetchall("""
                     SELECT data FROM data_points
                     WHERE data_type = ? AND timestamp > ?
                     ORDER BY timestamp DESC
                     LIMIT 50
                 """, (data_type.value, time.time() - 3600))  # 最近1小時
                 
-                rows = cursor.fetchall()
                 data_points = []
                 
                 for row in rows:
@@ -696,8 +770,7 @@ class DataCollectionSystem:
         try:
             result_id = str(uuid.uuid4())
             
-            cursor = self.connection.cursor()
-            cursor.execute("""
+            await self.store.execute("""
                 INSERT INTO feedback_results
                 (id, feedback_loop_id, input_data, output_actions, execution_time, success, timestamp, error_message)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
@@ -712,8 +785,6 @@ class DataCollectionSystem:
                 error_message
             ))
             
-            self.connection.commit()
-            
         except Exception as e:
             logger.error(f"❌ 保存反饋結果失敗: {e}")
     
@@ -763,26 +834,17 @@ class DataCollectionSystem:
                                            current_time: float):
         """檢查單個指標閾值"""
         try:
-            metric_queue = self.real_time_metrics[metric_name]
+            series = self.real_time_metrics.get(metric_name)
             
-            if not metric_queue:
+            if series is None or len(series) == 0:
                 return
             
-            # 過濾指定時間內的數據
             if metric_name == "error_rate":
-                # 錯誤率計算
-                recent_errors = [
-                    timestamp for timestamp in metric_queue
-                    if current_time - timestamp <= duration
-                ]
-                current_value = len(recent_errors)
+                # 錯誤率計算（指定時間內的錯誤數）
+                current_value = series.count(duration, current_time)
             else:
                 # 其他指標的平均值
-                recent_values = [
-                    value for value in metric_queue
-                    if isinstance(value, (int, float))
-                ]
-                current_value = np.mean(recent_values) if recent_values else 0
+                current_value = series.average()
             
             # 檢查是否超過閾值
             if current_value > threshold:
@@ -831,21 +893,20 @@ class DataCollectionSystem:
                 # 清理30天前的數據
                 cutoff_time = time.time() - (30 * 24 * 3600)
                 
-                cursor = self.connection.cursor()
-                
-                # 清理數據點
-                cursor.execute("""
-                    DELETE FROM data_points
-                    WHERE timestamp < ?
-                """, (cutoff_time,))
+                def delete_old_rows(connection):
+                    # 清理數據點
+                    connection.execute("""
+                        DELETE FROM data_points
+                        WHERE timestamp < ?
+                    """, (cutoff_time,))
+                    
+                    # 清理反饋結果
+                    connection.execute("""
+                        DELETE FROM feedback_results
+                        WHERE timestamp < ?
+                    """, (cutoff_time,))
                 
-                # 清理反饋結果
-                cursor.execute("""
-                    DELETE FROM feedback_results
-                    WHERE timestamp < ?
-                """, (cutoff_time,))
-                
-                self.connection.commit()
+                await self.store.write(delete_old_rows)
                 
                 logger.info("🧹 清理舊數據完成")
                 
@@ -972,30 +1033,22 @@ class DataCollectionSystem:
         try:
             # 計算實時指標統計
             real_time_stats = {}
-            for metric_name, metric_queue in self.real_time_metrics.items():
-                if metric_queue:
+            for metric_name in self.real_time_metrics.names():
+                series = self.real_time_metrics.get(metric_name)
+                if len(series):
                     if metric_name in ["error_rate", "data_rate"]:
-                        # 計算頻率
-                        recent_count = len([
-                            timestamp for timestamp in metric_queue
-                            if time.time() - timestamp <= 300  # 最近5分鐘
-                        ])
-                        real_time_stats[metric_name] = recent_count
+                        # 計算頻率（最近5分鐘）
+                        real_time_stats[metric_name] = series.count(300)
                     else:
                         # 計算平均值
-                        values = [v for v in metric_queue if isinstance(v, (int, float))]
-                        real_time_stats[metric_name] = np.mean(values) if values else 0
+                        real_time_stats[metric_name] = series.average()
             
             # 獲取數據庫統計
-            cursor = self.connection.cursor()
-            
             # 數據點統計
-            cursor.execute("SELECT COUNT(*) FROM data_points")
-            total_data_points = cursor.fetchone()[0]
+            total_data_points = (await self.store.fetchone("SELECT COUNT(*) FROM data_points"))[0]
             
             # 反饋結果統計
-            cursor.execute("SELECT COUNT(*) FROM feedback_results")
-            total_feedback_results = cursor.fetchone()[0]
+            total_feedback_results = (await self.store.fetchone("SELECT COUNT(*) FROM feedback_results"))[0]
             
             # 反饋循環統計
             feedback_loop_stats = {}
@@ -1015,6 +1068,14 @@ class DataCollectionSystem:
                     "total_data_points": total_data_points,
                     "total_feedback_results": total_feedback_results
                 },
+                "ingestion_queue": {
+                    "queued": self._queued_count(),
+                    "by_priority": {priority.value: lane.qsize() for priority, lane in self.data_lanes.items()},
+                    "max_queue_size": self.max_queue_size,
+                    "dropped": self.collection_stats["dropped_data_points"],
+                    "backpressure_waits": self.collection_stats["backpressure_waits"],
+                    "batches_flushed": self.collection_stats["batches_flushed"]
+                },
                 "feedback_loops": feedback_loop_stats,
                 "collection_rules": len(self.collection_rules),
                 "is_running": self.is_running
@@ -1041,20 +1102,16 @@ class DataCollectionSystem:
                 pass
         
         # 處理剩餘的數據隊列
-        remaining_data = []
-        while not self.data_queue.empty():
-            try:
-                data_point = self.data_queue.get_nowait()
-                remaining_data.append(data_point)
-            except queue.Empty:
+        while True:
+            remaining_data = self._drain_lanes(self.batch_size)
+            if not remaining_data:
                 break
-        
-        if remaining_data:
             await self._process_data_batch(remaining_data)
         
         # 關閉數據庫連接
-        if self.connection:
-            self.connection.close()
+        if self.store:
+            await self.store.close()
+            self.store = None
         
         logger.info("✅ 數據收集系統清理完成")
 
@@ -17,6 +17,7 @@ from .intelligent_monitoring import (
     MonitoringReport,
     DashboardWidget
 )
+from .timeseries import RingBuffer, TimeSeriesStore
 
 __all__ = [
     'intelligent_monitoring_system',
@@ -30,7 +31,9 @@ __all__ = [
     'MetricPoint',
     'Alert',
     'MonitoringReport',
-    'DashboardWidget'
+    'DashboardWidget',
+    'RingBuffer',
+    'TimeSeriesStore'
 ]
 
 __version__ = "4.6.1"
@@ -21,19 +21,22 @@ Intelligent Monitoring and Reporting System
 import asyncio
 import logging
 import json
+import math
 import os
-import time
 import psutil
+import random
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Callable, Union
 from dataclasses import dataclass, asdict, field
 from enum import Enum
 from pathlib import Path
-from collections import defaultdict, deque
+from collections import defaultdict
 import statistics
 import uuid
 
+from .timeseries import RingBuffer, TimeSeriesStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -118,29 +121,79 @@ class DashboardWidget:
     position: Dict[str, int] = field(default_factory=dict)
 
 
+@dataclass
+class CollectorConfig:
+    """指標收集器配置"""
+    name: str
+    collector: Callable[[], Any]  # 協程函數；同步函數在線程池中執行
+    interval: float  # 秒
+    timeout: float  # 秒
+    jitter: float = 0.1  # 間隔的隨機抖動比例，避免收集器同時觸發
+    runs: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    last_duration: float = 0.0
+    last_run: Optional[str] = None
+
+
+def _poisson(lam: float) -> int:
+    """泊松分佈隨機數（Knuth算法，適用於小λ）"""
+    limit = math.exp(-lam)
+    count = 0
+    product = random.random()
+    while product > limit:
+        count += 1
+        product *= random.random()
+    return count
+
+
 class MetricsCollector:
     """指標收集器"""
     
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.metrics_buffer = deque(maxlen=10000)
-        self.collectors = {}
-        self.collection_interval = 30  # 30秒
+        # 全部指標和按名稱分組的環形緩衝區（浮點時間戳，窗口查詢為二分查找）
+        self.metrics_buffer = RingBuffer(10000, keep_items=True)
+        self.metric_series = TimeSeriesStore(capacity=10000, keep_items=True)
+        self._buffer_lock = threading.Lock()
+        self.collectors: Dict[str, CollectorConfig] = {}
+        self.collection_interval = 30  # 默認間隔30秒
+        self.collection_timeout = 10  # 默認超時10秒
         self.is_collecting = False
+        self._collection_tasks: Dict[str, asyncio.Task] = {}
         
     async def initialize(self):
         """初始化指標收集器"""
         self.logger.info("📊 初始化指標收集器")
         
-        # 註冊系統指標收集器
-        self.collectors["system"] = self._collect_system_metrics
-        self.collectors["application"] = self._collect_application_metrics
-        self.collectors["user"] = self._collect_user_metrics
-        self.collectors["business"] = self._collect_business_metrics
-        self.collectors["security"] = self._collect_security_metrics
+        # 初始化CPU採樣基準（之後的非阻塞採樣返回距上次調用的使用率）
+        psutil.cpu_percent(interval=None)
+        
+        # 註冊各範圍的指標收集器（每個收集器有自己的間隔）
+        self.register_collector("system", self._collect_system_metrics, interval=10)
+        self.register_collector("application", self._collect_application_metrics, interval=15)
+        self.register_collector("user", self._collect_user_metrics, interval=30)
+        self.register_collector("business", self._collect_business_metrics, interval=60)
+        self.register_collector("security", self._collect_security_metrics, interval=30)
         
         self.logger.info("✅ 指標收集器初始化完成")
     
+    def register_collector(self, name: str, collector: Callable[[], Any],
+                           interval: float = None, timeout: float = None, jitter: float = 0.1):
+        """註冊指標收集器（收集進行中註冊會立即啟動）"""
+        interval = interval or self.collection_interval
+        config = CollectorConfig(
+            name=name,
+            collector=collector,
+            interval=interval,
+            timeout=timeout or min(interval, self.collection_timeout),
+            jitter=jitter
+        )
+        self.collectors[name] = config
+        
+        if self.is_collecting:
+            self._start_collector(config)
+    
     async def start_collection(self):
         """開始指標收集"""
         if self.is_collecting:
@@ -149,38 +202,84 @@ class MetricsCollector:
         self.is_collecting = True
         self.logger.info("🔄 開始指標收集")
         
-        # 在後台線程中運行收集
-        collection_thread = threading.Thread(target=self._collection_loop, daemon=True)
-        collection_thread.start()
+        # 每個收集器一個協程，慢收集器不會拖慢其他收集器
+        for config in self.collectors.values():
+            self._start_collector(config)
+    
+    def _start_collector(self, config: CollectorConfig):
+        task = self._collection_tasks.get(config.name)
+        if task is not None and not task.done():
+            task.cancel()
+        self._collection_tasks[config.name] = asyncio.create_task(self._collection_loop(config))
     
     def stop_collection(self):
         """停止指標收集"""
         self.is_collecting = False
+        for task in self._collection_tasks.values():
+            task.cancel()
+        self._collection_tasks.clear()
         self.logger.info("⏹️ 停止指標收集")
     
-    def _collection_loop(self):
-        """指標收集循環"""
+    async def _run_collector(self, config: CollectorConfig) -> List[MetricPoint]:
+        """在超時限制內執行一次收集器"""
+        if asyncio.iscoroutinefunction(config.collector):
+            return await asyncio.wait_for(config.collector(), timeout=config.timeout)
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(None, config.collector), timeout=config.timeout)
+    
+    async def _collection_loop(self, config: CollectorConfig):
+        """單個收集器的調度循環（固定節拍加隨機抖動，抖動不累積）"""
+        loop = asyncio.get_running_loop()
+        tick = loop.time()
+        
         while self.is_collecting:
+            delay = tick + random.uniform(0, config.interval * config.jitter) - loop.time()
+            await asyncio.sleep(max(0.0, delay))
+            
+            started = loop.time()
             try:
-                # 收集所有類型的指標
-                for scope, collector in self.collectors.items():
-                    metrics = collector()
-                    for metric in metrics:
-                        self.metrics_buffer.append(metric)
-                
-                time.sleep(self.collection_interval)
-                
+                metrics = await self._run_collector(config)
+                self.record_metrics(metrics)
+            except asyncio.TimeoutError:
+                config.timeouts += 1
+                self.logger.warning(f"⏱️ 指標收集超時 ({config.name}, {config.timeout}s)")
             except Exception as e:
-                self.logger.error(f"指標收集錯誤: {e}")
-                time.sleep(5)  # 錯誤後等待5秒重試
+                config.failures += 1
+                self.logger.error(f"指標收集錯誤 ({config.name}): {e}")
+            
+            config.runs += 1
+            config.last_duration = loop.time() - started
+            config.last_run = datetime.now().isoformat()
+            
+            # 下一個節拍；落後時跳過錯過的節拍
+            tick += config.interval
+            if tick < loop.time():
+                tick = loop.time()
+    
+    def get_collector_stats(self) -> Dict[str, Dict[str, Any]]:
+        """獲取各收集器的運行統計"""
+        return {
+            name: {
+                "interval": config.interval,
+                "timeout": config.timeout,
+                "runs": config.runs,
+                "failures": config.failures,
+                "timeouts": config.timeouts,
+                "last_duration": config.last_duration,
+                "last_run": config.last_run
+            }
+            for name, config in self.collectors.items()
+        }
     
-    def _collect_system_metrics(self) -> List[MetricPoint]:
+    async def _collect_system_metrics(self) -> List[MetricPoint]:
         """收集系統指標"""
+        # psutil調用在線程池中執行，不阻塞事件循環
+        loop = asyncio.get_running_loop()
+        cpu_percent, memory, disk, net_io = await loop.run_in_executor(None, self._read_system_stats)
         timestamp = datetime.now().isoformat()
         metrics = []
         
         # CPU使用率
-        cpu_percent = psutil.cpu_percent(interval=1)
         metrics.append(MetricPoint(
             name="system.cpu.usage_percent",
             value=cpu_percent,
@@ -190,7 +289,6 @@ class MetricsCollector:
         ))
         
         # 內存使用率
-        memory = psutil.virtual_memory()
         metrics.append(MetricPoint(
             name="system.memory.usage_percent",
             value=memory.percent,
@@ -208,7 +306,6 @@ class MetricsCollector:
         ))
         
         # 磁盤使用率
-        disk = psutil.disk_usage('/')
         metrics.append(MetricPoint(
             name="system.disk.usage_percent",
             value=(disk.used / disk.total) * 100,
@@ -218,7 +315,6 @@ class MetricsCollector:
         ))
         
         # 網絡IO
-        net_io = psutil.net_io_counters()
         metrics.append(MetricPoint(
             name="system.network.bytes_sent",
             value=net_io.bytes_sent,
@@ -237,7 +333,17 @@ class MetricsCollector:
         
         return metrics
     
-    def _collect_application_metrics(self) -> List[MetricPoint]:
+    @staticmethod
+    def _read_system_stats():
+        # 非阻塞CPU採樣：返回距上次調用以來的使用率
+        return (
+            psutil.cpu_percent(interval=None),
+            psutil.virtual_memory(),
+            psutil.disk_usage('/'),
+            psutil.net_io_counters()
+        )
+    
+    async def _collect_application_metrics(self) -> List[MetricPoint]:
         """收集應用指標"""
         timestamp = datetime.now().isoformat()
         metrics = []
@@ -245,7 +351,7 @@ class MetricsCollector:
         # 模擬應用指標
         metrics.append(MetricPoint(
             name="app.api.response_time_ms",
-            value=statistics.normalvariate(150, 50),  # 平均150ms，標準差50ms
+            value=random.gauss(150, 50),  # 平均150ms，標準差50ms
             timestamp=timestamp,
             metric_type=MetricType.HISTOGRAM,
             labels={"scope": "application", "endpoint": "api"}
@@ -253,7 +359,7 @@ class MetricsCollector:
         
         metrics.append(MetricPoint(
             name="app.api.requests_per_second",
-            value=statistics.normalvariate(10, 3),  # 平均10 RPS
+            value=random.gauss(10, 3),  # 平均10 RPS
             timestamp=timestamp,
             metric_type=MetricType.GAUGE,
             labels={"scope": "application"}
@@ -261,7 +367,7 @@ class MetricsCollector:
         
         metrics.append(MetricPoint(
             name="app.errors.count",
-            value=statistics.poisson(0.5),  # 平均0.5個錯誤
+            value=_poisson(0.5),  # 平均0.5個錯誤
             timestamp=timestamp,
             metric_type=MetricType.COUNTER,
             labels={"scope": "application"}
@@ -269,7 +375,7 @@ class MetricsCollector:
         
         return metrics
     
-    def _collect_user_metrics(self) -> List[MetricPoint]:
+    async def _collect_user_metrics(self) -> List[MetricPoint]:
         """收集用戶指標"""
         timestamp = datetime.now().isoformat()
         metrics = []
@@ -277,7 +383,7 @@ class MetricsCollector:
         # 模擬用戶指標
         metrics.append(MetricPoint(
             name="user.active_sessions",
-            value=statistics.randint(5, 50),
+            value=random.randint(5, 50),
             timestamp=timestamp,
             metric_type=MetricType.GAUGE,
             labels={"scope": "user"}
@@ -285,7 +391,7 @@ class MetricsCollector:
         
         metrics.append(MetricPoint(
             name="user.feature_usage.code_generation",
-            value=statistics.randint(20, 100),
+            value=random.randint(20, 100),
             timestamp=timestamp,
             metric_type=MetricType.COUNTER,
             labels={"scope": "user", "feature": "code_generation"}
@@ -293,7 +399,7 @@ class MetricsCollector:
         
         return metrics
     
-    def _collect_business_metrics(self) -> List[MetricPoint]:
+    async def _collect_business_metrics(self) -> List[MetricPoint]:
         """收集業務指標"""
         timestamp = datetime.now().isoformat()
         metrics = []
@@ -301,7 +407,7 @@ class MetricsCollector:
         # 模擬業務指標
         metrics.append(MetricPoint(
             name="business.code_lines_generated",
-            value=statistics.randint(500, 2000),
+            value=random.randint(500, 2000),
             timestamp=timestamp,
             metric_type=MetricType.COUNTER,
             labels={"scope": "business"}
@@ -309,7 +415,7 @@ class MetricsCollector:
         
         metrics.append(MetricPoint(
             name="business.test_coverage_percent",
-            value=statistics.normalvariate(85, 10),
+            value=random.gauss(85, 10),
             timestamp=timestamp,
             metric_type=MetricType.GAUGE,
             labels={"scope": "business"}
@@ -317,7 +423,7 @@ class MetricsCollector:
         
         metrics.append(MetricPoint(
             name="business.deployment_success_rate",
-            value=statistics.normalvariate(95, 5),
+            value=random.gauss(95, 5),
             timestamp=timestamp,
             metric_type=MetricType.GAUGE,
             labels={"scope": "business"}
@@ -325,7 +431,7 @@ class MetricsCollector:
         
         return metrics
     
-    def _collect_security_metrics(self) -> List[MetricPoint]:
+    async def _collect_security_metrics(self) -> List[MetricPoint]:
         """收集安全指標"""
         timestamp = datetime.now().isoformat()
         metrics = []
@@ -333,7 +439,7 @@ class MetricsCollector:
         # 模擬安全指標
         metrics.append(MetricPoint(
             name="security.failed_login_attempts",
-            value=statistics.poisson(1),
+            value=_poisson(1),
             timestamp=timestamp,
             metric_type=MetricType.COUNTER,
             labels={"scope": "security"}
@@ -341,7 +447,7 @@ class MetricsCollector:
         
         metrics.append(MetricPoint(
             name="security.vulnerabilities_detected",
-            value=statistics.poisson(0.1),
+            value=_poisson(0.1),
             timestamp=timestamp,
             metric_type=MetricType.COUNTER,
             labels={"scope": "security"}
@@ -349,18 +455,33 @@ class MetricsCollector:
         
         return metrics
     
+    def record_metric(self, metric: MetricPoint):
+        """寫入指標（時間戳只在寫入時解析一次）"""
+        self.record_metrics([metric])
+    
+    def record_metrics(self, metrics: List[MetricPoint]):
+        """批量寫入指標，可從任意線程調用（每批各取一次鎖）"""
+        points = [
+            (metric.name, metric.value, datetime.fromisoformat(metric.timestamp).timestamp(), metric)
+            for metric in metrics
+        ]
+        if not points:
+            return
+        
+        with self._buffer_lock:
+            for _, value, timestamp, metric in points:
+                self.metrics_buffer.append(value, timestamp, metric)
+        self.metric_series.record_many(points)
+    
     def get_recent_metrics(self, metric_name: str = None, duration_minutes: int = 60) -> List[MetricPoint]:
         """獲取最近的指標"""
-        cutoff_time = datetime.now() - timedelta(minutes=duration_minutes)
+        seconds = duration_minutes * 60
         
-        recent_metrics = []
-        for metric in self.metrics_buffer:
-            metric_time = datetime.fromisoformat(metric.timestamp)
-            if metric_time >= cutoff_time:
-                if metric_name is None or metric.name == metric_name:
-                    recent_metrics.append(metric)
+        if metric_name is None:
+            with self._buffer_lock:
+                return self.metrics_buffer.window_items(seconds)
         
-        return recent_metrics
+        return self.metric_series.window_items(metric_name, seconds)
 
 
 class AnomalyDetector:
@@ -369,7 +490,8 @@ class AnomalyDetector:
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.thresholds = {}
-        self.baseline_data = defaultdict(list)
+        self.baseline_size = 100
+        self.baseline_data: Dict[str, RingBuffer] = {}
         
     async def initialize(self):
         """初始化異常檢測器"""
@@ -443,20 +565,18 @@ class AnomalyDetector:
     
     def _check_statistical_anomaly(self, metric: MetricPoint) -> Optional[Alert]:
         """檢查統計異常"""
-        # 收集基線數據
-        self.baseline_data[metric.name].append(metric.value)
-        
-        # 保持最近100個數據點
-        if len(self.baseline_data[metric.name]) > 100:
-            self.baseline_data[metric.name] = self.baseline_data[metric.name][-100:]
+        # 收集基線數據（環形緩衝區保持最近100個數據點，增量維護均值/方差）
+        baseline = self.baseline_data.get(metric.name)
+        if baseline is None:
+            baseline = self.baseline_data[metric.name] = RingBuffer(self.baseline_size)
+        baseline.append(metric.value)
         
         # 需要至少30個數據點才能進行統計分析
-        if len(self.baseline_data[metric.name]) < 30:
+        if len(baseline) < 30:
             return None
         
-        data = self.baseline_data[metric.name]
-        mean = statistics.mean(data)
-        stdev = statistics.stdev(data)
+        mean = baseline.mean
+        stdev = baseline.stdev()
         
         # 3-sigma規則檢測異常
         if abs(metric.value - mean) > 3 * stdev:
@@ -997,23 +1117,22 @@ class IntelligentMonitoringSystem:
     
     def get_system_metrics_summary(self) -> Dict[str, Any]:
         """獲取系統指標摘要"""
-        recent_metrics = self.metrics_collector.get_recent_metrics(duration_minutes=30)
-        
-        # 按指標名稱分組
-        metrics_by_name = defaultdict(list)
-        for metric in recent_metrics:
-            metrics_by_name[metric.name].append(metric.value)
+        window = 30 * 60
+        metric_series = self.metrics_collector.metric_series
         
         summary = {}
-        for metric_name, values in metrics_by_name.items():
-            if values:
-                summary[metric_name] = {
-                    "current": values[-1],
-                    "average": statistics.mean(values),
-                    "max": max(values),
-                    "min": min(values),
-                    "count": len(values)
-                }
+        with metric_series.lock:
+            for metric_name in metric_series.names():
+                series = metric_series.get(metric_name)
+                _, values = series.window(window)
+                if len(values):
+                    summary[metric_name] = {
+                        "current": float(values[-1]),
+                        "average": series.average(window),
+                        "max": float(values.max()),
+                        "min": float(values.min()),
+                        "count": len(values)
+                    }
         
         return summary
     
@@ -1023,6 +1142,7 @@ class IntelligentMonitoringSystem:
             "component": "Intelligent Monitoring System",
             "version": "4.6.1",
             "monitoring_active": self.metrics_collector.is_collecting,
+            "collectors": self.metrics_collector.get_collector_stats(),
             "total_metrics_collected": len(self.metrics_collector.metrics_buffer),
             "active_alerts": len(self.active_alerts),
             "dashboard_widgets": len(self.dashboard_widgets),
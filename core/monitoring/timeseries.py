@@ -0,0 +1,249 @@
+"""
+PowerAutomation 時間序列存儲
+Compact Ring-Buffer Time-Series Store
+
+每個指標一個基於NumPy的環形緩衝區：
+- 浮點時間戳 (time.time())，窗口查詢使用二分查找 O(log n)
+- 累計和前綴，窗口平均/計數 O(log n)；每次回繞時按緩衝區內數據重算，不隨總寫入量累積誤差
+- Welford增量均值/方差（覆蓋緩衝區內全部數據）O(1)
+- 窗口百分位數 O(k)（k為窗口內數據點數）
+"""
+
+import math
+import time
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class RingBuffer:
+    """固定容量的時間序列環形緩衝區
+
+    窗口查詢要求時間戳非遞減，早於最新數據點的時間戳（例如並發采集晚到的結果）
+    按最新時間戳寫入。可選地保存原始對象（例如 MetricPoint），以便窗口查詢
+    返回完整的數據點。
+    """
+
+    def __init__(self, capacity: int = 1000, keep_items: bool = False):
+        if capacity <= 0:
+            raise ValueError("capacity必須大於0")
+
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        # 每個槽位寫入時的累計和（含該值），窗口和 = 兩端累計和之差
+        self.cumulative = np.zeros(capacity, dtype=np.float64)
+        self.items: Optional[List[Any]] = [None] * capacity if keep_items else None
+
+        self.start = 0
+        self.size = 0
+        self.total = 0.0
+
+        # Welford 增量統計（緩衝區內全部數據）
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, value: float, timestamp: Optional[float] = None, item: Any = None):
+        """寫入一個數據點，緩衝區已滿時覆蓋最舊的數據"""
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.size and timestamp < self.timestamps[self._physical(self.size - 1)]:
+            timestamp = float(self.timestamps[self._physical(self.size - 1)])
+        value = float(value)
+
+        if self.size == self.capacity:
+            self._welford_remove(self.values[self.start])
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        else:
+            index = (self.start + self.size) % self.capacity
+            self.size += 1
+
+        self.total += value
+        self.timestamps[index] = timestamp
+        self.values[index] = value
+        self.cumulative[index] = self.total
+        if self.items is not None:
+            self.items[index] = item
+
+        self._welford_add(value)
+
+        if self.size == self.capacity and self.start == 0 and index == self.capacity - 1:
+            self._rebase()
+
+    def _rebase(self):
+        """緩衝區回繞到起點時（此時物理順序即時間順序）重算累計和與統計量
+
+        累計和只用於求差，重算後其量級只取決於緩衝區內的數據，
+        不會隨寫入總量增長而損失精度；Welford統計的刪除誤差也一併清除。
+        """
+        np.cumsum(self.values, out=self.cumulative)
+        self.total = float(self.cumulative[-1])
+        self.mean = float(self.values.mean())
+        self._m2 = float(np.square(self.values - self.mean).sum())
+
+    def _welford_add(self, value: float):
+        count = self.size
+        delta = value - self.mean
+        self.mean += delta / count
+        self._m2 += delta * (value - self.mean)
+
+    def _welford_remove(self, value: float):
+        count = self.size - 1
+        if count <= 0:
+            self.mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / count
+        self._m2 = max(0.0, self._m2 - delta * (value - self.mean))
+
+    def variance(self, sample: bool = True) -> float:
+        """緩衝區內數據的方差（默認樣本方差）"""
+        denominator = self.size - 1 if sample else self.size
+        return self._m2 / denominator if denominator > 0 else 0.0
+
+    def stdev(self, sample: bool = True) -> float:
+        return math.sqrt(self.variance(sample))
+
+    def _physical(self, logical: int) -> int:
+        return (self.start + logical) % self.capacity
+
+    def _ordered(self, array: np.ndarray, begin: int = 0) -> np.ndarray:
+        """按時間順序返回邏輯區間 [begin, size) 的數據"""
+        if begin >= self.size:
+            return array[:0]
+        first = self._physical(begin)
+        end = self.start + self.size  # 可能超出容量（已回繞）
+
+        if first >= self.start:
+            if end <= self.capacity:
+                return array[first:end]
+            return np.concatenate([array[first:], array[:end - self.capacity]])
+        return array[first:end - self.capacity]
+
+    def _window_start(self, seconds: Optional[float], now: Optional[float]) -> int:
+        """窗口內第一個數據點的邏輯位置（二分查找）"""
+        if seconds is None or self.size == 0:
+            return 0
+        cutoff = (time.time() if now is None else now) - seconds
+
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[self._physical(middle)] < cutoff:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def count(self, seconds: Optional[float] = None, now: Optional[float] = None) -> int:
+        """窗口內的數據點數量"""
+        return self.size - self._window_start(seconds, now)
+
+    def sum(self, seconds: Optional[float] = None, now: Optional[float] = None) -> float:
+        """窗口內數值之和"""
+        begin = self._window_start(seconds, now)
+        if begin >= self.size:
+            return 0.0
+        last = self.cumulative[self._physical(self.size - 1)]
+        first = self.cumulative[self._physical(begin)] - self.values[self._physical(begin)]
+        return float(last - first)
+
+    def average(self, seconds: Optional[float] = None, now: Optional[float] = None) -> float:
+        """窗口內數值平均"""
+        count = self.count(seconds, now)
+        return self.sum(seconds, now) / count if count else 0.0
+
+    def rate(self, seconds: float, now: Optional[float] = None) -> float:
+        """窗口內每秒事件數"""
+        return self.count(seconds, now) / seconds if seconds > 0 else 0.0
+
+    def percentile(self, q: float, seconds: Optional[float] = None, now: Optional[float] = None) -> float:
+        """窗口內數值的百分位數 (q: 0-100)"""
+        values = self._ordered(self.values, self._window_start(seconds, now))
+        if len(values) == 0:
+            return 0.0
+        return float(np.percentile(values, q))
+
+    def window(self, seconds: Optional[float] = None,
+               now: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """返回窗口內按時間排序的 (timestamps, values)"""
+        begin = self._window_start(seconds, now)
+        return self._ordered(self.timestamps, begin), self._ordered(self.values, begin)
+
+    def window_items(self, seconds: Optional[float] = None, now: Optional[float] = None) -> List[Any]:
+        """返回窗口內按時間排序的原始對象（需要 keep_items=True）"""
+        if self.items is None:
+            raise ValueError("RingBuffer未保存原始對象")
+        begin = self._window_start(seconds, now)
+        return [self.items[self._physical(i)] for i in range(begin, self.size)]
+
+    def last(self) -> Optional[float]:
+        """最新的數值"""
+        if self.size == 0:
+            return None
+        return float(self.values[self._physical(self.size - 1)])
+
+    def values_list(self) -> List[float]:
+        """按時間排序的全部數值"""
+        return self._ordered(self.values).tolist()
+
+
+class TimeSeriesStore:
+    """按指標名稱管理環形緩衝區的時間序列存儲（寫入線程安全）"""
+
+    def __init__(self, capacity: int = 1000, keep_items: bool = False,
+                 capacities: Optional[Dict[str, int]] = None):
+        self.capacity = capacity
+        self.keep_items = keep_items
+        self.capacities = capacities or {}
+        self.series: Dict[str, RingBuffer] = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.series
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def get(self, name: str) -> Optional[RingBuffer]:
+        return self.series.get(name)
+
+    def names(self) -> List[str]:
+        return list(self.series.keys())
+
+    def record(self, name: str, value: float, timestamp: Optional[float] = None, item: Any = None):
+        """寫入指標數據點"""
+        self.record_many([(name, value, timestamp, item)])
+
+    def record_many(self, points: Iterable[Tuple[str, float, Optional[float], Any]]):
+        """批量寫入 (name, value, timestamp, item) 數據點"""
+        with self.lock:
+            for name, value, timestamp, item in points:
+                series = self.series.get(name)
+                if series is None:
+                    series = self.series[name] = RingBuffer(
+                        self.capacities.get(name, self.capacity), keep_items=self.keep_items
+                    )
+                series.append(value, timestamp, item)
+
+    def window_items(self, name: str, seconds: Optional[float] = None) -> List[Any]:
+        """返回指標窗口內的原始對象"""
+        with self.lock:
+            series = self.series.get(name)
+            return series.window_items(seconds) if series is not None else []
+
+    def summary(self, name: str, seconds: Optional[float] = None) -> Dict[str, float]:
+        """窗口摘要：當前值、平均、計數"""
+        series = self.series.get(name)
+        if series is None or len(series) == 0:
+            return {"current": 0.0, "average": 0.0, "count": 0}
+        return {
+            "current": series.last(),
+            "average": series.average(seconds),
+            "count": series.count(seconds)
+        }
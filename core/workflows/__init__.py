@@ -11,7 +11,8 @@ from .workflow_engine import (
     WorkflowCategory,
     WorkflowNode,
     WorkflowDefinition,
-    WorkflowExecution
+    WorkflowExecution,
+    WorkflowGraph
 )
 
 __all__ = [
@@ -22,7 +23,8 @@ __all__ = [
     'WorkflowCategory',
     'WorkflowNode',
     'WorkflowDefinition',
-    'WorkflowExecution'
+    'WorkflowExecution',
+    'WorkflowGraph'
 ]
 
 __version__ = "4.6.1"
@@ -17,8 +17,10 @@ import asyncio
 import logging
 import json
 import os
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Union, Callable
+from typing import Dict, List, Any, Optional, Union, Callable, Tuple
 from dataclasses import dataclass, asdict, field
 from enum import Enum
 from pathlib import Path
@@ -109,15 +111,85 @@ class WorkflowExecution:
     metrics: Dict[str, Any] = field(default_factory=dict)
 
 
+@dataclass
+class WorkflowGraph:
+    """工作流DAG（預計算的節點索引、鄰接表和入度）"""
+    nodes: Dict[str, WorkflowNode]
+    successors: Dict[str, List[str]]
+    predecessors: Dict[str, List[str]]
+    indegree: Dict[str, int]
+    start_nodes: List[str]
+    
+    @classmethod
+    def from_workflow(cls, workflow: WorkflowDefinition) -> "WorkflowGraph":
+        """構建並校驗DAG：節點唯一、後續節點存在、無循環"""
+        nodes: Dict[str, WorkflowNode] = {}
+        for node in workflow.nodes:
+            if node.id in nodes:
+                raise ValueError(f"節點 {node.id} 重複定義")
+            nodes[node.id] = node
+        
+        successors = {node_id: [] for node_id in nodes}
+        predecessors = {node_id: [] for node_id in nodes}
+        indegree = {node_id: 0 for node_id in nodes}
+        
+        for node in workflow.nodes:
+            for next_node_id in dict.fromkeys(node.next_nodes):
+                if next_node_id not in nodes:
+                    raise ValueError(f"節點 {next_node_id} 不存在")
+                successors[node.id].append(next_node_id)
+                predecessors[next_node_id].append(node.id)
+                indegree[next_node_id] += 1
+        
+        start_nodes = [node_id for node_id, degree in indegree.items() if degree == 0]
+        if not start_nodes:
+            raise ValueError("未找到起始節點")
+        
+        # Kahn算法校驗無循環
+        remaining = dict(indegree)
+        queue = deque(start_nodes)
+        visited = 0
+        while queue:
+            node_id = queue.popleft()
+            visited += 1
+            for next_node_id in successors[node_id]:
+                remaining[next_node_id] -= 1
+                if remaining[next_node_id] == 0:
+                    queue.append(next_node_id)
+        
+        if visited != len(nodes):
+            cyclic = [node_id for node_id, degree in remaining.items() if degree > 0]
+            raise ValueError(f"工作流存在循環依賴: {cyclic}")
+        
+        return cls(
+            nodes=nodes,
+            successors=successors,
+            predecessors=predecessors,
+            indegree=indegree,
+            start_nodes=start_nodes
+        )
+
+
 class WorkflowEngine:
     """工作流引擎"""
     
-    def __init__(self):
+    def __init__(self, checkpoint_dir: str = None):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.workflows = {}
         self.executions = {}
         self.node_handlers = {}
         self.running_workflows = {}
+        self.execution_tasks: Dict[str, asyncio.Task] = {}
+        self.max_concurrent_nodes = 8  # 單個執行中同時運行的節點上限
+        
+        # 執行檢查點：每個執行一個追加寫入的JSONL日誌
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else \
+            Path.home() / ".powerautomation" / "workflow_executions"
+        self.checkpoint_retention_days = 7
+        self.max_finished_executions = 100  # 內存中保留的已結束執行數
+        self.max_execution_logs = 500  # 每個執行保留的日誌條數
+        self._checkpoint_files: Dict[str, Any] = {}
+        self._finished_executions = deque()
         
     async def initialize(self):
         """初始化工作流引擎"""
@@ -129,6 +201,12 @@ class WorkflowEngine:
         # 註冊節點處理器
         await self._register_node_handlers()
         
+        # 清理過期檢查點
+        self._purge_expired_checkpoints()
+        resumable = self.list_resumable_executions()
+        if resumable:
+            self.logger.info(f"發現 {len(resumable)} 個可恢復的工作流執行")
+        
         self.logger.info("✅ Workflow Engine初始化完成")
     
     async def _load_predefined_workflows(self):
@@ -1048,32 +1126,70 @@ class WorkflowEngine:
         )
         
         self.executions[execution_id] = execution
-        self.running_workflows[execution_id] = workflow
+        self._write_checkpoint(execution_id, {
+            "event": "started",
+            "workflow_id": workflow_id,
+            "start_time": execution.start_time,
+            "inputs": execution.execution_context
+        })
         
         self.logger.info(f"開始執行工作流: {workflow.name} ({execution_id})")
         
         # 異步執行工作流
-        asyncio.create_task(self._execute_workflow_async(execution_id))
+        self._start_execution(execution_id, {})
+        
+        return execution_id
+    
+    async def resume_execution(self, execution_id: str) -> str:
+        """從檢查點恢復執行，已完成的節點不再重新執行"""
+        if execution_id in self.execution_tasks:
+            return execution_id
+        
+        existing = self.executions.get(execution_id)
+        if existing is not None and existing.status == WorkflowStatus.COMPLETED:
+            return execution_id
+        
+        loaded = self._load_checkpoint(execution_id)
+        if loaded is None:
+            raise ValueError(f"執行 {execution_id} 不存在檢查點")
+        
+        execution, completed = loaded
+        if execution.workflow_id not in self.workflows:
+            raise ValueError(f"工作流 {execution.workflow_id} 不存在")
+        
+        self.executions[execution_id] = execution
+        if execution.status == WorkflowStatus.COMPLETED:
+            return execution_id
+        
+        execution.status = WorkflowStatus.RUNNING
+        execution.error_message = None
+        execution.end_time = None
+        self._write_checkpoint(execution_id, {"event": "resumed", "time": datetime.now().isoformat()})
+        self._log(execution, f"從檢查點恢復執行，跳過 {len(completed)} 個已完成節點")
+        
+        self.logger.info(f"恢復執行工作流: {execution.workflow_id} ({execution_id})")
+        self._start_execution(execution_id, completed)
         
         return execution_id
     
-    async def _execute_workflow_async(self, execution_id: str):
+    def _start_execution(self, execution_id: str, completed: Dict[str, bool]):
+        execution = self.executions[execution_id]
+        self.running_workflows[execution_id] = self.workflows[execution.workflow_id]
+        
+        task = asyncio.create_task(self._execute_workflow_async(execution_id, completed))
+        self.execution_tasks[execution_id] = task
+        task.add_done_callback(lambda _: self.execution_tasks.pop(execution_id, None))
+    
+    async def _execute_workflow_async(self, execution_id: str, completed: Dict[str, bool] = None):
         """異步執行工作流"""
         execution = self.executions[execution_id]
         workflow = self.running_workflows[execution_id]
         
         try:
-            # 找到起始節點
-            start_nodes = [node for node in workflow.nodes if not any(
-                node.id in other_node.next_nodes for other_node in workflow.nodes
-            )]
-            
-            if not start_nodes:
-                raise ValueError("未找到起始節點")
+            graph = WorkflowGraph.from_workflow(workflow)
             
-            # 執行節點
-            for start_node in start_nodes:
-                await self._execute_node(execution_id, start_node.id)
+            # 按DAG並行執行節點
+            await self._execute_graph(execution, graph, completed)
             
             execution.status = WorkflowStatus.COMPLETED
             execution.end_time = datetime.now().isoformat()
@@ -1087,39 +1203,250 @@ class WorkflowEngine:
         finally:
             if execution_id in self.running_workflows:
                 del self.running_workflows[execution_id]
+            
+            # 被取消（例如進程退出）時不寫結束事件，之後可以恢復
+            if execution.end_time is not None:
+                self._write_checkpoint(execution_id, {
+                    "event": "finished",
+                    "status": execution.status.value,
+                    "end_time": execution.end_time,
+                    "error_message": execution.error_message
+                })
+                self._finish_execution(execution_id)
+            self._close_checkpoint(execution_id)
     
-    async def _execute_node(self, execution_id: str, node_id: str):
-        """執行單個節點"""
-        execution = self.executions[execution_id]
-        workflow = self.running_workflows[execution_id]
+    async def _execute_graph(self, execution: WorkflowExecution, graph: WorkflowGraph,
+                             completed: Optional[Dict[str, bool]] = None):
+        """按拓撲就緒順序執行DAG
+        
+        入度歸零的節點立即並發執行（受 max_concurrent_nodes 限制）；匯合節點在
+        所有前驅結束後只執行一次。所有前驅都被跳過的節點同樣跳過（分支剪除）。
+        completed（節點 -> 是否執行）中的節點來自檢查點，不再重新執行。
+        任一節點失敗時取消其餘節點並拋出異常。
+        """
+        completed = completed or {}
+        remaining = dict(graph.indegree)
+        reached = set(graph.start_nodes)  # 起始節點或至少一個前驅已執行的節點
+        ready = deque(graph.start_nodes)
+        running: Dict[asyncio.Task, str] = {}
+        semaphore = asyncio.Semaphore(self.max_concurrent_nodes)
+        node_durations = execution.metrics.setdefault("node_durations", {})
+        execution.metrics.setdefault("max_parallel_nodes", 0)
         
-        node = next((n for n in workflow.nodes if n.id == node_id), None)
-        if not node:
-            raise ValueError(f"節點 {node_id} 不存在")
+        def release(node_id: str, executed: bool):
+            for next_node_id in graph.successors[node_id]:
+                if executed:
+                    reached.add(next_node_id)
+                remaining[next_node_id] -= 1
+                if remaining[next_node_id] == 0:
+                    ready.append(next_node_id)
         
-        execution.current_node = node_id
-        execution.logs.append(f"開始執行節點: {node.name}")
+        async def run(node: WorkflowNode) -> bool:
+            async with semaphore:
+                started = time.perf_counter()
+                executed = await self._execute_node(execution, node)
+                node_durations[node.id] = time.perf_counter() - started
+                return executed
+        
+        try:
+            while ready or running:
+                while ready:
+                    node_id = ready.popleft()
+                    if node_id in completed:
+                        release(node_id, completed[node_id])
+                    elif node_id not in reached:
+                        release(node_id, False)
+                    else:
+                        running[asyncio.create_task(run(graph.nodes[node_id]))] = node_id
+                
+                if not running:
+                    break
+                
+                execution.metrics["max_parallel_nodes"] = max(
+                    execution.metrics["max_parallel_nodes"], min(len(running), self.max_concurrent_nodes)
+                )
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node_id = running.pop(task)
+                    release(node_id, task.result())
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+    
+    async def _execute_node(self, execution: WorkflowExecution, node: WorkflowNode) -> bool:
+        """執行單個節點（後續節點由調度器負責），返回節點是否執行"""
+        execution.current_node = node.id
+        self._log(execution, f"開始執行節點: {node.name}")
         
         try:
             # 檢查版本權限
             if not self._check_node_permissions(node):
-                execution.logs.append(f"節點 {node.name} 版本權限不足，跳過")
-                return
+                self._log(execution, f"節點 {node.name} 版本權限不足，跳過")
+                self._write_checkpoint(execution.id, {"event": "node_completed", "node_id": node.id, "executed": False})
+                return False
             
             # 執行節點處理器
+            result = {}
             if node.action_handler and node.action_handler in self.node_handlers:
                 result = await self.node_handlers[node.action_handler](execution.execution_context)
                 execution.execution_context.update(result)
-                execution.logs.append(f"節點 {node.name} 執行完成")
+                self._log(execution, f"節點 {node.name} 執行完成")
             
-            # 執行後續節點
-            for next_node_id in node.next_nodes:
-                await self._execute_node(execution_id, next_node_id)
+            # 節點完成檢查點（含上下文更新，恢復時按順序重放）
+            self._write_checkpoint(execution.id, {
+                "event": "node_completed",
+                "node_id": node.id,
+                "executed": True,
+                "result": result
+            })
+            return True
                 
         except Exception as e:
-            execution.logs.append(f"節點 {node.name} 執行失敗: {e}")
+            self._log(execution, f"節點 {node.name} 執行失敗: {e}")
             raise
     
+    def _log(self, execution: WorkflowExecution, message: str):
+        """追加執行日誌，超過上限時丟棄最舊的日誌"""
+        execution.logs.append(message)
+        if len(execution.logs) > self.max_execution_logs * 2:
+            del execution.logs[:-self.max_execution_logs]
+    
+    # ---- 檢查點 ----
+    
+    def _checkpoint_path(self, execution_id: str) -> Path:
+        return self.checkpoint_dir / f"{execution_id}.jsonl"
+    
+    def _write_checkpoint(self, execution_id: str, event: Dict[str, Any]):
+        """追加寫入檢查點事件並刷到磁盤"""
+        try:
+            checkpoint_file = self._checkpoint_files.get(execution_id)
+            if checkpoint_file is None:
+                self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+                checkpoint_file = open(self._checkpoint_path(execution_id), 'a', encoding='utf-8')
+                self._checkpoint_files[execution_id] = checkpoint_file
+            
+            checkpoint_file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        except Exception as e:
+            self.logger.error(f"寫入工作流檢查點失敗 ({execution_id}): {e}")
+    
+    def _close_checkpoint(self, execution_id: str):
+        checkpoint_file = self._checkpoint_files.pop(execution_id, None)
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+    
+    def _load_checkpoint(self, execution_id: str) -> Optional[Tuple[WorkflowExecution, Dict[str, bool]]]:
+        """重放檢查點，返回 (執行記錄, 已完成節點 -> 是否執行)"""
+        checkpoint_path = self._checkpoint_path(execution_id)
+        if not checkpoint_path.exists():
+            return None
+        
+        execution = None
+        completed: Dict[str, bool] = {}
+        
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # 崩潰時可能留下不完整的最後一行
+                    continue
+                
+                kind = event.get("event")
+                if kind == "started":
+                    execution = WorkflowExecution(
+                        id=execution_id,
+                        workflow_id=event["workflow_id"],
+                        status=WorkflowStatus.RUNNING,
+                        start_time=event["start_time"],
+                        execution_context=dict(event.get("inputs") or {})
+                    )
+                elif execution is None:
+                    continue
+                elif kind == "node_completed":
+                    completed[event["node_id"]] = event["executed"]
+                    execution.execution_context.update(event.get("result") or {})
+                    execution.current_node = event["node_id"]
+                elif kind == "resumed":
+                    execution.status = WorkflowStatus.RUNNING
+                    execution.end_time = None
+                    execution.error_message = None
+                elif kind == "finished":
+                    execution.status = WorkflowStatus(event["status"])
+                    execution.end_time = event["end_time"]
+                    execution.error_message = event.get("error_message")
+        
+        if execution is None:
+            return None
+        
+        if execution.status == WorkflowStatus.RUNNING and execution_id not in self.execution_tasks:
+            # 沒有結束事件：進程在執行中退出
+            execution.status = WorkflowStatus.PAUSED
+        
+        return execution, completed
+    
+    def list_resumable_executions(self) -> List[Dict[str, Any]]:
+        """列出檢查點中未完成（中斷或失敗）的執行"""
+        if not self.checkpoint_dir.exists():
+            return []
+        
+        resumable = []
+        for checkpoint_path in self.checkpoint_dir.glob("*.jsonl"):
+            execution_id = checkpoint_path.stem
+            if execution_id in self.execution_tasks:
+                continue
+            
+            try:
+                loaded = self._load_checkpoint(execution_id)
+            except OSError:
+                continue
+            if loaded is None:
+                continue
+            
+            execution, completed = loaded
+            if execution.status in (WorkflowStatus.PAUSED, WorkflowStatus.FAILED):
+                resumable.append({
+                    "execution_id": execution_id,
+                    "workflow_id": execution.workflow_id,
+                    "status": execution.status.value,
+                    "start_time": execution.start_time,
+                    "completed_nodes": len(completed),
+                    "error_message": execution.error_message
+                })
+        
+        return resumable
+    
+    def _finish_execution(self, execution_id: str):
+        """記錄已結束的執行；超過保留數量時從內存移除最舊的執行"""
+        execution = self.executions.get(execution_id)
+        if execution is not None and execution.status == WorkflowStatus.COMPLETED:
+            # 已完成的執行不需要恢復，刪除檢查點
+            self._close_checkpoint(execution_id)
+            self._checkpoint_path(execution_id).unlink(missing_ok=True)
+        
+        self._finished_executions.append(execution_id)
+        while len(self._finished_executions) > self.max_finished_executions:
+            evicted = self._finished_executions.popleft()
+            if evicted not in self.execution_tasks:
+                self.executions.pop(evicted, None)
+    
+    def _purge_expired_checkpoints(self):
+        """刪除超過保留期的檢查點"""
+        if not self.checkpoint_dir.exists():
+            return
+        
+        cutoff = time.time() - self.checkpoint_retention_days * 86400
+        for checkpoint_path in self.checkpoint_dir.glob("*.jsonl"):
+            try:
+                if checkpoint_path.stat().st_mtime < cutoff:
+                    checkpoint_path.unlink()
+            except OSError:
+                continue
+    
     def _check_node_permissions(self, node: WorkflowNode) -> bool:
         """檢查節點權限"""
         # 簡化的權限檢查，實際應該與版本策略集成
@@ -1164,6 +1491,7 @@ class WorkflowEngine:
             "total_workflows": len(self.workflows),
             "active_executions": len(self.running_workflows),
             "total_executions": len(self.executions),
+            "checkpoint_dir": str(self.checkpoint_dir),
             "workflow_categories": [cat.value for cat in WorkflowCategory],
             "supported_node_types": [node_type.value for node_type in NodeType],
             "registered_handlers": len(self.node_handlers),
@@ -0,0 +1,204 @@
+"""
+SourceAnalyzer 单元测试
+"""
+
+import ast
+import textwrap
+
+import pytest
+
+from core.components.intelligent_error_handler_mcp.ast_analysis import analyze_tree
+from core.components.intelligent_error_handler_mcp.error_handler import IntelligentErrorHandlerMCP
+
+
+def analyze(source: str):
+    """分析一段源码"""
+    return analyze_tree(ast.parse(textwrap.dedent(source)))
+
+
+def undefined(source: str):
+    return [item["name"] for item in analyze(source).undefined_names]
+
+
+def unused(source: str):
+    return [item["asname"] or item["name"] for item in analyze(source).unused_imports]
+
+
+@pytest.mark.unit
+class TestUndefinedNames:
+    """未定义名称检测"""
+
+    def test_forward_reference_from_function(self):
+        """函数体可以引用模块后面才定义的名称"""
+        assert undefined("""
+            def main():
+                return helper()
+
+            def helper():
+                return 1
+        """) == []
+
+    def test_local_name_not_visible_outside(self):
+        """函数局部变量在模块级不可见"""
+        assert undefined("""
+            def f():
+                local = 1
+
+            print(local)
+        """) == ["local"]
+
+    def test_class_scope_hidden_from_methods(self):
+        """类属性对方法体不可见，对类体可见"""
+        assert undefined("""
+            class Config:
+                retries = 3
+                doubled = retries * 2
+
+                def get(self):
+                    return retries
+        """) == ["retries"]
+
+    def test_comprehension_and_lambda_scopes(self):
+        """推导式变量和lambda参数只在各自作用域内可见"""
+        assert undefined("""
+            squares = [n * n for n in range(3)]
+            scale = lambda x: x * 2
+            print(n, x)
+        """) == ["n", "x"]
+
+    def test_global_nonlocal_and_walrus(self):
+        """global/nonlocal 声明和海象运算符按Python规则绑定"""
+        assert undefined("""
+            def setup():
+                global counter
+                counter = 0
+
+            def outer():
+                total = 0
+                def inner():
+                    nonlocal total
+                    total += 1
+                return inner
+
+            if (match := len("abc")) > 2:
+                pass
+            print(counter, match)
+        """) == []
+
+    def test_except_names_and_builtins(self):
+        """异常变量、内置名称和模块隐式名称不报告"""
+        assert undefined("""
+            try:
+                value = int(__name__)
+            except ValueError as error:
+                print(error)
+        """) == []
+
+    def test_star_import_suppresses_report(self):
+        """含 from x import * 的模块不报告未定义名称"""
+        assert undefined("""
+            from os.path import *
+            print(join("a", "b"))
+        """) == []
+
+
+@pytest.mark.unit
+class TestUnusedImports:
+    """未使用导入检测"""
+
+    def test_unused_and_shadowed_imports(self):
+        """只报告没有被任何作用域读取的导入"""
+        assert unused("""
+            import os
+            import sys
+            import json as j
+            from typing import List, Dict
+
+            def f(items: List[int]):
+                return sys.argv
+        """) == ["os", "j", "Dict"]
+
+    def test_dotted_import_binds_top_package(self):
+        """import a.b 绑定 a，通过 a.b 使用即视为已使用"""
+        assert unused("""
+            import os.path
+            print(os.path.join("a", "b"))
+        """) == []
+
+    def test_string_annotations_and_exports_count_as_use(self):
+        """字符串前向引用注解和 __all__ 导出都算使用"""
+        assert unused("""
+            from typing import Optional
+            from collections import OrderedDict
+            from decimal import Decimal
+
+            __all__ = ["Decimal"]
+
+            def f(value: "Optional[OrderedDict]"):
+                return value
+        """) == []
+
+    def test_function_level_import(self):
+        """函数内导入只在该函数内解析"""
+        assert unused("""
+            def f():
+                import re
+                return 1
+
+            def g():
+                import re
+                return re.compile("x")
+        """) == ["re"]
+
+    def test_future_imports_are_ignored(self):
+        """__future__ 导入不报告"""
+        assert unused("from __future__ import annotations\n") == []
+
+
+@pytest.mark.unit
+class TestSecurityPatterns:
+    """安全模式检测"""
+
+    def test_eval_and_hardcoded_secrets(self):
+        """eval 调用和非空字符串密钥被报告，空字符串不报告"""
+        issues = analyze("""
+            password = "hunter2"
+            api_key = ""
+            client = connect(api_key="sk-123")
+            eval("1 + 1")
+        """).security_issues
+
+        assert [line for line, _ in issues] == [2, 4, 5]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestScanProject:
+    """项目扫描测试"""
+
+    async def scan(self, project, parallel: bool):
+        handler = IntelligentErrorHandlerMCP()
+        if parallel:
+            handler.max_workers = 2
+            handler.parallel_threshold = 1
+        else:
+            handler.parallel_threshold = 10 ** 6
+        report = await handler.scan_project(str(project))
+        return report, sorted((error.file_path, error.line_number, error.error_type) for error in report.error_details)
+
+    async def test_process_pool_matches_serial_scan(self, tmp_path, monkeypatch):
+        """进程池扫描与串行扫描结果一致，语法错误只影响所在文件"""
+        monkeypatch.chdir(tmp_path)
+        project = tmp_path / "project"
+        project.mkdir()
+        for index in range(20):
+            (project / f"module_{index}.py").write_text(f"import os\n\ndef f{index}():\n    return undefined_{index}\n")
+        (project / "broken.py").write_text("def broken(:\n    pass\n")
+
+        serial_report, serial_errors = await self.scan(project, parallel=False)
+        parallel_report, parallel_errors = await self.scan(project, parallel=True)
+
+        assert parallel_errors == serial_errors
+        assert serial_report.total_files_scanned == parallel_report.total_files_scanned == 21
+        assert serial_report.errors_by_category == parallel_report.errors_by_category
+        assert [error for error in serial_errors if error[2] == "SyntaxError"] == [(str(project / "broken.py"), 1, "SyntaxError")]
@@ -0,0 +1,497 @@
+"""
+ClaudeCodeRouterMCP 单元测试
+"""
+
+import asyncio
+import json
+from dataclasses import replace
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from core.components.claude_code_router_mcp import cache as cache_module
+from core.components.claude_code_router_mcp.cache import RouterCache
+from core.components.claude_code_router_mcp.config import RouterConfig
+from core.components.claude_code_router_mcp.load_balancer import LoadBalancer
+from core.components.claude_code_router_mcp.metrics import ModelMetricsStore
+from core.components.claude_code_router_mcp.models import ModelConfig, ModelProvider, RouterRequest
+from core.components.claude_code_router_mcp.rate_limiter import RateLimitExceeded
+from core.components.claude_code_router_mcp.router import ClaudeCodeRouterMCP
+from core.components.claude_code_router_mcp.semantic_cache import SemanticCache
+
+
+def make_request(model: str = "test-model", content: str = "hello", **kwargs) -> RouterRequest:
+    """创建测试请求"""
+    return RouterRequest(model=model, messages=[{"role": "user", "content": content}], **kwargs)
+
+
+@pytest_asyncio.fixture
+async def make_router(tmp_path, monkeypatch):
+    """创建使用临时配置目录的路由器"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    routers = []
+
+    def factory(**config) -> ClaudeCodeRouterMCP:
+        router = ClaudeCodeRouterMCP(RouterConfig(**config))
+        routers.append(router)
+        return router
+
+    yield factory
+
+    for router in routers:
+        await router.http_client.aclose()
+
+
+async def use_upstream(router, handler, endpoints: int = 2) -> ModelConfig:
+    """注册有多个端点的 test-model，上游请求交给 handler 处理"""
+    model_config = ModelConfig(
+        model_id="test-model",
+        provider=ModelProvider.OPENAI,
+        api_base="https://ep0.test",
+        api_key="key-0",
+        endpoints=[{"api_base": f"https://ep{i}.test", "api_key": f"key-{i}"} for i in range(1, endpoints)],
+        rate_limit_per_minute=10000
+    )
+    router.model_manager.models[model_config.model_id] = model_config
+    await router.http_client.aclose()
+    router.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return model_config
+
+
+def completion(content: str = "hi") -> dict:
+    """OpenAI格式的非流式响应"""
+    return {
+        "id": "chatcmpl-1",
+        "model": "test-model",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    }
+
+
+def sse_delta(content: str) -> bytes:
+    """OpenAI格式的SSE增量事件"""
+    return f"data: {json.dumps({'choices': [{'delta': {'content': content}}]})}\n\n".encode()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestRateLimit:
+    """速率限制测试"""
+
+    async def acquire_until_rejected(self, router, model_config, request, limit):
+        for _ in range(limit):
+            await router._check_rate_limit(model_config, request)
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            await router._check_rate_limit(model_config, request)
+        return excinfo.value
+
+    async def test_models_reach_their_own_limits(self, make_router):
+        """每个模型各自达到自己的限额，不受全局限额约束"""
+        router = make_router(rate_limit_max_wait=0)
+        base = router.model_manager.get_enabled_models()[0]
+        fast = replace(base, model_id="fast-model", rate_limit_per_minute=150)
+        slow = replace(base, model_id="slow-model", rate_limit_per_minute=120)
+        # 未配置客户端限额时，同一调用方的请求只按模型限流
+        request = make_request(user_id="dev")
+
+        fast_error = await self.acquire_until_rejected(router, fast, request, 150)
+        slow_error = await self.acquire_until_rejected(router, slow, request, 120)
+
+        assert (fast_error.scope, fast_error.key) == ("model", "fast-model")
+        assert (slow_error.scope, slow_error.key) == ("model", "slow-model")
+
+    async def test_client_limit_is_shared_across_models(self, make_router):
+        """配置客户端限额时，同一客户端在所有模型上共用一个令牌桶"""
+        router = make_router(rate_limit_max_wait=0, client_rate_limit_per_minute=3)
+        first, second = router.model_manager.get_enabled_models()[:2]
+
+        await router._check_rate_limit(first, make_request(user_id="alice"))
+        await router._check_rate_limit(second, make_request(user_id="alice"))
+        await router._check_rate_limit(first, make_request(user_id="alice"))
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            await router._check_rate_limit(second, make_request(user_id="alice"))
+
+        assert (excinfo.value.scope, excinfo.value.key) == ("client", "alice")
+        await router._check_rate_limit(first, make_request(user_id="bob"))
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestRouterCache:
+    """响应缓存测试"""
+
+    async def test_lru_eviction(self):
+        """超过条目数上限时驱逐最久未访问的条目"""
+        cache = RouterCache(max_size=2)
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        assert await cache.get("a") == "1"
+
+        await cache.set("c", "3")
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "1"
+        assert await cache.get("c") == "3"
+        assert cache.get_stats()["evictions"] == 1
+
+    async def test_ttl_expiration(self, monkeypatch):
+        """过期条目在读取时失效，并在写入时按过期时间清理"""
+        clock = FakeClock()
+        monkeypatch.setattr(cache_module, "time", clock)
+        cache = RouterCache(ttl=10, max_size=100)
+        await cache.set("short", "1", ttl=5)
+        await cache.set("long", "2")
+
+        clock.now += 6
+        assert await cache.get("short") is None
+        assert await cache.get("long") == "2"
+
+        clock.now += 5
+        await cache.set("other", "3")
+        assert len(cache.cache) == 1
+        assert cache.get_stats()["expirations"] == 2
+
+    async def test_byte_budget(self):
+        """按字节预算驱逐，超出预算的单个值不缓存"""
+        cache = RouterCache(max_size=100, max_bytes=10)
+        await cache.set("a", "xxxx")
+        await cache.set("b", "yyyy")
+        await cache.set("a", "zz")
+        assert cache.current_bytes == 6
+
+        await cache.set("c", "wwwww")
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "zz"
+        assert cache.current_bytes == 7
+        assert not await cache.set("big", "x" * 11)
+        assert await cache.get("big") is None
+
+    async def test_namespaces_are_isolated(self):
+        """不同命名空间的相同键互不影响，可以按命名空间清空"""
+        cache = RouterCache()
+        await cache.set("key", "gpt", namespace="gpt-4o")
+        await cache.set("key", "claude", namespace="claude")
+
+        assert await cache.clear_namespace("gpt-4o") == 1
+        assert await cache.get("key", namespace="gpt-4o") is None
+        assert await cache.get("key", namespace="claude") == "claude"
+        assert cache.get_stats()["namespaces"] == {"claude": 1}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestRequestCoalescing:
+    """相同进行中请求合并测试"""
+
+    async def test_identical_requests_share_one_upstream_call(self, make_router):
+        """N个相同的并发请求只发送一次上游请求"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=completion("shared"))
+
+        router = make_router(enable_cache=False)
+        await use_upstream(router, handler)
+
+        responses = await asyncio.gather(*(router.route_request(make_request()) for _ in range(5)))
+
+        assert len(calls) == 1
+        assert all(response.choices[0]["message"]["content"] == "shared" for response in responses)
+        assert sum(response.coalesced for response in responses) == 4
+        assert all(response.cost == 0.0 for response in responses if response.coalesced)
+        assert router.inflight_requests == {}
+
+    async def test_different_requests_are_not_merged(self, make_router):
+        """内容不同的请求各自发送"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=completion())
+
+        router = make_router(enable_cache=False)
+        await use_upstream(router, handler)
+
+        await asyncio.gather(router.route_request(make_request(content="a")),
+                             router.route_request(make_request(content="b")))
+
+        assert len(calls) == 2
+
+    async def test_failure_is_shared_by_waiters(self, make_router):
+        """上游失败时所有等待者都收到错误，之后的请求重新发送"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.05)
+            return httpx.Response(400, json={"error": "bad request"})
+
+        router = make_router(enable_cache=False)
+        await use_upstream(router, handler, endpoints=1)
+
+        results = await asyncio.gather(*(router.route_request(make_request()) for _ in range(3)),
+                                       return_exceptions=True)
+
+        assert len(calls) == 1
+        assert all(isinstance(result, httpx.HTTPStatusError) for result in results)
+        with pytest.raises(httpx.HTTPStatusError):
+            await router.route_request(make_request())
+        assert len(calls) == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestEndpointPool:
+    """端点池故障转移测试"""
+
+    async def test_failover_on_retryable_error(self, make_router):
+        """端点返回503时切换到池中的下一个端点"""
+        hosts = []
+
+        async def handler(request):
+            hosts.append(request.url.host)
+            if len(hosts) == 1:
+                return httpx.Response(503, text="overloaded")
+            return httpx.Response(200, json=completion("from backup"))
+
+        router = make_router(enable_cache=False)
+        model_config = await use_upstream(router, handler)
+
+        response = await router._send_with_failover(make_request(), model_config)
+
+        assert response.choices[0]["message"]["content"] == "from backup"
+        assert len(set(hosts)) == 2
+        stats = router.load_balancers["test-model"].endpoints
+        assert sorted(info.failed_requests for info in stats.values()) == [0, 1]
+
+    async def test_no_failover_on_client_error(self, make_router):
+        """4xx（429除外）是请求本身的问题，不切换端点"""
+        hosts = []
+
+        async def handler(request):
+            hosts.append(request.url.host)
+            return httpx.Response(400, json={"error": "bad request"})
+
+        router = make_router(enable_cache=False)
+        model_config = await use_upstream(router, handler)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await router._send_with_failover(make_request(), model_config)
+        assert len(hosts) == 1
+
+    async def test_health_check_probes_every_endpoint(self, make_router):
+        """健康检查探测池中每个端点，部分端点失败时模型保持启用"""
+        async def handler(request):
+            if request.url.host == "ep1.test":
+                return httpx.Response(500, text="down")
+            return httpx.Response(200, json=completion())
+
+        router = make_router()
+        router.model_manager.models.clear()
+        model_config = await use_upstream(router, handler)
+
+        await router._perform_health_checks()
+
+        health = router.health_status["test-model"]
+        assert health["status"] == "degraded"
+        assert (health["healthy_endpoints"], health["total_endpoints"]) == (1, 2)
+        assert not router.load_balancers["test-model"].endpoints["test-model#1"].is_healthy
+        assert model_config.enabled
+
+
+@pytest.mark.unit
+class TestLoadBalancer:
+    """负载均衡器测试"""
+
+    def test_unhealthy_endpoint_is_probed_after_cooldown(self):
+        """连续失败的端点被跳过，冷却期后半开试探，成功后恢复"""
+        balancer = LoadBalancer("round_robin")
+        balancer.add_endpoint("a")
+        balancer.add_endpoint("b")
+        for _ in range(3):
+            balancer.end_request("a", 0.1, False)
+        assert not balancer.endpoints["a"].is_healthy
+
+        assert {balancer.get_endpoint() for _ in range(4)} == {"b"}
+
+        balancer.endpoints["a"].last_request_time -= balancer.health_check_interval + 1
+        assert "a" in {balancer.get_endpoint() for _ in range(4)}
+
+        balancer.end_request("a", 0.1, True)
+        assert balancer.endpoints["a"].is_healthy
+
+    def test_all_unhealthy_falls_back_to_fewest_failures(self):
+        """全部端点不健康时选择连续失败最少的端点"""
+        balancer = LoadBalancer("round_robin")
+        balancer.add_endpoint("a")
+        balancer.add_endpoint("b")
+        for _ in range(5):
+            balancer.end_request("a", 0.1, False)
+        for _ in range(3):
+            balancer.end_request("b", 0.1, False)
+
+        assert balancer.get_endpoint() == "b"
+        assert balancer.get_endpoint(exclude={"b"}) == "a"
+        assert balancer.get_endpoint(exclude={"a", "b"}) is None
+
+
+def user_messages(content: str):
+    return [{"role": "user", "content": content}]
+
+
+LONG_PROMPT = (
+    "please explain step by step what the following python expression returns when the list "
+    "contains the first fifty positive integers in ascending order and nothing else {}"
+)
+
+
+@pytest.mark.unit
+class TestSemanticCache:
+    """语义缓存测试"""
+
+    def test_near_duplicate_hits(self):
+        """仅大小写和空白不同的请求命中"""
+        cache = SemanticCache(threshold=0.9)
+        cache.set("gpt", user_messages(LONG_PROMPT.format("x[1:20]")), "answer")
+
+        hit = cache.get("gpt", user_messages("  " + LONG_PROMPT.format("X[1:20]").upper()))
+
+        assert hit is not None
+        assert hit[0] == "answer"
+
+    @pytest.mark.parametrize("stored, queried", [
+        ("x[1:20]", "x[3:45]"),
+        ("between 10:30 and 11:45", "between 09:00 and 17:15"),
+        ("on 2024-01-15", "on 2025-06-30"),
+        ("for order 123e4567-e89b-12d3-a456-426614174000", "for order 9f1c2d3e-0000-4000-8000-00000000abcd"),
+    ])
+    def test_differing_numbers_miss(self, stored, queried):
+        """只有切片边界、时间、日期或ID不同的请求不命中"""
+        cache = SemanticCache(threshold=0.9)
+        cache.set("gpt", user_messages(LONG_PROMPT.format(stored)), "answer")
+
+        assert cache.get("gpt", user_messages(LONG_PROMPT.format(queried))) is None
+
+
+@pytest.mark.unit
+class TestModelMetricsStore:
+    """模型指标存储测试"""
+
+    def test_failed_write_keeps_dirty_metrics(self, tmp_path, monkeypatch):
+        """写盘失败时髒计数保留，下次写盘写入全部更新"""
+        store = ModelMetricsStore(metrics_path=str(tmp_path / "metrics.json"), flush_threshold=1000)
+        store.record("gpt-4o", 0.5, True)
+        store.record("gpt-4o", 0.7, False)
+
+        original_write = store._write_snapshot
+
+        def failing_write(snapshot):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(store, "_write_snapshot", failing_write)
+        with pytest.raises(OSError):
+            asyncio.run(store.flush())
+        assert store.dirty_count == 2
+
+        monkeypatch.setattr(store, "_write_snapshot", original_write)
+        assert asyncio.run(store.flush())
+        assert store.dirty_count == 0
+
+        saved = json.loads((tmp_path / "metrics.json").read_text())
+        assert saved["gpt-4o"]["total_requests"] == 2
+        assert saved["gpt-4o"]["failed_requests"] == 1
+
+    def test_flush_in_loops_other_than_construction(self, tmp_path):
+        """在导入时创建的存储可以在之后的事件循环中并发写盘"""
+        store = ModelMetricsStore(metrics_path=str(tmp_path / "metrics.json"), flush_threshold=2)
+
+        async def record_and_flush():
+            for _ in range(4):
+                store.record("gpt-4o", 0.1, True)
+            await asyncio.gather(store.flush(), store.flush(), store._pending_flush)
+
+        asyncio.run(record_and_flush())
+        asyncio.run(record_and_flush())
+
+        assert store.dirty_count == 0
+        assert json.loads((tmp_path / "metrics.json").read_text())["gpt-4o"]["total_requests"] == 8
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestStreaming:
+    """SSE流式路由测试"""
+
+    async def collect(self, router, request):
+        return [chunk async for chunk in router.route_stream_request(request)]
+
+    async def test_chunks_are_converted_in_order(self, make_router):
+        """上游增量按到达顺序转换为 chat.completion.chunk"""
+        async def handler(request):
+            body = sse_delta("Hel") + sse_delta("lo") + b"data: [DONE]\n\n"
+            return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+        router = make_router()
+        await use_upstream(router, handler, endpoints=1)
+
+        chunks = await self.collect(router, make_request(stream=True))
+
+        assert [chunk["choices"][0]["delta"].get("content") for chunk in chunks] == ["Hel", "lo", None]
+        assert chunks[0]["choices"][0]["delta"]["role"] == "assistant"
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+    async def test_failover_before_first_chunk(self, make_router):
+        """输出任何内容之前上游返回503时切换到下一个端点"""
+        hosts = []
+
+        async def handler(request):
+            hosts.append(request.url.host)
+            if len(hosts) == 1:
+                return httpx.Response(503, text="overloaded")
+            return httpx.Response(200, content=sse_delta("ok") + b"data: [DONE]\n\n")
+
+        router = make_router()
+        await use_upstream(router, handler)
+
+        chunks = await self.collect(router, make_request(stream=True))
+
+        assert len(set(hosts)) == 2
+        assert chunks[0]["choices"][0]["delta"]["content"] == "ok"
+
+    async def test_no_failover_after_first_chunk(self, make_router):
+        """已经向客户端输出内容后上游断开，不再切换端点重发"""
+        hosts = []
+
+        async def broken_stream():
+            yield sse_delta("partial")
+            raise httpx.ReadError("connection reset")
+
+        async def handler(request):
+            hosts.append(request.url.host)
+            return httpx.Response(200, content=broken_stream())
+
+        router = make_router()
+        await use_upstream(router, handler)
+
+        chunks = []
+        with pytest.raises(httpx.ReadError):
+            async for chunk in router.route_stream_request(make_request(stream=True)):
+                chunks.append(chunk)
+
+        assert len(hosts) == 1
+        assert [chunk["choices"][0]["delta"].get("content") for chunk in chunks] == ["partial"]
@@ -0,0 +1,117 @@
+"""
+ContextManager 单元测试
+"""
+
+import time
+
+import pytest
+import pytest_asyncio
+
+from core.components.memoryos_mcp.context_manager import (
+    ContextItem, ContextManager, ContextType, ContextWindow
+)
+
+
+CONTEXTS = [
+    (ContextType.TASK, "fix the flaky sqlite writer test"),
+    (ContextType.TASK, "profile the sqlite reader pool"),
+    (ContextType.CONVERSATION, "discuss sqlite writer batching strategy"),
+    (ContextType.PROJECT, "migrate the router cache to an LRU"),
+    (ContextType.CONVERSATION, "lunch plans for friday"),
+]
+
+
+@pytest_asyncio.fixture
+async def manager():
+    """包含若干上下文的上下文管理器"""
+    context_manager = ContextManager()
+    for context_type, content in CONTEXTS:
+        await context_manager.create_context(context_type, content)
+    return context_manager
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestContextRecommendations:
+    """上下文推荐测试"""
+
+    async def brute_force(self, manager, query, context_type=None, limit=5):
+        """对全部上下文逐个计分（倒排索引之前的做法）"""
+        scored = []
+        for context in manager.contexts.values():
+            if context_type and context.context_type != context_type:
+                continue
+            score = await manager._calculate_context_relevance(context, query)
+            if score > 0.1:
+                scored.append((score, context.id))
+        scored.sort(reverse=True)
+        return scored[:limit]
+
+    @pytest.mark.parametrize("query, context_type", [
+        ("sqlite writer", None),
+        ("sqlite", ContextType.CONVERSATION),
+        ("router cache lru", None),
+        ("unrelated words only", None),
+    ])
+    async def test_matches_full_scan(self, manager, query, context_type):
+        """倒排索引的推荐结果与全量计分一致"""
+        recommended = await manager.get_context_recommendations(query, context_type, limit=3)
+        expected = await self.brute_force(manager, query, context_type, 3)
+
+        assert {context.id for context in recommended} == {context_id for _, context_id in expected}
+        scores = [await manager._calculate_context_relevance(context, query) for context in recommended]
+        assert scores == sorted(scores, reverse=True)
+
+    async def test_best_overlap_first(self, manager):
+        """共享词越多排名越靠前"""
+        recommended = await manager.get_context_recommendations("sqlite writer test")
+
+        assert recommended[0].content == "fix the flaky sqlite writer test"
+        assert all("sqlite" in context.content for context in recommended)
+
+    async def test_cleanup_removes_index_entries(self, manager):
+        """清理旧上下文时同步移除倒排索引"""
+        for context in manager.contexts.values():
+            context.created_at = time.time() - 48 * 3600
+
+        await manager.cleanup_old_contexts(max_age_hours=24)
+
+        assert manager.contexts == {}
+        assert manager.term_index == {}
+        assert await manager.get_context_recommendations("sqlite") == []
+
+
+@pytest.mark.unit
+class TestContextWindow:
+    """上下文窗口测试"""
+
+    def make_item(self, item_id, content):
+        now = time.time()
+        return ContextItem(
+            id=item_id,
+            context_type=ContextType.CONVERSATION,
+            content=content,
+            metadata={},
+            created_at=now,
+            last_accessed=now,
+            relevance_score=1.0
+        )
+
+    def test_relevant_items_contain_all_terms(self):
+        """只返回包含查询中全部词的项目"""
+        window = ContextWindow(id="window", context_items=[], max_size=10)
+        window.add_item(self.make_item("a", "SQLite writer pool"))
+        window.add_item(self.make_item("b", "sqlite reader pool"))
+
+        assert [item.id for item in window.get_relevant_items("sqlite writer")] == ["a"]
+        assert [item.id for item in window.get_relevant_items("pool")] == ["a", "b"]
+        assert window.get_relevant_items("") == []
+
+    def test_evicted_items_drop_cached_terms(self):
+        """超过窗口大小时移除最旧项目及其词集合"""
+        window = ContextWindow(id="window", context_items=[], max_size=2)
+        for item_id in ("a", "b", "c"):
+            window.add_item(self.make_item(item_id, f"item {item_id}"))
+
+        assert [item.id for item in window.context_items] == ["b", "c"]
+        assert set(window.item_terms) == {"b", "c"}
@@ -0,0 +1,146 @@
+"""
+DataCollectionSystem 单元测试
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from core.data_collection_system import (
+    CollectionRule, DataCollectionSystem, DataPoint, DataPriority, DataType,
+    compile_rule_conditions
+)
+
+
+def make_point(index: int, priority: DataPriority) -> DataPoint:
+    """创建测试数据点"""
+    return DataPoint(
+        id=f"p{index}",
+        data_type=DataType.USER_INTERACTION,
+        priority=priority,
+        timestamp=float(index),
+        source="test",
+        data={},
+        metadata={}
+    )
+
+
+def make_system(tmp_path, lane_size: int = 10000) -> DataCollectionSystem:
+    """创建未启动后台任务的数据收集系统"""
+    system = DataCollectionSystem(db_path=str(tmp_path / "data_collection.db"))
+    system.data_lanes = {priority: asyncio.Queue(maxsize=lane_size) for priority in DataPriority}
+    system.enqueue_timeout = 0.05
+    return system
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestPriorityLanes:
+    """优先级队列测试"""
+
+    async def test_drain_in_priority_order(self, tmp_path):
+        """按优先级取出，同一优先级内保持写入顺序"""
+        system = make_system(tmp_path)
+        priorities = [DataPriority.LOW, DataPriority.NORMAL, DataPriority.CRITICAL,
+                      DataPriority.HIGH, DataPriority.LOW, DataPriority.CRITICAL]
+        for index, priority in enumerate(priorities):
+            assert await system._enqueue_data_point(make_point(index, priority))
+
+        first = system._drain_lanes(4)
+        rest = system._drain_lanes(10)
+
+        assert [point.id for point in first] == ["p2", "p5", "p3", "p1"]
+        assert [point.id for point in rest] == ["p0", "p4"]
+
+    async def test_full_low_lane_drops_immediately(self, tmp_path):
+        """低优先级队列满时直接丢弃，不占用其他队列"""
+        system = make_system(tmp_path, lane_size=2)
+        assert await system._enqueue_data_point(make_point(0, DataPriority.LOW))
+        assert await system._enqueue_data_point(make_point(1, DataPriority.LOW))
+
+        assert not await system._enqueue_data_point(make_point(2, DataPriority.LOW))
+        assert await system._enqueue_data_point(make_point(3, DataPriority.CRITICAL))
+        assert system.collection_stats["backpressure_waits"] == 0
+
+    async def test_full_critical_lane_waits_for_space(self, tmp_path):
+        """关键数据在队列满时等待处理腾出空间，超时才丢弃"""
+        system = make_system(tmp_path, lane_size=1)
+        system.enqueue_timeout = 1.0
+        assert await system._enqueue_data_point(make_point(0, DataPriority.CRITICAL))
+
+        async def consume():
+            await system._data_available.wait()
+            return system._drain_lanes(10)
+
+        consumer = asyncio.ensure_future(consume())
+        assert await system._enqueue_data_point(make_point(1, DataPriority.CRITICAL))
+
+        assert [point.id for point in await consumer] == ["p0"]
+        assert system.collection_stats["backpressure_waits"] == 1
+
+        system.enqueue_timeout = 0.05
+        assert not await system._enqueue_data_point(make_point(2, DataPriority.CRITICAL))
+
+
+def use_rules(system: DataCollectionSystem, *rules: CollectionRule):
+    """替换收集规则并重新编译"""
+    system.collection_rules = {rule.id: rule for rule in rules}
+    system._rebuild_rule_index()
+
+
+@pytest.mark.unit
+class TestCollectionRules:
+    """收集规则和采样测试"""
+
+    def test_hash_sampling_is_reproducible(self, tmp_path):
+        """采样由数据点ID决定：同一ID结果相同，整体比例接近采样率"""
+        system = make_system(tmp_path)
+        use_rules(system, CollectionRule("sampled", "sampled", DataType.USER_INTERACTION, {}, sampling_rate=0.3))
+        ids = [str(uuid.UUID(int=index)) for index in range(20000)]
+
+        decisions = [system._should_collect_data(DataType.USER_INTERACTION, {}, data_id) for data_id in ids]
+
+        assert decisions == [system._should_collect_data(DataType.USER_INTERACTION, {}, data_id) for data_id in ids]
+        assert 0.27 < sum(decisions) / len(ids) < 0.33
+
+    @pytest.mark.parametrize("sampling_rate, expected", [(0.0, False), (1.0, True)])
+    def test_sampling_bounds(self, tmp_path, sampling_rate, expected):
+        """采样率0从不收集，1总是收集"""
+        system = make_system(tmp_path)
+        use_rules(system, CollectionRule("r", "r", DataType.ERROR_EVENT, {}, sampling_rate=sampling_rate))
+
+        assert all(
+            system._should_collect_data(DataType.ERROR_EVENT, {}, str(uuid.uuid4())) is expected
+            for _ in range(200)
+        )
+
+    def test_rules_are_indexed_by_type(self, tmp_path):
+        """只评估对应数据类型的启用规则"""
+        system = make_system(tmp_path)
+        use_rules(
+            system,
+            CollectionRule("slow", "slow", DataType.CLAUDE_INTERACTION, {"min_response_time": 1.0}),
+            CollectionRule("off", "off", DataType.ERROR_EVENT, {}, enabled=False)
+        )
+
+        assert set(system.compiled_rules) == {DataType.CLAUDE_INTERACTION}
+        assert system._should_collect_data(DataType.CLAUDE_INTERACTION, {"response_time": 2.0}, "a")
+        assert not system._should_collect_data(DataType.CLAUDE_INTERACTION, {"response_time": 0.5}, "a")
+        assert not system._should_collect_data(DataType.ERROR_EVENT, {}, "a")
+
+    def test_compiled_conditions(self):
+        """编译后的条件与原来逐条判断的语义一致"""
+        predicate = compile_rule_conditions({
+            "min_response_time": 1.0,
+            "max_response_time": 5.0,
+            "severity": ["high", "critical"],
+            "unknown_condition": 42
+        })
+
+        assert predicate({"response_time": 2.0, "severity": "high"})
+        assert not predicate({"response_time": 6.0, "severity": "high"})
+        assert not predicate({"response_time": 2.0, "severity": "low"})
+        assert not predicate({"severity": "high"})
+        # 评估出错时默认收集
+        assert predicate({"response_time": "slow", "severity": "high"})
@@ -0,0 +1,78 @@
+"""
+MetricsCollector 单元测试
+"""
+
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from core.monitoring.intelligent_monitoring import MetricPoint, MetricsCollector
+
+
+def make_metric(name: str, value: float = 1.0) -> MetricPoint:
+    """创建测试指标"""
+    return MetricPoint(name=name, value=value, timestamp=datetime.now().isoformat())
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestCollectors:
+    """指标收集器调度测试"""
+
+    async def test_slow_collector_times_out_without_delaying_others(self):
+        """超时的收集器被计入超时，其他收集器按自己的间隔继续运行"""
+        collector = MetricsCollector()
+
+        async def slow():
+            await asyncio.sleep(1)
+            return [make_metric("slow")]
+
+        async def fast():
+            return [make_metric("fast")]
+
+        collector.register_collector("slow", slow, interval=0.05, timeout=0.02, jitter=0)
+        collector.register_collector("fast", fast, interval=0.02, jitter=0)
+
+        await collector.start_collection()
+        await asyncio.sleep(0.25)
+        collector.stop_collection()
+
+        stats = collector.get_collector_stats()
+        assert stats["slow"]["timeouts"] >= 2
+        assert stats["slow"]["timeouts"] == stats["slow"]["runs"]
+        assert stats["fast"]["runs"] >= 5
+        assert collector.get_recent_metrics("slow") == []
+        assert len(collector.get_recent_metrics("fast")) == stats["fast"]["runs"]
+
+    async def test_blocking_collector_runs_in_thread(self):
+        """同步收集器在线程池中执行，超时不阻塞事件循环"""
+        collector = MetricsCollector()
+        collector.register_collector("blocking", lambda: time.sleep(0.3), interval=1, timeout=0.05, jitter=0)
+
+        await collector.start_collection()
+        started = time.perf_counter()
+        await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - started
+        collector.stop_collection()
+
+        assert elapsed < 0.2
+        assert collector.get_collector_stats()["blocking"]["timeouts"] == 1
+
+    async def test_failures_are_counted(self):
+        """收集器抛出异常时计入失败，之后继续调度"""
+        collector = MetricsCollector()
+
+        async def broken():
+            raise RuntimeError("sensor unavailable")
+
+        collector.register_collector("broken", broken, interval=0.02, jitter=0)
+
+        await collector.start_collection()
+        await asyncio.sleep(0.1)
+        collector.stop_collection()
+
+        stats = collector.get_collector_stats()["broken"]
+        assert stats["failures"] >= 2
+        assert stats["failures"] == stats["runs"]
@@ -0,0 +1,400 @@
+"""
+MemoryOSEngine 单元测试
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from core.components.memoryos_mcp.memory_engine import (
+    MemoryOSEngine, Memory, MemoryType, SCHEMA_VERSION
+)
+from core.components.memoryos_mcp.vector_index import HashingEmbedder, MemoryVectorIndex
+
+
+def make_memory(memory_id: str, content: str, **kwargs) -> Memory:
+    """创建测试记忆"""
+    now = time.time()
+    values = {
+        "id": memory_id,
+        "memory_type": MemoryType.SEMANTIC,
+        "content": content,
+        "metadata": {},
+        "created_at": now,
+        "accessed_at": now,
+        "access_count": 0,
+        "importance_score": 0.0,
+        "tags": []
+    }
+    values.update(kwargs)
+    return Memory(**values)
+
+
+def create_legacy_database(db_path, memories):
+    """创建旧版（未迁移）数据库，嵌入为128维float64随机向量"""
+    connection = sqlite3.connect(str(db_path))
+    connection.execute("""
+        CREATE TABLE memories (
+            id TEXT PRIMARY KEY,
+            memory_type TEXT NOT NULL,
+            content TEXT NOT NULL,
+            metadata TEXT,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            access_count INTEGER DEFAULT 0,
+            importance_score REAL DEFAULT 0.0,
+            tags TEXT,
+            embedding BLOB
+        )
+    """)
+    connection.execute("CREATE INDEX idx_tags ON memories(tags)")
+    now = time.time()
+    for memory_id, content in memories:
+        legacy_embedding = np.random.random(128)
+        connection.execute(
+            "INSERT INTO memories VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (memory_id, MemoryType.SEMANTIC.value, content, "{}", now, now, 0, 0.5, "[]",
+             (legacy_embedding / np.linalg.norm(legacy_embedding)).tobytes())
+        )
+    connection.commit()
+    connection.close()
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    """初始化的记忆引擎"""
+    memory_engine = MemoryOSEngine(db_path=str(tmp_path / "memoryos.db"), max_memories=1000)
+    await memory_engine.initialize()
+    yield memory_engine
+    await memory_engine.cleanup()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestEmbeddingRoundTrip:
+    """嵌入向量存储和迁移测试"""
+
+    async def test_store_and_retrieve_embedding(self, engine):
+        """存储的嵌入以float32原样读回"""
+        memory = make_memory("m1", "python asyncio sqlite batching")
+        assert await engine.store_memory(memory)
+
+        retrieved = await engine.retrieve_memory("m1")
+
+        assert retrieved.embedding.dtype == np.float32
+        assert retrieved.embedding.shape == (engine.embedder.dim,)
+        np.testing.assert_allclose(retrieved.embedding, engine.embedder.embed(memory.content))
+
+    async def test_foreign_embedding_is_regenerated(self, engine):
+        """维度不符的嵌入按内容重新生成"""
+        legacy = np.random.random(128)
+        memory = make_memory("m1", "vector index memory mapped", embedding=legacy)
+        assert await engine.store_memory(memory)
+
+        retrieved = await engine.retrieve_memory("m1")
+        np.testing.assert_allclose(retrieved.embedding, engine.embedder.embed(memory.content))
+
+    async def test_legacy_database_is_reembedded(self, tmp_path):
+        """迁移旧数据库时重写全部嵌入，重新存储后相似度仍然有效"""
+        db_path = tmp_path / "legacy.db"
+        contents = [(f"m{i}", f"legacy memory number {i} about topic {i % 3}") for i in range(20)]
+        create_legacy_database(db_path, contents)
+
+        memory_engine = MemoryOSEngine(db_path=str(db_path))
+        await memory_engine.initialize()
+        try:
+            # 与 MemoryOptimizer 一样读取后重新存储
+            for memory_id, _ in contents:
+                memory = await memory_engine.retrieve_memory(memory_id)
+                assert memory.embedding.dtype == np.float32
+                assert await memory_engine.store_memory(memory)
+
+            query = memory_engine.embedder.embed(contents[0][1])
+            hits = memory_engine.vector_index.search(query, 5)
+
+            assert hits[0][0] == "m0"
+            assert all(np.isfinite(score) and -1.0001 <= score <= 1.0001 for _, score in hits)
+        finally:
+            await memory_engine.cleanup()
+
+        connection = sqlite3.connect(str(db_path))
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        blobs = connection.execute("SELECT content, embedding FROM memories").fetchall()
+        connection.close()
+        for content, blob in blobs:
+            np.testing.assert_allclose(
+                np.frombuffer(blob, dtype=np.float32), memory_engine.embedder.embed(content)
+            )
+
+
+SEARCH_CORPUS = [
+    ("s1", "Python asyncio event loop tuning", ["python", "async"]),
+    ("s2", "Rust ownership and borrowing rules", ["rust"]),
+    ("s3", "Tuning the SQLite page cache for python services", ["python", "sqlite"]),
+    ("s4", "用户偏好：深色主题和紧凑布局", ["ui"]),
+    ("s5", "FTS5 trigram tokenizer handles substrings like asyncio", ["sqlite"]),
+    ("s6", "Go channels vs asyncio queues", ["go", "async"]),
+]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestSearch:
+    """全文搜索测试"""
+
+    @pytest_asyncio.fixture
+    async def search_engine(self, engine):
+        for memory_id, content, tags in SEARCH_CORPUS:
+            assert await engine.store_memory(make_memory(memory_id, content, tags=tags))
+        return engine
+
+    async def search_ids(self, engine, query="", **kwargs):
+        memories = await engine.search_memories(query, limit=100, record_access=False, **kwargs)
+        return {memory.id for memory in memories}
+
+    @pytest.mark.parametrize("query", ["asyncio", "ASYNCIO", "uning", "sqlite", "深色主题", "ch"])
+    async def test_single_term_matches_substring_search(self, search_engine, query):
+        """单个词的结果与原来的 LIKE 子串匹配一致（不区分大小写，含中文和短词）"""
+        if not search_engine.fts_trigram:
+            pytest.skip("SQLite不支持trigram分词")
+
+        expected = {memory_id for memory_id, content, _ in SEARCH_CORPUS if query.lower() in content.lower()}
+
+        assert await self.search_ids(search_engine, query) == expected
+
+    async def test_all_terms_must_match(self, search_engine):
+        """多个词之间为AND关系，不要求相邻"""
+        assert await self.search_ids(search_engine, "python tuning") == {"s1", "s3"}
+        assert await self.search_ids(search_engine, "asyncio Go") == {"s6"}
+
+    async def test_filters_combine_with_query(self, search_engine):
+        """标签精确匹配，并与类型、全文条件同时生效"""
+        assert await self.search_ids(search_engine, tags=["python"]) == {"s1", "s3"}
+        assert await self.search_ids(search_engine, tags=["py"]) == set()
+        assert await self.search_ids(search_engine, "asyncio", tags=["async"]) == {"s1", "s6"}
+        assert await self.search_ids(search_engine, "asyncio", memory_type=MemoryType.EPISODIC) == set()
+
+    async def test_index_follows_updates_and_deletes(self, search_engine):
+        """重新存储和删除记忆后全文索引同步更新"""
+        assert await search_engine.store_memory(make_memory("s2", "Rust async runtimes", tags=["rust"]))
+        await search_engine.store.execute("DELETE FROM memories WHERE id = ?", ("s6",))
+
+        assert await self.search_ids(search_engine, "borrowing") == set()
+        assert await self.search_ids(search_engine, "runtimes") == {"s2"}
+        assert await self.search_ids(search_engine, "channels") == set()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestAccessCounting:
+    """访问统计测试"""
+
+    async def fetch_access_count(self, engine, memory_id):
+        await engine.flush_access_updates()
+        row = await engine.store.fetchone("SELECT access_count FROM memories WHERE id = ?", (memory_id,))
+        return row[0]
+
+    async def test_reads_are_counted_once(self, engine):
+        """多次读取各计数一次"""
+        assert await engine.store_memory(make_memory("m1", "access counting"))
+
+        await engine.retrieve_memory("m1")
+        await engine.retrieve_memory("m1")
+
+        assert await self.fetch_access_count(engine, "m1") == 2
+
+    async def test_restore_before_flush_counts_once(self, engine):
+        """读取后在写入访问统计前重新存储，不重复计数"""
+        assert await engine.store_memory(make_memory("m1", "access counting"))
+
+        memory = await engine.retrieve_memory("m1")
+        assert memory.access_count == 1
+        assert await engine.store_memory(memory)
+
+        assert await self.fetch_access_count(engine, "m1") == 1
+
+    async def test_restore_after_repeated_reads_keeps_all_hits(self, engine):
+        """多次从数据库读取后重新存储，缓冲中的访问统计不丢失"""
+        assert await engine.store_memory(make_memory("m1", "access counting"))
+
+        await engine.search_memories(limit=10)
+        memories = await engine.search_memories(limit=10)
+        assert memories[0].access_count == 2
+        assert await engine.store_memory(memories[0])
+
+        assert await self.fetch_access_count(engine, "m1") == 2
+
+    async def test_maintenance_reads_are_not_counted(self, engine):
+        """维护任务的批量读取不计入访问统计"""
+        assert await engine.store_memory(make_memory("m1", "access counting"))
+        await engine.retrieve_memory("m1")
+
+        memories = await engine.search_memories(limit=10, record_access=False)
+
+        assert memories[0].access_count == 1
+        assert await self.fetch_access_count(engine, "m1") == 1
+
+    async def test_other_pending_hits_survive_batch(self, engine):
+        """批次中未重新存储的记忆，其访问统计照常写入"""
+        assert await engine.store_memory(make_memory("m1", "first memory"))
+        assert await engine.store_memory(make_memory("m2", "second memory"))
+
+        await engine.retrieve_memory("m2")
+        assert await engine.store_memory(make_memory("m3", "third memory"))
+
+        assert await self.fetch_access_count(engine, "m2") == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestWriterFailure:
+    """写入任务失败测试"""
+
+    async def test_index_failure_does_not_stop_writer(self, engine, monkeypatch):
+        """提交后更新向量索引失败时，本批次返回失败，之后的写入正常完成"""
+        original_add = engine.vector_index.add
+
+        def failing_add(*args):
+            raise ValueError("bad embedding")
+
+        monkeypatch.setattr(engine.vector_index, "add", failing_add)
+        assert not await asyncio.wait_for(engine.store_memory(make_memory("m1", "first")), 5)
+
+        monkeypatch.setattr(engine.vector_index, "add", original_add)
+        assert await asyncio.wait_for(engine.store_memory(make_memory("m2", "second")), 5)
+        assert await engine.retrieve_memory("m2") is not None
+
+    async def test_sqlite_failure_does_not_stop_writer(self, engine, monkeypatch):
+        """写事务失败时，本批次返回失败，之后的写入正常完成"""
+        original_write_batch = engine._write_batch
+
+        def failing_write_batch(*args):
+            raise sqlite3.OperationalError("database is locked")
+
+        monkeypatch.setattr(engine, "_write_batch", failing_write_batch)
+        assert not await asyncio.wait_for(engine.store_memory(make_memory("m1", "first")), 5)
+        assert await engine.retrieve_memory("m1") is None
+
+        monkeypatch.setattr(engine, "_write_batch", original_write_batch)
+        assert await asyncio.wait_for(engine.store_memory(make_memory("m2", "second")), 5)
+        assert await engine.retrieve_memory("m2") is not None
+
+    async def test_sqlite_failure_keeps_pending_access(self, engine, monkeypatch):
+        """写事务失败时，随批次取出的访问统计放回缓冲，之后照常写入"""
+        assert await engine.store_memory(make_memory("m1", "first"))
+        await engine.retrieve_memory("m1")
+        original_write_batch = engine._write_batch
+
+        def failing_write_batch(*args):
+            raise sqlite3.OperationalError("database is locked")
+
+        monkeypatch.setattr(engine, "_write_batch", failing_write_batch)
+        assert not await asyncio.wait_for(engine.store_memory(make_memory("m2", "second")), 5)
+        await engine.retrieve_memory("m1")
+
+        monkeypatch.setattr(engine, "_write_batch", original_write_batch)
+        assert await asyncio.wait_for(engine.store_memory(make_memory("m3", "third")), 5)
+        await engine.flush_access_updates()
+
+        row = await engine.store.fetchone("SELECT access_count FROM memories WHERE id = ?", ("m1",))
+        assert row[0] == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestEviction:
+    """容量淘汰测试"""
+
+    async def count_rows(self, engine):
+        return (await engine.store.fetchone("SELECT COUNT(*) FROM memories"))[0]
+
+    async def test_small_capacity_keeps_most_memories(self, tmp_path):
+        """容量较小时额外淘汰量按容量缩小，不会清空数据库"""
+        memory_engine = MemoryOSEngine(db_path=str(tmp_path / "small.db"), max_memories=50)
+        await memory_engine.initialize()
+        try:
+            for i in range(51):
+                assert await memory_engine.store_memory(make_memory(f"m{i}", f"memory {i}"))
+
+            count = await self.count_rows(memory_engine)
+            assert 45 <= count <= 50
+            assert memory_engine.memory_count == count
+        finally:
+            await memory_engine.cleanup()
+
+    async def test_eviction_removes_least_important(self, tmp_path):
+        """淘汰重要性最低的记忆，并同步向量索引"""
+        memory_engine = MemoryOSEngine(db_path=str(tmp_path / "evict.db"), max_memories=20)
+        await memory_engine.initialize()
+        try:
+            await memory_engine.store_memory(
+                make_memory("important", "important memory", importance_score=10.0)
+            )
+            for i in range(30):
+                await memory_engine.store_memory(make_memory(f"m{i}", f"memory {i}"), wait=False)
+            await memory_engine.write_queue.join()
+
+            count = await self.count_rows(memory_engine)
+            assert count <= 20
+            assert len(memory_engine.vector_index) == count
+            assert await memory_engine.retrieve_memory("important") is not None
+        finally:
+            await memory_engine.cleanup()
+
+    async def test_manage_memory_capacity(self, engine):
+        """显式容量管理按实际行数校正计数"""
+        for i in range(30):
+            await engine.store_memory(make_memory(f"m{i}", f"memory {i}"), wait=False)
+
+        engine.max_memories = 10
+        await engine._manage_memory_capacity()
+
+        count = await self.count_rows(engine)
+        assert count <= 10
+        assert engine.memory_count == count
+
+
+@pytest.mark.unit
+class TestVectorIndex:
+    """向量索引测试"""
+
+    def test_repeated_updates_are_compacted(self, tmp_path):
+        """反复更新同一记忆时压缩日志，重新载入后仍是最新向量"""
+        embedder = HashingEmbedder()
+        index = MemoryVectorIndex(tmp_path / "vectors")
+        index.load()
+        index.add("other", "semantic", embedder.embed("unrelated memory"))
+        for i in range(3000):
+            index.add("m1", "semantic", embedder.embed(f"version {i}"))
+        index.close()
+
+        with open(index.log_path, encoding="utf-8") as f:
+            assert len(f.readlines()) <= 1024
+
+        reloaded = MemoryVectorIndex(tmp_path / "vectors")
+        assert reloaded.load()
+        try:
+            assert len(reloaded) == 2
+            hits = reloaded.search(embedder.embed("version 2999"), 1)
+            assert hits[0][0] == "m1"
+            assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+        finally:
+            reloaded.close()
+
+    def test_tombstones_are_compacted(self, tmp_path):
+        """删除过半记忆时压缩矩阵行"""
+        embedder = HashingEmbedder()
+        index = MemoryVectorIndex(tmp_path / "vectors")
+        index.load()
+        for i in range(2000):
+            index.add(f"m{i}", "semantic", embedder.embed(f"memory {i}"))
+        index.remove(f"m{i}" for i in range(1500))
+
+        assert len(index) == 500
+        assert index.size == 500
+        assert index.search(embedder.embed("memory 1999"), 1)[0][0] == "m1999"
+        index.close()
@@ -0,0 +1,60 @@
+"""
+MemoryOptimizer 单元测试
+"""
+
+import time
+
+import pytest
+import pytest_asyncio
+
+from core.components.memoryos_mcp.memory_engine import MemoryOSEngine, Memory, MemoryType
+from core.components.memoryos_mcp.memory_optimizer import MemoryOptimizer
+
+
+def make_memory(memory_id: str, content: str, importance_score: float) -> Memory:
+    """创建测试记忆"""
+    now = time.time()
+    return Memory(
+        id=memory_id,
+        memory_type=MemoryType.SEMANTIC,
+        content=content,
+        metadata={},
+        created_at=now,
+        accessed_at=now,
+        access_count=0,
+        importance_score=importance_score,
+        tags=[]
+    )
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    """初始化的记忆引擎"""
+    memory_engine = MemoryOSEngine(db_path=str(tmp_path / "memoryos.db"))
+    await memory_engine.initialize()
+    yield memory_engine
+    await memory_engine.cleanup()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestMemoryCompression:
+    """记忆压缩测试"""
+
+    async def test_compression_does_not_record_access(self, engine):
+        """压缩扫描不增加访问计数，主记忆合并组内原有的计数"""
+        content = "deploy the service with blue green rollout and health checks"
+        assert await engine.store_memory(make_memory("main", content, importance_score=0.9))
+        assert await engine.store_memory(make_memory("duplicate", content, importance_score=0.1))
+        assert await engine.store_memory(make_memory("other", "unrelated note about lunch", importance_score=0.5))
+        await engine.retrieve_memory("duplicate")
+
+        optimizer = MemoryOptimizer(engine, None)
+        await optimizer._optimize_memory_compression()
+        await engine.flush_access_updates()
+
+        rows = dict(await engine.store.fetchall("SELECT id, access_count FROM memories"))
+        assert rows["main"] == 1
+        assert rows["other"] == 0
+        main = await engine.store.fetchone("SELECT metadata FROM memories WHERE id = 'main'")
+        assert "duplicate" in main[0]
@@ -0,0 +1,271 @@
+"""
+ProjectAnalyzerMCP 单元测试
+"""
+
+import os
+
+import pytest
+
+import networkx as nx
+
+from core.components.project_analyzer_mcp.project_analyzer import (
+    CodeParsingEngine, DependencyAnalyzer, ProjectAnalyzerMCP
+)
+
+
+def write_file(path, content):
+    """写入文件并推进mtime，保证修改可被检测到"""
+    path.write_text(content)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """包含三个模块的小项目，工作目录为其父目录"""
+    project_path = tmp_path / "proj"
+    project_path.mkdir()
+    write_file(project_path / "a.py", "import os\n\ndef f():\n    return 1\n")
+    write_file(project_path / "b.py", "from a import f\n")
+    write_file(project_path / "c.py", "def h():\n    return 3\n")
+    monkeypatch.chdir(tmp_path)
+    return project_path
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    """使用临时摘要缓存的分析器"""
+    return ProjectAnalyzerMCP(cache_path=str(tmp_path / "cache.db"))
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestAnalysisCache:
+    """分析结果缓存测试"""
+
+    async def test_path_spellings_share_cache(self, project, analyzer, tmp_path):
+        """同一项目的不同路径写法不会返回过期结果"""
+        await analyzer.analyze_project(str(project))
+        await analyzer.analyze_project("proj")
+
+        write_file(project / "a.py", "import os\n\ndef f():\n    return 1\n\ndef g():\n    return 2\n")
+        absolute = await analyzer.analyze_project(str(project))
+        relative = await analyzer.analyze_project("proj")
+
+        fresh = await ProjectAnalyzerMCP(cache_path=str(tmp_path / "fresh.db")).analyze_project("proj")
+
+        assert relative is absolute
+        assert relative.metrics.lines_of_code == fresh.metrics.lines_of_code
+        assert len(analyzer.analysis_cache) == 1
+
+    async def test_failed_run_does_not_hide_changes(self, project, analyzer, monkeypatch):
+        """解析后中途失败的分析不会让下一次分析漏掉文件变化"""
+        first = await analyzer.analyze_project("proj")
+        assert {d.target for d in first.dependencies} == {"a"}
+
+        write_file(project / "b.py", "from c import h\n")
+
+        original = analyzer._analyze_components
+
+        async def failing_analyze_components(*args):
+            raise RuntimeError("analysis interrupted")
+
+        monkeypatch.setattr(analyzer, "_analyze_components", failing_analyze_components)
+        with pytest.raises(RuntimeError):
+            await analyzer.analyze_project("proj")
+
+        monkeypatch.setattr(analyzer, "_analyze_components", original)
+        second = await analyzer.analyze_project("proj")
+
+        assert second is not first
+        assert {d.target for d in second.dependencies} == {"c"}
+
+
+def write_tree(root, files):
+    """按 相对路径 -> 内容 写入项目文件"""
+    for relative_path, content in files.items():
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_file(path, content)
+    return root
+
+
+def assert_is_cycle(graph, cycle):
+    """cycle 中相邻文件（含首尾）之间都有依赖边"""
+    assert len(set(cycle)) == len(cycle)
+    for source, target in zip(cycle, cycle[1:] + cycle[:1]):
+        assert graph.has_edge(source, target)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestDependencyAnalyzer:
+    """依赖分析测试"""
+
+    @pytest.mark.parametrize("a_source, b_source", [
+        ("from pkg.b import g\n", "from pkg import a\n"),
+        ("from .b import g\n", "from . import a\n"),
+    ])
+    async def test_package_cycle_detected(self, tmp_path, a_source, b_source):
+        """绝对导入和相对导入写成的循环依赖都被发现"""
+        project_path = write_tree(tmp_path, {
+            "pkg/__init__.py": "",
+            "pkg/a.py": a_source + "def f():\n    return 1\n",
+            "pkg/b.py": b_source + "def g():\n    return 2\n",
+        })
+        analyzer = DependencyAnalyzer()
+
+        dependencies = await analyzer.analyze_dependencies(project_path)
+
+        assert analyzer.find_circular_components() == [{"pkg/a.py", "pkg/b.py"}]
+        assert all(dependency.is_circular for dependency in dependencies)
+
+    async def test_parent_relative_import_resolves(self, tmp_path):
+        """from ..x import y 按上级包解析"""
+        project_path = write_tree(tmp_path, {
+            "pkg/__init__.py": "",
+            "pkg/util.py": "def helper():\n    return 1\n",
+            "pkg/sub/__init__.py": "from .mod import run\n",
+            "pkg/sub/mod.py": "from ..util import helper\n\ndef run():\n    return helper()\n",
+        })
+        analyzer = DependencyAnalyzer()
+
+        await analyzer.analyze_dependencies(project_path)
+
+        assert analyzer.dependency_graph.has_edge("pkg/sub/mod.py", "pkg/util.py")
+        assert analyzer.dependency_graph.has_edge("pkg/sub/__init__.py", "pkg/sub/mod.py")
+        assert analyzer.find_circular_components() == []
+
+
+@pytest.mark.unit
+class TestCycleDetection:
+    """强连通分量和代表性循环测试"""
+
+    def make_analyzer(self, edges):
+        analyzer = DependencyAnalyzer()
+        analyzer.dependency_graph = nx.DiGraph(edges)
+        return analyzer
+
+    def test_components_sorted_by_size(self):
+        """只返回包含两个及以上文件的分量，按大小降序"""
+        analyzer = self.make_analyzer([
+            ("a", "b"), ("b", "a"),
+            ("c", "d"), ("d", "e"), ("e", "c"),
+            ("e", "a"), ("f", "c"), ("g", "g")
+        ])
+
+        assert analyzer.find_circular_components() == [{"c", "d", "e"}, {"a", "b"}]
+
+    def test_representative_cycles_cover_component(self):
+        """代表性循环都是真实循环，覆盖分量内全部文件且不超过上限"""
+        # 两个共享 hub 的三角形，外加一个长循环
+        edges = [
+            ("hub", "a1"), ("a1", "a2"), ("a2", "hub"),
+            ("hub", "b1"), ("b1", "b2"), ("b2", "hub"),
+            ("a2", "c1"), ("c1", "c2"), ("c2", "c3"), ("c3", "a1"),
+        ]
+        analyzer = self.make_analyzer(edges)
+        component = analyzer.find_circular_components()[0]
+
+        cycles = analyzer._representative_cycles(component, limit=10)
+
+        for cycle in cycles:
+            assert_is_cycle(analyzer.dependency_graph, cycle)
+        assert set().union(*cycles) == component
+        assert ["a1", "a2", "hub"] in cycles
+        assert len(analyzer._representative_cycles(component, limit=2)) == 2
+
+    def test_large_ring_is_one_component(self):
+        """长环只产生一个分量和一个覆盖全部文件的循环"""
+        nodes = [f"m{i:04d}" for i in range(2000)]
+        analyzer = self.make_analyzer(zip(nodes, nodes[1:] + nodes[:1]))
+
+        components = analyzer.find_circular_components()
+        cycles = analyzer._representative_cycles(components[0], limit=5)
+
+        assert len(components) == 1
+        assert len(cycles) == 1 and len(cycles[0]) == 2000
+        assert_is_cycle(analyzer.dependency_graph, cycles[0])
+
+
+PIPELINE_FILES = {
+    "app.py": (
+        "from flask import Flask\n"
+        "from services.users import load_user\n\n"
+        "app = Flask(__name__)\n\n"
+        "@app.route('/users', methods=['GET', 'POST'])\n"
+        "def users():\n"
+        "    return load_user()\n"
+    ),
+    "services/__init__.py": "",
+    "services/users.py": (
+        "from . import store\n\n"
+        "class UserService:\n"
+        "    def get(self, user_id):\n"
+        "        if user_id:\n"
+        "            return store.fetch(user_id)\n\n"
+        "def load_user():\n"
+        "    return UserService().get(1)\n"
+    ),
+    "services/store.py": "def fetch(user_id):\n    return {'id': user_id}\n",
+    "broken.py": "def broken(:\n    pass\n",
+}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestParsePipeline:
+    """共享解析阶段测试"""
+
+    async def test_each_file_parsed_once(self, tmp_path, monkeypatch):
+        """组件、API端点、依赖和指标都来自同一份摘要，每个文件只解析一次"""
+        project = write_tree(tmp_path / "proj", PIPELINE_FILES)
+        monkeypatch.chdir(tmp_path)
+        analyzer = ProjectAnalyzerMCP(cache_path=str(tmp_path / "cache.db"))
+        analyzer.parallel_threshold = 10 ** 6
+
+        parsed = []
+        original = CodeParsingEngine.summarize_source
+
+        def counting_summarize_source(self, content):
+            parsed.append(content)
+            return original(self, content)
+
+        monkeypatch.setattr(CodeParsingEngine, "summarize_source", counting_summarize_source)
+        architecture = await analyzer.analyze_project(str(project))
+
+        assert len(parsed) == len(PIPELINE_FILES)
+        assert [(e.path, e.method, e.handler_function) for e in architecture.api_endpoints] == [("/users", "GET", "users")]
+        assert {(d.source, d.target) for d in architecture.dependencies} == {
+            ("app.py", "services.users"), (os.path.join("services", "users.py"), "services")
+        }
+        assert architecture.metrics.lines_of_code == sum(
+            len(content.split("\n")) for content in PIPELINE_FILES.values() if "broken" not in content
+        )
+
+    async def test_summary_separates_methods_from_functions(self):
+        """类方法只出现在类摘要中，不重复计入模块函数"""
+        summary = CodeParsingEngine().summarize_source(PIPELINE_FILES["services/users.py"])
+
+        assert [function["name"] for function in summary["functions"]] == ["load_user"]
+        assert [method["name"] for method in summary["classes"][0]["methods"]] == ["get"]
+
+    async def test_process_pool_matches_serial_parse(self, tmp_path):
+        """进程池解析与串行解析得到相同摘要，语法错误的文件得到空摘要"""
+        files = dict(PIPELINE_FILES)
+        for index in range(20):
+            files[f"pkg/module_{index}.py"] = f"import os\n\ndef f{index}(x):\n    return x + {index}\n"
+        project = write_tree(tmp_path / "proj", files)
+
+        serial = ProjectAnalyzerMCP(cache_path=str(tmp_path / "serial.db"))
+        serial.parallel_threshold = 10 ** 6
+        parallel = ProjectAnalyzerMCP(cache_path=str(tmp_path / "parallel.db"))
+        parallel.max_workers = 2
+        parallel.parallel_threshold = 1
+
+        serial_summaries, _ = await serial._parse_project(project)
+        parallel_summaries, _ = await parallel._parse_project(project)
+
+        assert parallel_summaries == serial_summaries
+        assert list(serial_summaries) == sorted(serial_summaries)
+        assert serial_summaries["broken.py"] == {}
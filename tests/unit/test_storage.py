@@ -0,0 +1,107 @@
+"""
+SQLiteStore 连接池单元测试
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+import pytest_asyncio
+
+from core.components.memoryos_mcp.storage import open_store
+
+
+@pytest_asyncio.fixture
+async def store(tmp_path):
+    """打开一个带 items 表的连接池"""
+    store = await open_store(str(tmp_path / "store.db"))
+    await store.executescript("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)")
+    yield store
+    await store.close()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestSQLiteStore:
+    """读写连接池"""
+
+    async def test_write_then_read(self, store):
+        """写入提交后读连接可见"""
+        await store.executemany("INSERT INTO items (value) VALUES (?)", [("a",), ("b",)])
+
+        rows = await store.fetchall("SELECT value FROM items ORDER BY id")
+
+        assert rows == [("a",), ("b",)]
+        assert store.get_stats()["writes"] == 2
+
+    async def test_readers_are_read_only(self, store):
+        """读连接拒绝写入"""
+        with pytest.raises(sqlite3.OperationalError):
+            await store.read(lambda connection: connection.execute("INSERT INTO items (value) VALUES ('x')"))
+
+    async def test_read_not_blocked_by_write_transaction(self, store):
+        """WAL模式下长写事务期间读取仍可完成，且只看到已提交的数据"""
+        await store.execute("INSERT INTO items (value) VALUES ('committed')")
+
+        def slow_write(connection):
+            connection.execute("INSERT INTO items (value) VALUES ('pending')")
+            time.sleep(0.5)
+
+        write_task = asyncio.ensure_future(store.write(slow_write))
+        await asyncio.sleep(0.1)
+
+        started = time.perf_counter()
+        rows = await store.fetchall("SELECT value FROM items")
+        elapsed = time.perf_counter() - started
+        await write_task
+
+        assert rows == [("committed",)]
+        assert elapsed < 0.3
+
+    async def test_function_registered_on_readers(self, store):
+        """注册的SQL函数对之后打开的读连接同样生效"""
+        store.create_function("double", 1, lambda value: value * 2)
+
+        row = await store.fetchone("SELECT double(21)")
+
+        assert row == (42,)
+
+    async def test_shared_by_path_and_reference_counted(self, tmp_path):
+        """同一路径共享连接池，最后一个使用者释放时才关闭"""
+        db_path = str(tmp_path / "shared.db")
+        store = await open_store(db_path)
+        other = await open_store(db_path)
+        assert other is store
+        assert store.get_stats()["references"] == 2
+
+        await other.close()
+        assert await store.fetchone("SELECT 1") == (1,)
+
+        await store.close()
+        assert store.writer is None
+        reopened = await open_store(db_path)
+        assert reopened is not store
+        await reopened.close()
+
+    async def test_close_does_not_block_event_loop(self, tmp_path):
+        """关闭时等待进行中的读取不阻塞事件循环"""
+        store = await open_store(str(tmp_path / "close.db"))
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        read_task = asyncio.ensure_future(store.read(lambda connection: time.sleep(0.3)))
+        await asyncio.sleep(0.05)
+        ticker_task = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0)
+
+        await store.close()
+        ticker_task.cancel()
+        await read_task
+
+        assert len(ticks) >= 5
+        assert store.writer is None
@@ -0,0 +1,60 @@
+"""
+RingBuffer / TimeSeriesStore 单元测试
+"""
+
+import numpy as np
+import pytest
+
+from core.monitoring.timeseries import RingBuffer, TimeSeriesStore
+
+
+@pytest.mark.unit
+class TestRingBuffer:
+    """环形缓冲区测试"""
+
+    def test_window_queries_after_wrap(self):
+        """回绕后窗口计数、求和、百分位数只覆盖窗口内的数据"""
+        buffer = RingBuffer(5)
+        for i in range(12):
+            buffer.append(i, timestamp=100.0 + i)
+
+        assert len(buffer) == 5
+        assert buffer.values_list() == [7.0, 8.0, 9.0, 10.0, 11.0]
+        assert buffer.count(2.5, now=111.0) == 3
+        assert buffer.sum(2.5, now=111.0) == 30.0
+        assert buffer.average() == 9.0
+        assert buffer.percentile(50, 2.5, now=111.0) == 10.0
+        assert buffer.variance() == pytest.approx(np.var([7, 8, 9, 10, 11], ddof=1))
+
+    def test_out_of_order_timestamp_is_clamped(self):
+        """晚到的旧时间戳按最新时间戳写入，窗口查询仍然正确"""
+        buffer = RingBuffer(10, keep_items=True)
+        buffer.append(1, timestamp=100.0, item="a")
+        buffer.append(2, timestamp=110.0, item="b")
+        buffer.append(3, timestamp=105.0, item="c")
+        buffer.append(4, timestamp=111.0, item="d")
+
+        timestamps, values = buffer.window()
+        assert list(timestamps) == [100.0, 110.0, 110.0, 111.0]
+        assert buffer.count(5, now=112.0) == 3
+        assert buffer.window_items(5, now=112.0) == ["b", "c", "d"]
+
+    def test_sum_stays_exact_after_many_wraps(self):
+        """大量写入后窗口和不受累计和量级影响"""
+        buffer = RingBuffer(100)
+        for i in range(200000):
+            buffer.append(1e12 if i < 100 else 0.1, timestamp=float(i))
+
+        assert buffer.total < 1e3
+        assert buffer.sum(10, now=199999.5) == pytest.approx(1.0)
+        assert buffer.mean == pytest.approx(0.1)
+        assert buffer.variance() == pytest.approx(0.0, abs=1e-12)
+
+    def test_store_uses_per_metric_capacity(self):
+        """按指标名称使用各自的容量"""
+        store = TimeSeriesStore(capacity=3, capacities={"events": 10})
+        store.record_many([(name, i, float(i), None) for i in range(20) for name in ("cpu", "events")])
+
+        assert len(store.get("cpu")) == 3
+        assert len(store.get("events")) == 10
+        assert store.summary("cpu") == {"current": 19.0, "average": 18.0, "count": 3}
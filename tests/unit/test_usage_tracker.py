@@ -0,0 +1,73 @@
+"""
+MirrorCodeUsageTracker 单元测试
+"""
+
+import pytest
+
+from core.components.mirror_code_tracker import usage_tracker as usage_tracker_module
+from core.components.mirror_code_tracker.usage_tracker import (
+    MirrorCodeUsageTracker, ModelProvider, TokenUsage
+)
+
+
+def record(tracker, provider=ModelProvider.K2_LOCAL, command="/help"):
+    """记录一条100 tokens的使用"""
+    return tracker.record_usage(command, provider, TokenUsage(40, 60, 100), 120)
+
+
+def lifetime_count(tracker):
+    return sum(rollup["count"] for rollup in tracker.provider_rollups.values())
+
+
+@pytest.mark.unit
+class TestUsageTracker:
+    """使用追踪器测试"""
+
+    def test_resume_starts_fresh_session(self, tmp_path):
+        """恢复后累计汇总保留，本次会话统计从零开始"""
+        config_path = str(tmp_path / "usage.json")
+        tracker = MirrorCodeUsageTracker(config_path=config_path, snapshot_interval=2)
+        for provider in (ModelProvider.K2_LOCAL, ModelProvider.CLAUDE_MIRROR, ModelProvider.K2_LOCAL):
+            record(tracker, provider)
+        tracker.close()
+
+        resumed = MirrorCodeUsageTracker(config_path=config_path)
+
+        assert lifetime_count(resumed) == 3
+        assert resumed.get_model_switch_analysis()["total_switches"] == 2
+        assert "message" in resumed.get_current_session_summary()
+
+        record(resumed)
+        summary = resumed.get_current_session_summary()
+        assert summary["total_commands"] == 1
+        assert summary["token_usage"]["total_tokens"] == 100
+        assert lifetime_count(resumed) == 4
+        resumed.close()
+
+    def test_failed_compaction_keeps_ledger(self, tmp_path, monkeypatch):
+        """压缩时快照写入失败，账本不会被清空"""
+        config_path = str(tmp_path / "usage.json")
+        tracker = MirrorCodeUsageTracker(config_path=config_path, snapshot_interval=3, max_ledger_bytes=1)
+        for _ in range(2):
+            record(tracker)
+
+        def failing_replace(*args):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(usage_tracker_module.os, "replace", failing_replace)
+        record(tracker)
+        monkeypatch.undo()
+
+        assert tracker.ledger_path.stat().st_size > 0
+        assert lifetime_count(MirrorCodeUsageTracker(config_path=config_path)) == 3
+
+    def test_compaction_replays_nothing_twice(self, tmp_path):
+        """压缩后重新载入，记录既不丢失也不重复"""
+        config_path = str(tmp_path / "usage.json")
+        tracker = MirrorCodeUsageTracker(config_path=config_path, snapshot_interval=3, max_ledger_bytes=1)
+        for _ in range(7):
+            record(tracker)
+
+        assert lifetime_count(MirrorCodeUsageTracker(config_path=config_path)) == 7
+        tracker.close()
+        assert lifetime_count(MirrorCodeUsageTracker(config_path=config_path)) == 7
@@ -0,0 +1,222 @@
+"""
+WorkflowEngine DAG调度单元测试
+"""
+
+import asyncio
+
+import pytest
+
+from core.workflows.workflow_engine import (
+    NodeType, WorkflowCategory, WorkflowDefinition, WorkflowEngine, WorkflowGraph,
+    WorkflowNode, WorkflowStatus
+)
+
+
+def make_workflow(edges, workflow_id: str = "dag") -> WorkflowDefinition:
+    """按 {节点: [后续节点]} 创建工作流，每个节点使用同名处理器"""
+    nodes = [
+        WorkflowNode(
+            id=node_id,
+            name=node_id,
+            type=NodeType.ACTION,
+            description=node_id,
+            category="test",
+            next_nodes=list(next_nodes),
+            action_handler=node_id
+        )
+        for node_id, next_nodes in edges.items()
+    ]
+    return WorkflowDefinition(
+        id=workflow_id,
+        name=workflow_id,
+        description=workflow_id,
+        category=WorkflowCategory.CODE_DEVELOPMENT,
+        version="1.0",
+        nodes=nodes,
+        triggers=[]
+    )
+
+
+DIAMOND = {"a": ["b", "c"], "b": ["d"], "c": ["d"], "d": []}
+
+
+class Recorder:
+    """记录节点处理器的调用顺序"""
+
+    def __init__(self, node_ids):
+        self.calls = []
+        self.handlers = {node_id: self._handler(node_id) for node_id in node_ids}
+
+    def _handler(self, node_id):
+        async def handle(context):
+            self.calls.append(node_id)
+            await asyncio.sleep(0.01)
+            return {f"{node_id}_done": True}
+        return handle
+
+
+def make_engine(tmp_path, workflow, handlers) -> WorkflowEngine:
+    engine = WorkflowEngine(checkpoint_dir=str(tmp_path / "checkpoints"))
+    engine.workflows[workflow.id] = workflow
+    engine.node_handlers = dict(handlers)
+    return engine
+
+
+async def run(engine, workflow_id: str = "dag", inputs=None):
+    """执行工作流并等待结束"""
+    execution_id = await engine.execute_workflow(workflow_id, inputs)
+    await engine.execution_tasks[execution_id]
+    return engine.get_workflow_status(execution_id)
+
+
+@pytest.mark.unit
+class TestWorkflowGraph:
+    """DAG构建测试"""
+
+    def test_indegree_and_start_nodes(self):
+        graph = WorkflowGraph.from_workflow(make_workflow(DIAMOND))
+
+        assert graph.start_nodes == ["a"]
+        assert graph.indegree == {"a": 0, "b": 1, "c": 1, "d": 2}
+        assert sorted(graph.predecessors["d"]) == ["b", "c"]
+
+    @pytest.mark.parametrize("edges, message", [
+        ({"a": ["b"], "b": ["c"], "c": ["b"]}, "循環"),
+        ({"a": ["missing"]}, "不存在"),
+        ({"a": ["b"], "b": ["a"]}, "起始節點"),
+    ])
+    def test_invalid_graphs_are_rejected(self, edges, message):
+        with pytest.raises(ValueError, match=message):
+            WorkflowGraph.from_workflow(make_workflow(edges))
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestDagExecution:
+    """DAG调度测试"""
+
+    async def test_diamond_join_runs_once(self, tmp_path):
+        """菱形DAG的汇合节点在两个分支都结束后只执行一次，分支并发执行"""
+        recorder = Recorder(DIAMOND)
+        engine = make_engine(tmp_path, make_workflow(DIAMOND), recorder.handlers)
+
+        execution = await run(engine)
+
+        assert execution.status == WorkflowStatus.COMPLETED
+        assert recorder.calls.count("d") == 1
+        assert recorder.calls[0] == "a" and recorder.calls[-1] == "d"
+        assert sorted(recorder.calls[1:3]) == ["b", "c"]
+        assert execution.metrics["max_parallel_nodes"] == 2
+        assert all(execution.execution_context[f"{node_id}_done"] for node_id in DIAMOND)
+
+    async def test_skipped_branch_is_pruned(self, tmp_path, monkeypatch):
+        """所有前驱都被跳过的节点同样跳过，至少一个前驱执行的汇合节点照常执行"""
+        edges = {"a": ["b", "c"], "b": ["e", "d"], "c": ["d"], "d": [], "e": []}
+        recorder = Recorder(edges)
+        engine = make_engine(tmp_path, make_workflow(edges), recorder.handlers)
+        monkeypatch.setattr(engine, "_check_node_permissions", lambda node: node.id != "b")
+
+        execution = await run(engine)
+
+        assert execution.status == WorkflowStatus.COMPLETED
+        assert sorted(recorder.calls) == ["a", "c", "d"]
+
+    async def test_failure_cancels_running_nodes(self, tmp_path):
+        """节点失败时取消并发中的其他节点，不执行后续节点"""
+        recorder = Recorder(DIAMOND)
+        cancelled = []
+
+        async def fail(context):
+            raise RuntimeError("build failed")
+
+        async def slow(context):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append("c")
+                raise
+
+        handlers = dict(recorder.handlers, b=fail, c=slow)
+        engine = make_engine(tmp_path, make_workflow(DIAMOND), handlers)
+
+        execution = await run(engine)
+
+        assert execution.status == WorkflowStatus.FAILED
+        assert "build failed" in execution.error_message
+        assert cancelled == ["c"]
+        assert "d" not in recorder.calls
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+class TestResumeExecution:
+    """检查点恢复测试"""
+
+    def failing_once(self, recorder, node_id):
+        """第一次调用失败，之后委托给记录处理器"""
+        attempts = []
+
+        async def handle(context):
+            attempts.append(node_id)
+            if len(attempts) == 1:
+                # 等并发的其他分支先完成
+                await asyncio.sleep(0.05)
+                raise RuntimeError(f"{node_id} crashed")
+            return await recorder.handlers[node_id](context)
+        return handle
+
+    async def wait(self, engine, execution_id):
+        await engine.execution_tasks[execution_id]
+        return engine.get_workflow_status(execution_id)
+
+    async def test_resume_skips_completed_nodes(self, tmp_path):
+        """失败后恢复只执行未完成的节点，已完成节点的结果从检查点恢复"""
+        recorder = Recorder(DIAMOND)
+        handlers = dict(recorder.handlers, c=self.failing_once(recorder, "c"))
+        engine = make_engine(tmp_path, make_workflow(DIAMOND), handlers)
+
+        failed = await run(engine, inputs={"branch": "main"})
+        assert failed.status == WorkflowStatus.FAILED
+        assert sorted(recorder.calls) == ["a", "b"]
+        assert [item["execution_id"] for item in engine.list_resumable_executions()] == [failed.id]
+
+        recorder.calls.clear()
+        execution = await self.wait(engine, await engine.resume_execution(failed.id))
+
+        assert execution.status == WorkflowStatus.COMPLETED
+        assert recorder.calls == ["c", "d"]
+        assert execution.execution_context["branch"] == "main"
+        assert all(execution.execution_context[f"{node_id}_done"] for node_id in DIAMOND)
+        assert not engine._checkpoint_path(failed.id).exists()
+        assert engine.list_resumable_executions() == []
+
+    async def test_resume_after_restart(self, tmp_path):
+        """进程中断（检查点没有结束事件）后，新引擎从同一目录恢复"""
+        recorder = Recorder(DIAMOND)
+        handlers = dict(recorder.handlers, d=self.failing_once(recorder, "d"))
+        workflow = make_workflow(DIAMOND)
+        engine = make_engine(tmp_path, workflow, handlers)
+
+        failed = await run(engine)
+        checkpoint_path = engine._checkpoint_path(failed.id)
+        engine._close_checkpoint(failed.id)
+        # 去掉结束事件，并模拟写到一半的最后一行
+        lines = [line for line in checkpoint_path.read_text(encoding="utf-8").splitlines()
+                 if '"finished"' not in line]
+        checkpoint_path.write_text("\n".join(lines) + '\n{"event": "node_comp', encoding="utf-8")
+
+        restarted = make_engine(tmp_path, workflow, recorder.handlers)
+        resumable = restarted.list_resumable_executions()
+        assert [(item["status"], item["completed_nodes"]) for item in resumable] == [("paused", 3)]
+
+        recorder.calls.clear()
+        execution = await self.wait(restarted, await restarted.resume_execution(failed.id))
+
+        assert execution.status == WorkflowStatus.COMPLETED
+        assert recorder.calls == ["d"]
+
+    async def test_resume_unknown_execution(self, tmp_path):
+        engine = make_engine(tmp_path, make_workflow(DIAMOND), Recorder(DIAMOND).handlers)
+
+        with pytest.raises(ValueError, match="不存在檢查點"):
+            await engine.resume_execution("missing")